@@ -1,25 +1,55 @@
+import hashlib
 import os
+import re
 from functools import lru_cache
-from fastapi import Depends
+from typing import Iterator, List
+from fastapi import Depends, Header
+from pydantic import BaseModel
 
 from .utility.llama import Chatter
+from .utility.metrics import Family
+from .utility.readiness import Readiness
+from .utility.scheduler import InferenceScheduler
 from .utility.embeddings import get_embedding_model, EmbeddingModel
+from .world.ann_index import make_index
 from .world.memory import WorldMemory
+from .world.world_store import WorldStore
 from .world.conversation_service import ConversationService
-
+from .world.memory_queue import MemoryExtractionQueue
+from .world.sessions import DEFAULT_SESSION_ID, Session, SessionStore
 
 DEFAULT_MODEL_PATH = "~/dev/llm/Harbinger-24B-Q5_K_M.gguf"
+MEMORY_QUEUE_SIZE = int(os.getenv("MEMORY_QUEUE_SIZE", "64"))
+# Resident session cap; least recently used idle sessions are evicted beyond it
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "32"))
+# Root directory for durable worlds, one subdirectory per session (unset: RAM only)
+WORLD_DIR = os.getenv("WORLD_DIR")
+# Retrieval index: "exact" brute force, or "ivf" approximate search for big worlds
+ANN_INDEX = os.getenv("ANN_INDEX", "exact")
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))
+ANN_MIN_ROWS = int(os.getenv("ANN_MIN_ROWS", "10000"))
 
 
-@lru_cache(maxsize=1)
-def get_chatter() -> Chatter:
+def new_chatter() -> Chatter:
+    """A Chatter with its own History on the shared model."""
     model_path = os.getenv("MODEL_PATH", DEFAULT_MODEL_PATH)
     return Chatter(model_path)
 
 
-def reset_chatter() -> Chatter:
-    get_chatter.cache_clear()
-    return get_chatter()
+def load_model() -> None:
+    """Load the shared Llama model. Safe to call repeatedly."""
+    new_chatter()
+
+
+def warm_up_model() -> None:
+    """One-token completion so compute buffers exist before the first turn."""
+    if Chatter.get_scheduler() is not None:
+        new_chatter().warm_up()
+
+
+def get_inference_scheduler() -> InferenceScheduler | None:
+    """The scheduler that serializes use of the shared model (None until loaded)."""
+    return Chatter.get_scheduler()
 
 
 @lru_cache(maxsize=1)
@@ -27,14 +57,253 @@ def get_embeddings() -> EmbeddingModel:
     return get_embedding_model()
 
 
+def world_dir_for(session_id: str) -> str:
+    """Filesystem-safe directory for a session's world under WORLD_DIR."""
+    if re.fullmatch(r"[A-Za-z0-9_-]{1,64}", session_id):
+        name = session_id
+    else:
+        name = hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:32]
+    return os.path.join(os.path.expanduser(WORLD_DIR), name)
+
+
+def load_embeddings() -> None:
+    get_embeddings()
+
+
+def warm_up_embeddings() -> None:
+    get_embeddings().embed_many(["The adventure begins."])
+
+
 @lru_cache(maxsize=1)
-def get_world_memory() -> WorldMemory:
+def get_readiness() -> Readiness:
+    return Readiness()
+
+
+def new_world_memory(session_id: str = DEFAULT_SESSION_ID) -> WorldMemory:
     embedder = get_embeddings()
-    return WorldMemory(embedder.embed)
+    store = None
+    if WORLD_DIR:
+        store = WorldStore(world_dir_for(session_id), model_name=embedder.model_name)
+    index = make_index(ANN_INDEX, nprobe=ANN_NPROBE, min_train=ANN_MIN_ROWS)
+    return WorldMemory(
+        embedder.embed, embed_many_fn=embedder.embed_many, store=store, index=index
+    )
+
+
+@lru_cache(maxsize=1)
+def get_session_store() -> SessionStore:
+    return SessionStore(
+        new_chatter,
+        new_world_memory,
+        max_sessions=MAX_SESSIONS,
+        memory_queue=get_memory_queue(),
+    )
+
+
+class SessionRequest(BaseModel):
+    """Body fields shared by every session-scoped request."""
+
+    # omitted -> the X-Session-Id header, else the shared "default" session
+    session_id: str | None = None
+
+
+def get_session_id(
+    req: SessionRequest, x_session_id: str | None = Header(default=None)
+) -> str:
+    """
+    Session id from the body's "session_id", else the X-Session-Id header.
+    Endpoints name their body parameter `req` too, so FastAPI validates the
+    one parsed body against both models instead of embedding two bodies.
+    """
+    return req.session_id or x_session_id or DEFAULT_SESSION_ID
+
+
+def get_session(
+    session_id: str = Depends(get_session_id),
+    store: SessionStore = Depends(get_session_store),
+) -> Iterator[Session]:
+    """The request's session, kept from eviction until the response is sent."""
+    session = store.get(session_id, pin=True)
+    try:
+        yield session
+    finally:
+        store.release(session)
+
+
+def get_chatter(session: Session = Depends(get_session)) -> Chatter:
+    return session.chatter
+
+
+def get_world_memory(session: Session = Depends(get_session)) -> WorldMemory:
+    return session.world_memory
+
+
+@lru_cache(maxsize=1)
+def get_memory_queue() -> MemoryExtractionQueue:
+    return MemoryExtractionQueue(maxsize=MEMORY_QUEUE_SIZE)
+
+
+def _gauge(name: str, help_text: str, value: float, **labels) -> Family:
+    return (name, help_text, "gauge", [(labels, value)])
+
+
+def _counter(name: str, help_text: str, value: float, **labels) -> Family:
+    return (name, help_text, "counter", [(labels, value)])
+
+
+def collect_world_metrics() -> List[Family]:
+    """Session and world sizes; only already-built worlds are counted."""
+    store = get_session_store()
+    worlds = store.resident_worlds()
+    sessions = store.stats()
+    families = [
+        _gauge("pdm_sessions_resident", "Resident sessions.", sessions["resident"]),
+        _counter(
+            "pdm_session_evictions_total",
+            "Idle sessions evicted.",
+            sessions["evictions"],
+        ),
+        _gauge(
+            "pdm_world_memories",
+            "Memories held by resident worlds.",
+            sum(len(w) for w in worlds),
+        ),
+        _gauge(
+            "pdm_world_npcs",
+            "NPCs in the NPC indexes of resident worlds.",
+            sum(len(w.npc_index) for w in worlds),
+        ),
+    ]
+    stores = [w.store.stats() for w in worlds if w.store is not None]
+    if stores:
+        families += [
+            _gauge(
+                "pdm_world_store_pending_writes",
+                "World writes queued for disk.",
+                sum(st["pending"] for st in stores),
+            ),
+            _counter(
+                "pdm_world_store_errors_total",
+                "Failed world-store commits (resident worlds).",
+                sum(st["errors"] for st in stores),
+            ),
+        ]
+    return families
+
+
+def collect_queue_metrics() -> List[Family]:
+    """Memory-extraction queue and inference scheduler state."""
+    queue = get_memory_queue().stats()
+    families = [
+        _gauge(
+            "pdm_memory_queue_depth",
+            "Extraction jobs queued or running.",
+            queue["depth"],
+        ),
+        (
+            "pdm_memory_queue_jobs_total",
+            "Finished extraction jobs by outcome.",
+            "counter",
+            [
+                ({"outcome": "completed"}, queue["completed"]),
+                ({"outcome": "failed"}, queue["failed"]),
+                ({"outcome": "ran_inline"}, queue["ran_inline"]),
+            ],
+        ),
+    ]
+    scheduler = get_inference_scheduler()
+    if scheduler is None:
+        return families
+    sched = scheduler.stats()
+    families += [
+        _gauge(
+            "pdm_scheduler_busy",
+            "1 while a completion holds the model.",
+            int(sched["busy"]),
+        ),
+        _gauge(
+            "pdm_scheduler_waiting",
+            "Completions waiting for the model.",
+            sched["waiting"],
+        ),
+        _counter(
+            "pdm_scheduler_rejected_total",
+            "Narration requests rejected with 429.",
+            sched["rejected"],
+        ),
+        (
+            "pdm_scheduler_avg_wait_seconds",
+            "Mean time waiting for the model, by priority.",
+            "gauge",
+            [
+                ({"priority": name}, st["avg_wait_sec"])
+                for name, st in sched["priorities"].items()
+            ],
+        ),
+    ]
+    return families
+
+
+def collect_embedding_metrics() -> List[Family]:
+    """Embedding cache counters, once the embedder has been loaded."""
+    if not get_embeddings.cache_info().currsize:
+        return []
+    cache = get_embeddings().cache_stats()
+    return [
+        (
+            "pdm_embedding_cache_lookups_total",
+            "Embedding cache lookups by result.",
+            "counter",
+            [
+                ({"result": "hit"}, cache["hits"]),
+                ({"result": "disk_hit"}, cache["disk_hits"]),
+                ({"result": "miss"}, cache["misses"]),
+            ],
+        ),
+        _gauge(
+            "pdm_embedding_cache_hit_rate",
+            "Fraction of embedding lookups served from cache.",
+            cache["hit_rate"],
+        ),
+        _gauge(
+            "pdm_embedding_cache_entries",
+            "Embeddings held in the in-memory cache.",
+            cache["entries"],
+        ),
+    ]
+
+
+def collect_speculation_metrics() -> List[Family]:
+    """Draft acceptance, when the model was loaded with SPECULATIVE_DECODING."""
+    stats = Chatter.speculation_stats()
+    if stats is None:
+        return []
+    return [
+        _gauge(
+            "pdm_speculative_acceptance_rate",
+            "Fraction of drafted tokens the model accepted.",
+            stats["acceptance_rate"],
+            mode=stats["mode"],
+        ),
+        _gauge(
+            "pdm_speculative_accepted_per_step",
+            "Mean drafted tokens accepted per verification step.",
+            stats["accepted_per_step"],
+            mode=stats["mode"],
+        ),
+    ]
 
 
 def get_conversation_service(
+    session: Session = Depends(get_session),
     chatter: Chatter = Depends(get_chatter),
     world_memory: WorldMemory = Depends(get_world_memory),
+    memory_queue: MemoryExtractionQueue = Depends(get_memory_queue),
 ) -> ConversationService:
-    return ConversationService(chatter, world_memory)
+    return ConversationService(
+        chatter,
+        world_memory,
+        memory_queue,
+        turn_lock=session.turn_lock,
+        turn_batch=session.turn_batch,
+    )
@@ -3,18 +3,42 @@ import os
 import asyncio
 
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from .routers.chat import router as chat_router
-from .dependencies import get_chatter
+from .utility.metrics import CONTENT_TYPE, REGISTRY
+from .dependencies import (
+    collect_embedding_metrics,
+    collect_queue_metrics,
+    collect_speculation_metrics,
+    collect_world_metrics,
+    get_memory_queue,
+    get_readiness,
+    get_session_store,
+    load_embeddings,
+    load_model,
+    warm_up_embeddings,
+    warm_up_model,
+)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Preload the model in the background so health is immediate
-    asyncio.create_task(asyncio.to_thread(get_chatter))
+    # Startup: load the LLM and the embedder concurrently in the background so
+    # health is immediate; /ready reports when both are loaded and warm
+    components = {
+        "llm": (load_model, warm_up_model),
+        "embeddings": (load_embeddings, warm_up_embeddings),
+    }
+    app.state.preload = asyncio.create_task(get_readiness().preload(components))
     yield
-    # Shutdown: (if needed in the future)
+    # Shutdown: extract turns still waiting for a batch, then finish pending
+    # memory extraction so no turn's memories are lost
+    await asyncio.to_thread(get_session_store().flush_turn_batches)
+    await asyncio.to_thread(get_memory_queue().shutdown)
+    # then flush persisted worlds (after extraction, which may still write)
+    await asyncio.to_thread(get_session_store().close_all)
 
 
 app = FastAPI(title="PersistentDM API", lifespan=lifespan)
@@ -46,4 +70,26 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+def ready():
+    """200 once every component is loaded and warmed up, else 503."""
+    status = get_readiness().snapshot()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text-format metrics: turn stage latencies, tokens, queues, sizes."""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+# read at scrape time from the live singletons; nothing is loaded to report it
+for collector in (
+    collect_world_metrics,
+    collect_queue_metrics,
+    collect_embedding_metrics,
+    collect_speculation_metrics,
+):
+    REGISTRY.add_collector(collector)
+
 app.include_router(chat_router)
@@ -1,13 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+from typing import AsyncIterator, Iterator, List
+
+import anyio
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 
-from ..dependencies import get_conversation_service, reset_chatter
+from ..dependencies import (
+    SessionRequest,
+    get_conversation_service,
+    get_inference_scheduler,
+    get_session_id,
+    get_session_store,
+)
+from ..utility import tracing
+from ..utility.scheduler import InferenceScheduler, SchedulerBusy
+from ..world.sessions import SessionStore
 
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 
-class ChatRequest(BaseModel):
+class ChatRequest(SessionRequest):
     message: str
 
 
@@ -15,7 +30,7 @@ class ChatResponse(BaseModel):
     reply: str
 
 
-class ClearRequest(BaseModel):
+class ClearRequest(SessionRequest):
     clear: bool
 
 
@@ -23,22 +38,145 @@ class ClearResponse(BaseModel):
     success: bool
 
 
+def _busy_error(e: SchedulerBusy) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail={"error": "Server busy", "message": str(e)},
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+def _admit(scheduler: InferenceScheduler | None) -> None:
+    """Reject up front when the inference queue is already full."""
+    if scheduler is not None:
+        try:
+            scheduler.check_admission()
+        except SchedulerBusy as e:
+            raise _busy_error(e)
+
+
+def trace_requested(
+    x_debug_trace: str | None = Header(default=None, alias=tracing.TRACE_HEADER),
+) -> bool:
+    """True when the client sent X-Debug-Trace: 1 (or true/yes)."""
+    return (x_debug_trace or "").strip().lower() in ("1", "true", "yes")
+
+
 @router.post("/clear", response_model=ClearResponse)
-def clear_chat(req: ClearRequest):
+def clear_chat(
+    req: ClearRequest,
+    session_id: str = Depends(get_session_id),
+    sessions: SessionStore = Depends(get_session_store),
+):
     if req.clear:
-        reset_chatter()
+        session = sessions.peek(session_id)
+        if session is not None:
+            session.reset_history()
         return ClearResponse(success=True)
     else:
         return ClearResponse(success=False)
 
 
 @router.post("", response_model=ChatResponse)
-def post_chat(req: ChatRequest, conversation=Depends(get_conversation_service)):
+def post_chat(
+    req: ChatRequest,
+    response: Response,
+    conversation=Depends(get_conversation_service),
+    scheduler: InferenceScheduler | None = Depends(get_inference_scheduler),
+    debug_trace: bool = Depends(trace_requested),
+):
+    _admit(scheduler)
     try:
-        reply = conversation.handle_user_message(req.message)
+        with tracing.start_trace("chat", requested=debug_trace) as trace:
+            reply = conversation.handle_user_message(req.message)
+        if debug_trace and trace is not None:
+            response.headers[tracing.TRACE_HEADER] = trace.to_json()
         return ChatResponse(reply=reply)
+    except SchedulerBusy as e:
+        raise _busy_error(e)
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail={"error": "Internal server error", "message": str(e)},
         )
+
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _close_stream(stream: Iterator[str]) -> None:
+    try:
+        stream.close()
+    except ValueError:
+        # still running a step on a worker thread; it is closed when collected
+        pass
+
+
+@router.post("/stream")
+def post_chat_stream(
+    req: ChatRequest,
+    request: Request,
+    conversation=Depends(get_conversation_service),
+    scheduler: InferenceScheduler | None = Depends(get_inference_scheduler),
+    debug_trace: bool = Depends(trace_requested),
+) -> StreamingResponse:
+    """
+    Stream the DM reply as Server-Sent Events:
+    - `token` events carry `{"delta": str}` as text is decoded
+    - a final `done` event carries `{"reply": str}`, or `error` on failure;
+      a request that lost its model slot after the headers went out gets
+      `{"status": 429, "retry_after": int}` in the `error` event
+    Memory extraction is queued once the whole reply has been streamed.
+    Decoding stops as soon as the client disconnects.
+    With X-Debug-Trace the turn's trace is added to the `done` event as
+    `trace` (headers are sent before the trace exists).
+    """
+    _admit(scheduler)
+    parts: List[str] = []
+
+    async def events() -> AsyncIterator[str]:
+        trace = tracing.begin("chat_stream", requested=debug_trace)
+        stream = conversation.stream_user_message(req.message)
+        traced = tracing.traced_iter(trace, stream)
+        error: Exception | None = None
+        try:
+            async for delta in iterate_in_threadpool(traced):
+                if await request.is_disconnected():
+                    return
+                parts.append(delta)
+                yield _sse_event("token", {"delta": delta})
+        except Exception as e:
+            error = e
+        finally:
+            # hands the model back now, not when the generator is collected
+            with anyio.CancelScope(shield=True):
+                await run_in_threadpool(_close_stream, traced)
+                await run_in_threadpool(_close_stream, stream)
+            tracing.end(trace)
+        if isinstance(error, SchedulerBusy):
+            yield _sse_event(
+                "error",
+                {
+                    "error": "Server busy",
+                    "message": str(error),
+                    "status": 429,
+                    "retry_after": error.retry_after,
+                },
+            )
+            return
+        if error is not None:
+            yield _sse_event(
+                "error", {"error": "Internal server error", "message": str(error)}
+            )
+            return
+        done: dict = {"reply": "".join(parts)}
+        if debug_trace and trace is not None:
+            done["trace"] = trace.to_dict()
+        yield _sse_event("done", done)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
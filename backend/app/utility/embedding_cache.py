@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+import numpy as np
+
+
+def content_key(model_name: str, text: str) -> str:
+    """Stable cache key for `text` embedded by `model_name`."""
+    h = hashlib.sha256()
+    h.update(model_name.encode("utf-8"))
+    h.update(b"\0")
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+class DiskEmbeddingStore:
+    """
+    Append-only on-disk embedding store.
+    - vectors.f32 holds raw float32 rows, read back through np.memmap.
+    - keys.txt holds one content key per row, in the same order.
+    - meta.json records the model name and dim; a mismatch wipes the store.
+    """
+
+    def __init__(self, directory: str, model_name: str):
+        self.directory = os.path.expanduser(directory)
+        self.model_name = model_name
+        self.dim: int | None = None
+        self._rows: Dict[str, int] = {}
+        self._map: np.memmap | None = None
+        self._vec_path = os.path.join(self.directory, "vectors.f32")
+        self._key_path = os.path.join(self.directory, "keys.txt")
+        self._meta_path = os.path.join(self.directory, "meta.json")
+        os.makedirs(self.directory, exist_ok=True)
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {}
+
+        if meta.get("model_name") != self.model_name or not meta.get("dim"):
+            self._reset()
+            return
+
+        self.dim = int(meta["dim"])
+        try:
+            with open(self._key_path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        except (OSError, ValueError):
+            lines = []
+        # a torn last line (no newline) is an unfinished write
+        keys = [line.strip() for line in lines if line.endswith("\n")]
+
+        # trust only rows that are fully present in both files, and cut the
+        # files back to them so put() appends at the row it records
+        row_bytes = self.dim * 4
+        size = os.path.getsize(self._vec_path) if os.path.exists(self._vec_path) else 0
+        usable = min(len(keys), size // row_bytes)
+        if size != usable * row_bytes:
+            with open(self._vec_path, "r+b") as f:
+                f.truncate(usable * row_bytes)
+        if len(lines) != usable:
+            with open(self._key_path, "w", encoding="utf-8") as f:
+                f.writelines(key + "\n" for key in keys[:usable])
+        self._rows = {k: i for i, k in enumerate(keys[:usable])}
+
+    def _reset(self) -> None:
+        for path in (self._vec_path, self._key_path, self._meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.dim = None
+        self._rows = {}
+        self._map = None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get(self, key: str) -> np.ndarray | None:
+        row = self._rows.get(key)
+        if row is None or self.dim is None:
+            return None
+        if self._map is None or self._map.shape[0] <= row:
+            self._map = np.memmap(
+                self._vec_path,
+                dtype=np.float32,
+                mode="r",
+                shape=(len(self._rows), self.dim),
+            )
+        return np.array(self._map[row])
+
+    def put(self, key: str, vec: np.ndarray) -> None:
+        if key in self._rows:
+            return
+        if self.dim is None:
+            self.dim = int(vec.shape[0])
+            with open(self._meta_path, "w", encoding="utf-8") as f:
+                json.dump({"model_name": self.model_name, "dim": self.dim}, f)
+        if vec.shape[0] != self.dim:
+            return
+
+        with open(self._vec_path, "ab") as f:
+            f.write(np.ascontiguousarray(vec, dtype=np.float32).tobytes())
+        with open(self._key_path, "a", encoding="utf-8") as f:
+            f.write(key + "\n")
+        self._rows[key] = len(self._rows)
+
+
+class EmbeddingCache:
+    """
+    Two-tier content-hash keyed embedding cache.
+    - Tier 1 is a bounded in-memory LRU.
+    - Tier 2 is an optional DiskEmbeddingStore that survives restarts.
+    Keys include the model name, so switching models never serves stale vectors.
+    """
+
+    def __init__(
+        self, model_name: str, max_entries: int = 4096, disk_dir: str | None = None
+    ):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._lru: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self.disk = DiskEmbeddingStore(disk_dir, model_name) if disk_dir else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        return content_key(self.model_name, text)
+
+    def get(self, text: str) -> np.ndarray | None:
+        key = self.key(text)
+        with self._lock:
+            vec = self._lru.get(key)
+            if vec is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return vec
+
+            if self.disk is not None:
+                vec = self.disk.get(key)
+                if vec is not None:
+                    self.disk_hits += 1
+                    self._remember(key, vec)
+                    return vec
+
+            self.misses += 1
+            return None
+
+    def put(self, text: str, vec: np.ndarray) -> None:
+        key = self.key(text)
+        vec = np.asarray(vec, dtype=np.float32)
+        vec.setflags(write=False)
+        with self._lock:
+            self._remember(key, vec)
+            if self.disk is not None:
+                self.disk.put(key, vec)
+
+    def _remember(self, key: str, vec: np.ndarray) -> None:
+        self._lru[key] = vec
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._lru.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "model_name": self.model_name,
+                "entries": len(self._lru),
+                "max_entries": self.max_entries,
+                "disk_entries": len(self.disk) if self.disk is not None else 0,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (
+                    (self.hits + self.disk_hits) / lookups if lookups else 0.0
+                ),
+            }
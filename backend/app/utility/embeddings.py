@@ -1,8 +1,23 @@
+from __future__ import annotations
+
 import math
-from typing import List
+import os
+from typing import TYPE_CHECKING, List, Sequence
+
+import numpy as np
+
+from .embedding_cache import EmbeddingCache
+from .metrics import EMBED_SECONDS
 
-import torch
-from sentence_transformers import SentenceTransformer
+# torch and sentence_transformers take seconds to import; they are loaded on
+# first EmbeddingModel() so importing the app stays fast.
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "BAAI/bge-small-en-v1.5")
+# In-memory LRU size; set EMBED_CACHE_DIR to also persist vectors across restarts
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "4096"))
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR") or None
 
 
 def l2_normalize(vec: List[float]) -> List[float]:
@@ -16,34 +31,90 @@ def l2_normalize(vec: List[float]) -> List[float]:
 
 
 class EmbeddingModel:
-    def __init__(self, device: str | None = None):
+    def __init__(
+        self,
+        device: str | None = None,
+        model_name: str = EMBEDDING_MODEL_NAME,
+        cache: EmbeddingCache | None = None,
+    ):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
         # pick device automatically
         if device is None:
             device = "cuda" if torch.cuda.is_available() else "cpu"
 
         self.device = device
-        self.model = SentenceTransformer(
-            "BAAI/bge-small-en-v1.5",
+        self.model_name = model_name
+        self.model: SentenceTransformer = SentenceTransformer(
+            model_name,
             device=self.device,
         )
+        # cache keys include the model name; never reuse one built for another
+        if cache is None or cache.model_name != model_name:
+            cache = EmbeddingCache(
+                model_name, max_entries=EMBED_CACHE_SIZE, disk_dir=EMBED_CACHE_DIR
+            )
+        self.cache = cache
 
     def embed(self, text: str) -> List[float]:
-        with torch.no_grad():
+        cached = self.cache.get(text)
+        if cached is not None:
+            return cached.tolist()
+
+        import torch
+
+        with torch.no_grad(), EMBED_SECONDS.time(op="embed"):
             emb = self.model.encode(
                 [text],
-                convert_to_tensor=True,
+                convert_to_numpy=True,
                 normalize_embeddings=True,
             )
         # emb shape: [1, dim]
-        return emb[0].tolist()
-
-
-def dot_sim(a: List[float], b: List[float]) -> float:
+        vec = np.asarray(emb[0], dtype=np.float32)
+        self.cache.put(text, vec)
+        return vec.tolist()
+
+    def embed_many(self, texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+        """
+        Embed many texts with batched forward passes.
+        Returns a float32 array of shape [len(texts), dim]; cached texts are
+        not re-encoded and duplicates are encoded once.
+        """
+        texts = list(texts)
+        rows: List[np.ndarray | None] = [self.cache.get(t) for t in texts]
+        pending = list(dict.fromkeys(t for t, v in zip(texts, rows) if v is None))
+
+        if pending:
+            import torch
+
+            with torch.no_grad(), EMBED_SECONDS.time(op="embed_many"):
+                emb = self.model.encode(
+                    pending,
+                    batch_size=batch_size,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True,
+                )
+            fresh = {}
+            for text, vec in zip(pending, np.asarray(emb, dtype=np.float32)):
+                self.cache.put(text, vec)
+                fresh[text] = vec
+            rows = [fresh[t] if v is None else v for t, v in zip(texts, rows)]
+
+        if not rows:
+            dim = self.model.get_sentence_embedding_dimension() or 0
+            return np.zeros((0, dim), dtype=np.float32)
+        return np.stack(rows).astype(np.float32, copy=False)
+
+    def cache_stats(self) -> dict:
+        return self.cache.stats()
+
+
+def dot_sim(a, b) -> float:
     # store normalized vectors, dot product == cosine similarity
-    total = 0.0
-    for x, y in zip(a, b):
-        total += x * y
-    return total
+    return float(
+        np.dot(np.asarray(a, dtype=np.float32), np.asarray(b, dtype=np.float32))
+    )
 
 
 def get_embedding_model(device: str | None = None) -> EmbeddingModel:
@@ -67,4 +138,6 @@ if __name__ == "__main__":
     print(f"Similarity between 'steal the ledger' and 'take the book': {sim12:.3f}")
     print(f"Similarity between 'steal the ledger' and 'cook dinner': {sim13:.3f}")
 
+    print(f"Cache stats: {embed_model.cache_stats()}")
+
     print("\nEmbedding tests completed!")
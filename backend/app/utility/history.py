@@ -1,6 +1,7 @@
 # history.py
 from . import message
-from datetime import datetime
+import time
+from collections import deque
 
 
 class History:
@@ -8,6 +9,10 @@ class History:
     This is used to represent the history of a chat.
     - max_history_tokens is the maximum number of tokens allowed in the active history.
     - system_prompt is the system prompt for the chat. it will always be the first message in the history.
+    - The active window is kept incrementally: a deque of active messages and
+      their running token total. New messages are appended and the oldest are
+      deactivated from the front until the window fits, so building the
+      context costs O(active window), not O(messages ever sent).
     """
 
     def __init__(
@@ -23,11 +28,18 @@ class History:
             tokens=tokens,
             msg_id=self.next_id,
             active=True,
-            timestamp=datetime.now(),
+            timestamp=time.time(),
         )
         self.history.append(system_message)
         self.next_id += 1
 
+        # active non-system messages, oldest first, and the token total of
+        # the system message plus everything in the window
+        self._window = deque()
+        self._window_tokens = tokens
+        # (message, was_active) pushed out of the window by the newest message
+        self._last_evicted = []
+
     def add_message(self, role: str, content: str, tokens: int):
         """
         Create a new Message, assign it a unique ID, timestamp it,
@@ -42,12 +54,49 @@ class History:
             tokens=tokens,
             msg_id=msg_id,
             active=True,
-            timestamp=datetime.now(),
+            timestamp=time.time(),
         )
 
         self.history.append(msg)
+        self._push(msg)
         return msg
 
+    def _push(self, msg) -> None:
+        """Add msg to the active window, evicting the oldest messages to fit."""
+        allowed_tokens = self.max_history_tokens
+        system_tokens = self.history[0].tokens
+        self._last_evicted = []
+        if system_tokens + msg.tokens > allowed_tokens:
+            # can never fit alongside the system prompt
+            msg.deactivate()
+            return
+
+        self._window.append(msg)
+        self._window_tokens += msg.tokens
+        while self._window_tokens > allowed_tokens:
+            oldest = self._window.popleft()
+            self._window_tokens -= oldest.tokens
+            self._last_evicted.append((oldest, oldest.active))
+            oldest.deactivate()
+
+    def remove_last(self, msg) -> None:
+        """
+        Take back the newest message (e.g. a user turn that got no reply) and
+        restore the messages its arrival pushed out of the active window.
+        """
+        if len(self.history) < 2 or self.history[-1] is not msg:
+            raise ValueError("only the newest message can be removed")
+        self.history.pop()
+        if self._window and self._window[-1] is msg:
+            self._window.pop()
+            self._window_tokens -= msg.tokens
+        for oldest, was_active in reversed(self._last_evicted):
+            self._window.appendleft(oldest)
+            self._window_tokens += oldest.tokens
+            if was_active:
+                oldest.activate()
+        self._last_evicted = []
+
     def build_context(self) -> str:
         """
         Build the context of the history.
@@ -62,22 +111,6 @@ class History:
         if not self.history:
             return []
 
-        system_msg = self.history[0]
-        allowed_tokens = self.max_history_tokens
-
-        total_tokens = system_msg.tokens
-        chosen = []  # system message will be added later, tokens accounted for before looping
-
-        # walk from newest to oldest, skipping index zero (system prompt)
-        for msg in reversed(self.history[1:]):
-            if not msg.active:
-                continue
-            if total_tokens + msg.tokens > allowed_tokens:
-                msg.deactivate()
-                continue
-            chosen.append(msg)
-            total_tokens += msg.tokens
-
-        chronological = [system_msg] + list(reversed(chosen))
-
-        return chronological
+        # messages a caller deactivated are skipped; their tokens are
+        # released once they are evicted from the front of the window
+        return [self.history[0]] + [msg for msg in self._window if msg.active]
@@ -0,0 +1,160 @@
+import json
+import os
+from dataclasses import asdict, dataclass, fields, replace
+from typing import Any, Dict
+
+from .gpu import REQUIRED_VRAM_FREE
+
+# "gpu" (default): every layer offloaded, refuses to start without enough VRAM
+# "cpu": no offload; threads and batch sizes from the calibrated config file
+INFERENCE_PROFILE = os.getenv("INFERENCE_PROFILE", "gpu").lower()
+# Per-host settings written by `python -m backend.benchmarks.calibrate`,
+# one section per profile; missing file or section: built-in defaults
+INFERENCE_CONFIG = os.getenv("INFERENCE_CONFIG", "~/.config/pdm/inference.json")
+
+# ggml tensor types accepted for the KV cache (llama.cpp GGML_TYPE_* values)
+KV_CACHE_TYPES = {
+    "f32": 0,
+    "f16": 1,
+    "q4_0": 2,
+    "q4_1": 3,
+    "q5_0": 6,
+    "q5_1": 7,
+    "q8_0": 8,
+}
+
+
+def physical_cores() -> int:
+    """Best guess at physical cores; decode is memory-bound past that."""
+    logical = os.cpu_count() or 1
+    cores = set()
+    socket = None
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                key = key.strip()
+                if key == "physical id":
+                    socket = value.strip()
+                elif key == "core id":
+                    cores.add((socket, value.strip()))
+    except OSError:
+        pass
+    return max(1, min(len(cores), logical)) if cores else logical
+
+
+@dataclass
+class InferenceProfile:
+    """Llama() construction settings for one kind of host."""
+
+    name: str
+    n_gpu_layers: int = -1
+    n_batch: int = 512
+    n_ubatch: int = 512
+    # None: llama-cpp's default (half the logical cores)
+    n_threads: int | None = None
+    n_threads_batch: int | None = None
+    use_mmap: bool = True
+    use_mlock: bool = False
+    # KV cache tensor type (KV_CACHE_TYPES); quantized V needs flash_attn
+    kv_cache_type: str = "f16"
+    flash_attn: bool = False
+    # checked with nvidia-smi before loading; 0 skips the check
+    min_free_vram_mib: int = 0
+
+    def __post_init__(self):
+        if self.kv_cache_type not in KV_CACHE_TYPES:
+            raise ValueError(f"Unknown kv_cache_type: {self.kv_cache_type}")
+
+    @property
+    def uses_gpu(self) -> bool:
+        return self.n_gpu_layers != 0
+
+    def llama_kwargs(self) -> Dict[str, Any]:
+        """Keyword arguments for llama_cpp.Llama."""
+        kwargs: Dict[str, Any] = {
+            "n_gpu_layers": self.n_gpu_layers,
+            "n_batch": self.n_batch,
+            "n_ubatch": min(self.n_ubatch, self.n_batch),
+            "use_mmap": self.use_mmap,
+            "use_mlock": self.use_mlock,
+            "flash_attn": self.flash_attn,
+        }
+        if self.n_threads is not None:
+            kwargs["n_threads"] = self.n_threads
+        if self.n_threads_batch is not None:
+            kwargs["n_threads_batch"] = self.n_threads_batch
+        if self.kv_cache_type != "f16":
+            kv_type = KV_CACHE_TYPES[self.kv_cache_type]
+            kwargs["type_k"] = kv_type
+            kwargs["type_v"] = kv_type
+        return kwargs
+
+    def to_dict(self) -> Dict[str, Any]:
+        out = asdict(self)
+        del out["name"]
+        return out
+
+
+def default_profile(name: str) -> InferenceProfile:
+    if name == "gpu":
+        return InferenceProfile(
+            "gpu", n_gpu_layers=-1, min_free_vram_mib=REQUIRED_VRAM_FREE
+        )
+    if name == "cpu":
+        cores = physical_cores()
+        return InferenceProfile(
+            "cpu",
+            n_gpu_layers=0,
+            n_threads=cores,
+            n_threads_batch=os.cpu_count() or cores,
+        )
+    raise ValueError(f"Unknown INFERENCE_PROFILE: {name}")
+
+
+def _read_config(path: str) -> Dict[str, Any]:
+    path = os.path.expanduser(path)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_profile(name: str | None = None, path: str | None = None) -> InferenceProfile:
+    """
+    The built-in profile for `name` (default INFERENCE_PROFILE) with the
+    matching section of the config file applied on top. Unknown keys are
+    an error; "calibration" holds the benchmark results and is skipped.
+    """
+    name = (name or INFERENCE_PROFILE).lower()
+    profile = default_profile(name)
+    section = dict(_read_config(path or INFERENCE_CONFIG).get(name) or {})
+    section.pop("calibration", None)
+    known = {f.name for f in fields(InferenceProfile)} - {"name"}
+    unknown = set(section) - known
+    if unknown:
+        raise ValueError(f"Unknown settings for profile {name}: {sorted(unknown)}")
+    return replace(profile, **section)
+
+
+def save_profile(
+    profile: InferenceProfile,
+    path: str | None = None,
+    calibration: Dict[str, Any] | None = None,
+) -> str:
+    """Write the profile's section of the config file, keeping the others."""
+    path = os.path.expanduser(path or INFERENCE_CONFIG)
+    config = _read_config(path)
+    section = profile.to_dict()
+    if calibration is not None:
+        section["calibration"] = calibration
+    config[profile.name] = section
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+        f.write("\n")
+    os.replace(tmp, path)
+    return path
@@ -0,0 +1,84 @@
+# JSON schemas for the structured completions in Chatter._complete_json.
+# llama-cpp compiles a response_format schema into a grammar, so the model can
+# only emit an object of this shape. Keep them in step with the prompts that
+# describe the same structures.
+from typing import Any, Dict, List
+
+MEMORY_TYPES = ["npc", "location", "item", "goal", "threat", "world_state", "other"]
+WORLD_CHANGE_TYPES = [
+    "world_change",
+    "entity_change",
+    "relationship_change",
+    "knowledge_change",
+    "location_change",
+    "other",
+]
+RELATIONSHIPS = ["hostile", "friendly", "neutral", "unknown"]
+
+
+def _fact_schema(types: List[str]) -> Dict[str, Any]:
+    # "none" pairs with the NO_CHANGES summary
+    return {
+        "type": "object",
+        "properties": {
+            "summary": {"type": "string"},
+            "entities": {"type": "array", "items": {"type": "string"}},
+            "type": {"type": "string", "enum": types + ["none"]},
+            "confidence": {"type": "number"},
+        },
+        "required": ["summary", "entities", "type", "confidence"],
+    }
+
+
+NPC_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "aliases": {"type": "array", "items": {"type": "string"}},
+        "last_seen_location": {"type": "string"},
+        "intent": {"type": "string"},
+        "relationship_to_player": {"type": "string", "enum": RELATIONSHIPS},
+        "confidence": {"type": "number"},
+    },
+    "required": ["name"],
+}
+
+MEMORY_ANALYSIS_SCHEMA: Dict[str, Any] = _fact_schema(MEMORY_TYPES)
+MEMORY_ANALYSIS_SCHEMA["properties"]["npc"] = NPC_SCHEMA
+
+# several turns at once: a list of facts, empty when nothing is worth keeping
+MEMORY_BATCH_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {"facts": {"type": "array", "items": MEMORY_ANALYSIS_SCHEMA}},
+    "required": ["facts"],
+}
+
+WORLD_CHANGE_SCHEMA: Dict[str, Any] = _fact_schema(WORLD_CHANGE_TYPES)
+
+PLANNER_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "narrative_setup": {"type": "string"},
+        "consequences_now": {"type": "string"},
+        "consequences_future": {"type": "string"},
+        "rolls_needed": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "type": {"type": "string"},
+                    "target_dc": {"type": "integer"},
+                    "on_success": {"type": "string"},
+                    "on_fail": {"type": "string"},
+                },
+                "required": ["type", "target_dc", "on_success", "on_fail"],
+            },
+        },
+    },
+    "required": [
+        "narrative_setup",
+        "consequences_now",
+        "consequences_future",
+        "rolls_needed",
+    ],
+}
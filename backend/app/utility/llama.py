@@ -3,23 +3,77 @@ from __future__ import annotations
 import json
 import re
 import os
-from typing import List, cast
-from llama_cpp import (
-    Llama,
-    llama_log_set,
-    CreateChatCompletionResponse,
-    ChatCompletionRequestMessage,
-)
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, cast
 from ctypes import CFUNCTYPE, c_int, c_char_p, c_void_p
 from os.path import expanduser
 from .history import History
+from . import tracing
 from .gpu import get_free_vram_mib
+from .inference_profile import InferenceProfile, load_profile
+from .json_schemas import (
+    MEMORY_ANALYSIS_SCHEMA,
+    MEMORY_BATCH_SCHEMA,
+    PLANNER_SCHEMA,
+    WORLD_CHANGE_SCHEMA,
+)
+from .metrics import JSON_PARSE_FAILURES, JSON_REQUESTS
+from .scheduler import BACKGROUND, NARRATION, InferenceScheduler
+from .speculative import AcceptanceTracker, make_draft_model
+
+# llama_cpp loads the native library on import; it is imported when the model
+# is first loaded so importing the app (health checks, tests, tools) is fast.
+if TYPE_CHECKING:
+    from llama_cpp import (
+        Llama,
+        CreateChatCompletionResponse,
+        CreateChatCompletionStreamResponse,
+        ChatCompletionRequestMessage,
+    )
 
 MODEL_PATH = "~/dev/llm/Harbinger-24B-Q5_K_M.gguf"
 # Allow context size override via env; default to 16k for tighter history window
 MAX_TOKENS = int(os.getenv("MAX_CONTEXT_TOKENS", "16384"))
 TOKEN_BUFFER_SIZE = 2048
-MIN_FREE_VRAM_MIB = 23400  # tune this to whatever you actually need
+NO_RESPONSE_TEXT = "[No response generated]"
+# Where transient World Facts / NPC Cards go in the narration prompt:
+# - "stable_prefix": system prompt + history stay a stable prefix and the facts
+#   go right before the latest player message, so the KV cache is reused.
+# - "facts_first": facts right after the system prompt (re-prefills everything).
+PROMPT_LAYOUT = os.getenv("PROMPT_LAYOUT", "stable_prefix")
+# RAM budget for llama-cpp's prompt state cache; 0 disables it
+PROMPT_CACHE_MB = int(os.getenv("PROMPT_CACHE_MB", "2048"))
+# Narration requests allowed to wait for the model before new ones get a 429
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "8"))
+# Distinct texts whose token counts are remembered (shared by all Chatters)
+TOKEN_CACHE_SIZE = 4096
+# Per-message chat-template tokens assumed when the template can't be measured
+DEFAULT_TEMPLATE_OVERHEAD = 5
+
+# Grammar-constrain JSON completions to their schema (0: free text, parsed leniently)
+JSON_CONSTRAINED = os.getenv("JSON_CONSTRAINED", "1") != "0"
+
+# Sampling settings for DM narration (shared by chat and chat_stream)
+NARRATION_PARAMS = {
+    "max_tokens": 512,
+    "temperature": 0.7,
+    "top_p": 0.9,
+    "frequency_penalty": 0.0,
+    "presence_penalty": 0.0,
+}
+# Reply budget per turn for batched memory extraction, so a long batch's
+# facts array is not cut off (and dropped whole) at JSON_PARAMS' max_tokens
+MEMORY_TOKENS_PER_TURN = 256
+
+# Sampling settings for structured JSON completions
+JSON_PARAMS = {
+    "max_tokens": 1024,  # room for complex planner responses
+    "temperature": 0.2,
+    "top_p": 0.8,
+    "frequency_penalty": 0.0,
+    "presence_penalty": 0.0,
+}
 
 LOG_CB_TYPE = CFUNCTYPE(None, c_int, c_char_p, c_void_p)
 
@@ -29,7 +83,115 @@ def _noop_log(level, text, user_data):
 
 
 _NOOP_LOG_CB = LOG_CB_TYPE(_noop_log)
-llama_log_set(_NOOP_LOG_CB, None)  # type: ignore
+
+
+def _silence_llama_logs() -> None:
+    """Install the no-op llama.cpp log callback (before the model loads)."""
+    from llama_cpp import llama_log_set
+
+    llama_log_set(_NOOP_LOG_CB, None)  # type: ignore
+
+
+_JSON_SPECIAL = re.compile(r'[{}"\\]')
+
+
+class JsonObjectScanner:
+    """
+    Finds where the first top-level JSON object in streamed text ends.
+    Tracks brace depth outside of strings (honouring backslash escapes), so
+    braces inside string values such as "sell {rare} goods" are ignored.
+    Text before the first "{" (a code fence, say) is skipped.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        # a piece ended on a backslash inside a string
+        self.escaped = False
+        self.consumed = 0
+        self.end: int | None = None
+
+    def feed(self, text: str) -> int | None:
+        """
+        Consume the next piece of text. Returns the end offset (in all text
+        fed so far) of the first complete object once it has closed.
+        """
+        if self.end is not None or not text:
+            return self.end
+        pos = 0
+        if self.escaped:
+            self.escaped = False
+            pos = 1
+        size = len(text)
+        while True:
+            match = _JSON_SPECIAL.search(text, pos)
+            if match is None:
+                break
+            i = match.start()
+            char = text[i]
+            pos = i + 1
+            if self.in_string:
+                if char == "\\":
+                    if pos < size:
+                        pos += 1  # skip the escaped character
+                    else:
+                        self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                # strings only matter once inside the object
+                self.in_string = self.depth > 0
+            elif char == "{":
+                self.depth += 1
+            elif char == "}" and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.end = self.consumed + pos
+                    return self.end
+        self.consumed += size
+        return None
+
+
+def clean_json_text(model_text: str) -> str:
+    """Reduce a model's JSON reply to the text of its first JSON object."""
+    # Strip markdown code fences if present
+    cleaned_text = model_text.strip()
+    if cleaned_text.startswith("```json"):
+        cleaned_text = cleaned_text[7:]  # Remove ```json
+    elif cleaned_text.startswith("```"):
+        cleaned_text = cleaned_text[3:]  # Remove ```
+    if cleaned_text.endswith("```"):
+        cleaned_text = cleaned_text[:-3]  # Remove trailing ```
+    cleaned_text = cleaned_text.strip()
+
+    # Handle multiple JSON objects - take only the first one
+    if cleaned_text.startswith("{"):
+        first_obj_end = JsonObjectScanner().feed(cleaned_text)
+        if first_obj_end is not None:
+            cleaned_text = cleaned_text[:first_obj_end]
+
+    # Fix common JSON formatting errors
+    cleaned_text = cleaned_text.replace(' "confidence": 0. ', ' "confidence": 0.')
+    # Fix "confidence": 0. 95 -> "confidence": 0.95
+    cleaned_text = re.sub(
+        r'"confidence"\s*:\s*0\.\s+', '"confidence": 0.', cleaned_text
+    )
+    return cleaned_text
+
+
+def parse_json_reply(model_text: str) -> dict | None:
+    """
+    The JSON object in a model reply, or None. Grammar-constrained replies
+    parse as they are; free-text replies fall back to clean_json_text.
+    """
+    try:
+        parsed = json.loads(model_text)
+    except ValueError:
+        try:
+            parsed = json.loads(clean_json_text(model_text))
+        except ValueError:
+            return None
+    return parsed if isinstance(parsed, dict) else None
 
 
 class Chatter:
@@ -41,8 +203,15 @@ class Chatter:
 
     # class-level shared state
     _llm: Llama | None = None
+    _scheduler: InferenceScheduler | None = None
+    _speculation: AcceptanceTracker | None = None
+    profile: InferenceProfile | None = None
     _init_error: Exception | None = None
     _initialized = False  # optional clarity flag
+    # token accounting shared across instances (same model, same tokenizer)
+    _token_counts: OrderedDict[str, int] = OrderedDict()
+    _token_lock = threading.Lock()
+    _template_overhead: Dict[str, int] | None = None
 
     def __init__(self, model_path: str):
         # step 1: ensure model is initialized at class level
@@ -57,7 +226,10 @@ class Chatter:
 
         # bind the shared model handle to this instance
         # at this point _llm must be not None
-        self.llm = cast(Llama, Chatter._llm)
+        self.llm = cast("Llama", Chatter._llm)
+        # every completion goes through the scheduler; llm is used directly
+        # only for tokenization
+        self.scheduler = cast(InferenceScheduler, Chatter._scheduler)
 
         # step 2: per-instance setup (your old stuff)
         self.sysprompt_role = "system"
@@ -66,13 +238,13 @@ class Chatter:
             "You are the dungeon master. "
             "You describe the world to the player in second person present tense. "
             "You end each response with a question to the player. "
-            "If additional system messages include World Facts or NPC Cards, treat them as optional context: "
+            "If World Facts or NPC Cards are provided, treat them as optional context: "
             "use them only when directly relevant to the player's latest action and the current scene; otherwise ignore them. "
             "Do not force unrelated facts into the narrative. Prioritize the immediate scene, the player's intent, and recent dialogue."
         )
 
-        self.sysprompt_tokens = self.llm.tokenize(
-            self.sysprompt_content.encode("utf-8")
+        self.sysprompt_tokens = self._get_token_count(
+            self.sysprompt_content, role=self.sysprompt_role
         )
 
         self.token_buffer_size = TOKEN_BUFFER_SIZE
@@ -82,13 +254,13 @@ class Chatter:
             self.max_history_tokens,
             self.sysprompt_content,
             self.sysprompt_role,
-            len(self.sysprompt_tokens),
+            self.sysprompt_tokens,
         )
 
     @classmethod
     def _initialize_model(cls, model_path: str) -> None:
         """
-        Load the model into VRAM once.
+        Load the model once, on the GPU or CPU per INFERENCE_PROFILE.
         Safe to call multiple times. Only first call actually loads.
         """
         if cls._initialized:
@@ -96,89 +268,301 @@ class Chatter:
 
         cls._initialized = True  # mark that we attempted init
 
-        # check GPU first
-        free_vram = get_free_vram_mib()
-        if free_vram is None:
-            cls._init_error = RuntimeError("No GPU detected. GPU is required.")
-            return
-        if free_vram < MIN_FREE_VRAM_MIB:
-            cls._init_error = RuntimeError(
-                f"Not enough VRAM free. Free VRAM: {free_vram} MiB. "
-                f"Required: {MIN_FREE_VRAM_MIB} MiB."
-            )
+        # INFERENCE_PROFILE plus the calibrated settings from INFERENCE_CONFIG
+        try:
+            profile = load_profile()
+        except Exception as e:
+            cls._init_error = e
             return
+        cls.profile = profile
+
+        # check GPU first (the CPU profile offloads nothing)
+        if profile.uses_gpu:
+            free_vram = get_free_vram_mib()
+            if free_vram is None:
+                cls._init_error = RuntimeError(
+                    "No GPU detected. GPU is required (or set INFERENCE_PROFILE=cpu)."
+                )
+                return
+            if free_vram < profile.min_free_vram_mib:
+                cls._init_error = RuntimeError(
+                    f"Not enough VRAM free. Free VRAM: {free_vram} MiB. "
+                    f"Required: {profile.min_free_vram_mib} MiB."
+                )
+                return
 
         # try to actually build llama
         try:
+            from llama_cpp import Llama, LlamaRAMCache
+
+            _silence_llama_logs()
+            # SPECULATIVE_DECODING: None unless a mode is configured
+            draft_model = make_draft_model(n_ctx=MAX_TOKENS)
             cls._llm = Llama(
                 model_path=expanduser(model_path),
                 n_ctx=MAX_TOKENS,
-                n_gpu_layers=-1,  # put all layers on GPU
-                n_batch=512,
+                draft_model=draft_model,
                 verbose=False,
+                **profile.llama_kwargs(),
             )
         except Exception as e:
             cls._init_error = e
             cls._llm = None
+            return
+        cls._speculation = draft_model
+
+        # JSON completions between turns overwrite the KV state; the RAM cache
+        # lets the next narration restore its longest cached prefix instead.
+        if PROMPT_CACHE_MB > 0:
+            cls._llm.set_cache(
+                LlamaRAMCache(capacity_bytes=PROMPT_CACHE_MB * 1024 * 1024)
+            )
+        cls._scheduler = InferenceScheduler(cls._llm, max_queue=INFERENCE_QUEUE_SIZE)
+
+    @classmethod
+    def get_scheduler(cls) -> InferenceScheduler | None:
+        """The scheduler owning the shared model, once it has loaded."""
+        return cls._scheduler
 
-    def _get_token_count(self, content: str) -> int:
+    @classmethod
+    def speculation_stats(cls) -> dict | None:
+        """Draft acceptance so far, or None when speculative decoding is off."""
+        if cls._speculation is None:
+            return None
+        return cls._speculation.stats()
+
+    def warm_up(self) -> None:
+        """
+        Run a one-token completion on the system prompt. This allocates the
+        compute buffers and leaves the system prompt in the prompt cache
+        for the first real turn.
+        """
+        messages = self._build_messages() + [{"role": "user", "content": "Hello."}]
+        self.scheduler.complete(
+            BACKGROUND,
+            messages=messages,
+            max_tokens=1,
+            temperature=0.0,
+            stream=False,
+        )
+
+    def _count_tokens(self, content: str) -> int:
+        """Raw token count of content, tokenizing each distinct text once."""
+        cache = Chatter._token_counts
+        with Chatter._token_lock:
+            count = cache.get(content)
+            if count is not None:
+                cache.move_to_end(content)
+                return count
+
+        count = len(self.llm.tokenize(content.encode("utf-8"), add_bos=False))
+        with Chatter._token_lock:
+            cache[content] = count
+            while len(cache) > TOKEN_CACHE_SIZE:
+                cache.popitem(last=False)
+        return count
+
+    def _measure_template_overhead(self) -> Dict[str, int]:
+        """
+        Tokens the chat template adds around one message, per role: render
+        the model's template with and without a probe message and subtract
+        the probe's own tokens.
+        """
+        from llama_cpp.llama_chat_format import Jinja2ChatFormatter
+
+        template = self.llm.metadata["tokenizer.chat_template"]
+
+        def token_text(token_id: int) -> str:
+            if token_id == -1:
+                return ""
+            return self.llm._model.token_get_text(token_id)
+
+        formatter = Jinja2ChatFormatter(
+            template=template,
+            eos_token=token_text(self.llm.token_eos()),
+            bos_token=token_text(self.llm.token_bos()),
+            add_generation_prompt=False,
+        )
+
+        def rendered(messages) -> int:
+            prompt = formatter(messages=messages).prompt
+            return len(
+                self.llm.tokenize(prompt.encode("utf-8"), add_bos=False, special=True)
+            )
+
+        probe = "The quick brown fox"
+        base_messages = [
+            {"role": "system", "content": "Base."},
+            {"role": "user", "content": "Hello."},
+            {"role": "assistant", "content": "Hi."},
+        ]
+        base = rendered(base_messages)
+        probe_tokens = self._count_tokens(probe)
+        overhead: Dict[str, int] = {}
+        for role in ("user", "assistant"):
+            total = rendered(base_messages + [{"role": role, "content": probe}])
+            overhead[role] = max(0, total - base - probe_tokens)
+        # the system prompt is always first; count it as the whole render
+        overhead["system"] = max(
+            0, rendered([{"role": "system", "content": probe}]) - probe_tokens
+        )
+        return overhead
+
+    def _message_overhead(self, role: str) -> int:
+        if Chatter._template_overhead is None:
+            try:
+                measured = self._measure_template_overhead()
+            except Exception:
+                # no embedded template (or an unrenderable one)
+                measured = {}
+            Chatter._template_overhead = measured
+        return Chatter._template_overhead.get(role, DEFAULT_TEMPLATE_OVERHEAD)
+
+    def _get_token_count(
+        self, content: str, role: str = "user", completion_tokens: int | None = None
+    ) -> int:
+        """
+        Context tokens a history message will occupy: its content tokens (the
+        completion's usage count for replies, when known) plus the chat
+        template's per-message overhead.
+        """
         try:
-            tokens = self.llm.tokenize(content.encode("utf-8"))
-            return len(tokens) + 5
+            if completion_tokens is None:
+                completion_tokens = self._count_tokens(content)
+            return completion_tokens + self._message_overhead(role)
         except Exception:
             return 10
 
-    def chat(self, user_input: str, world_facts: str | None = None) -> str:
-        # record player message
-        self.history.add_message(
-            "user",
-            user_input,
-            self._get_token_count(user_input),
-        )
-
+    def _build_messages(
+        self, world_facts: str | None = None
+    ) -> List[ChatCompletionRequestMessage]:
         context = cast(
-            List[ChatCompletionRequestMessage],
+            "List[ChatCompletionRequestMessage]",
             self.history.build_context(),
         )
 
-        # If world facts are provided, prepend a transient system message
-        # with the facts to guide the model. This message is not recorded
-        # in history and applies only to this completion call.
+        # World facts are transient: they apply only to this completion
+        # call and are never recorded in history.
         messages: List[ChatCompletionRequestMessage] = context
-        if world_facts:
+        if not world_facts:
+            return messages
+
+        if PROMPT_LAYOUT == "facts_first":
             facts_msg: ChatCompletionRequestMessage = {
                 "role": "system",
                 "content": world_facts,
             }
             if messages and messages[0].get("role") == "system":
-                messages = [messages[0], facts_msg] + messages[1:]
-            else:
-                messages = [facts_msg] + messages
+                return [messages[0], facts_msg] + messages[1:]
+            return [facts_msg] + messages
+
+        # stable_prefix: the facts are folded into the latest player message,
+        # so the system prompt and earlier turns render exactly as they did
+        # in the previous turn's prompt (up to where its last message began)
+        # and stay a cached prefix. Keeping them inside a user turn also
+        # keeps strict user/assistant alternation, which Mistral-style chat
+        # templates (the default model) require after the first message.
+        if len(messages) > 1 and messages[-1].get("role") == "user":
+            latest = messages[-1]
+            folded = cast(
+                "ChatCompletionRequestMessage",
+                {"role": "user", "content": f"{world_facts}\n\n{latest['content']}"},
+            )
+            return messages[:-1] + [folded]
+        return messages + [
+            cast(
+                "ChatCompletionRequestMessage",
+                {"role": "user", "content": world_facts},
+            )
+        ]
 
-        raw_response = self.llm.create_chat_completion(
-            messages=messages,
-            max_tokens=512,
-            temperature=0.7,
-            top_p=0.9,
-            frequency_penalty=0.0,
-            presence_penalty=0.0,
-            stream=False,
-        )
+    def chat(self, user_input: str, world_facts: str | None = None) -> str:
+        with tracing.span("prompt"):
+            # record player message
+            user_message = self.history.add_message(
+                "user",
+                user_input,
+                self._get_token_count(user_input),
+            )
+            messages = self._build_messages(world_facts)
 
-        response = cast(CreateChatCompletionResponse, raw_response)
-        model_text = (
-            response["choices"][0]["message"]["content"] or "[No response generated]"
-        )
+        try:
+            raw_response = self.scheduler.complete(
+                NARRATION,
+                messages=messages,
+                stream=False,
+                **NARRATION_PARAMS,
+            )
+        except BaseException:
+            # no reply (busy, failed): a retry must not leave two user turns
+            self.history.remove_last(user_message)
+            raise
+
+        response = cast("CreateChatCompletionResponse", raw_response)
+        model_text = response["choices"][0]["message"]["content"] or NO_RESPONSE_TEXT
+        usage = response.get("usage") or {}
+        completion_tokens = usage.get("completion_tokens")
+        if model_text == NO_RESPONSE_TEXT:
+            completion_tokens = None
 
         # record assistant message
         self.history.add_message(
             "assistant",
             model_text,
-            self._get_token_count(model_text),
+            self._get_token_count(
+                model_text, role="assistant", completion_tokens=completion_tokens
+            ),
         )
 
         return model_text
 
+    def chat_stream(
+        self, user_input: str, world_facts: str | None = None
+    ) -> Iterator[str]:
+        """
+        Like chat(), but yields reply text deltas as they are decoded.
+        The full reply is recorded in history once the stream ends; if the
+        consumer stops early, whatever was generated so far is recorded. If
+        nothing was generated (busy, failed) the user message is taken back.
+        """
+        with tracing.span("prompt"):
+            user_message = self.history.add_message(
+                "user",
+                user_input,
+                self._get_token_count(user_input),
+            )
+            messages = self._build_messages(world_facts)
+
+        raw_stream = self.scheduler.stream(
+            NARRATION,
+            messages=messages,
+            **NARRATION_PARAMS,
+        )
+
+        parts: List[str] = []
+        try:
+            for chunk in cast(
+                "Iterator[CreateChatCompletionStreamResponse]", raw_stream
+            ):
+                delta = chunk["choices"][0]["delta"].get("content")
+                if delta:
+                    parts.append(delta)
+                    yield delta
+            if not parts:
+                parts.append(NO_RESPONSE_TEXT)
+                yield NO_RESPONSE_TEXT
+        finally:
+            if parts:
+                model_text = "".join(parts)
+                # stream chunks carry no usage; count the text (cached)
+                self.history.add_message(
+                    "assistant",
+                    model_text,
+                    self._get_token_count(model_text, role="assistant"),
+                )
+            else:
+                self.history.remove_last(user_message)
+
     def analyze_conversation_for_memories(
         self, conversation_context: dict
     ) -> dict | None:
@@ -232,7 +616,11 @@ class Chatter:
         )
 
         result = self._complete_json(
-            system_prompt, user_prompt, "memory_analysis", debug=True
+            system_prompt,
+            user_prompt,
+            "memory_analysis",
+            schema=MEMORY_ANALYSIS_SCHEMA,
+            debug=True,
         )
         if not result:
             return None
@@ -246,6 +634,82 @@ class Chatter:
 
         return result
 
+    def analyze_turns_for_memories(self, turns: List[dict]) -> List[dict]:
+        """
+        Extract every memorable fact from several turns in one completion.
+        turns: [{"user_message": ..., "dm_response": ...}], oldest first.
+        """
+        system_prompt = (
+            "You are analyzing several turns of a conversation between a player and DM to extract the important persistent facts.\n"
+            "Look for new information such as:\n"
+            "- New NPCs introduced (names, relationships, hostility/friendship) - HIGHEST PRIORITY\n"
+            "- Threats or dangers - HIGH PRIORITY\n"
+            "- Character goals or objectives stated by the player\n"
+            "- New locations discovered (names, descriptions)\n"
+            "- Important items mentioned\n"
+            "- World state changes\n"
+            "\n"
+            'Return ONE JSON object with a "facts" list holding one entry per distinct fact, most important first.\n'
+            "Merge repeated mentions of the same fact across turns; when a later turn changes a fact, keep only the latest version.\n"
+            "Do NOT wrap in markdown code blocks.\n"
+            "\n"
+            "Required JSON structure:\n"
+            '{"facts": [{"summary": "concise fact", "entities": ["entity1", "entity2"], '
+            '"type": "npc|location|item|goal|threat|world_state|other", '
+            '"confidence": 0.85, '
+            '"npc": {"name": "Name", "aliases": ["..."], "last_seen_location": "...", "intent": "...", "relationship_to_player": "hostile|friendly|neutral|unknown", "confidence": 0.0}}]}\n'
+            "\n"
+            'If there is NO new persistent information, return: {"facts": []}\n'
+            "\n"
+            "Good example:\n"
+            '{"facts": [{"summary": "Finnigan stalked the player near BodyShop 2077", "entities": ["MadHatter Finnigan", "BodyShop 2077"], "type": "npc", "confidence": 0.9, "npc": {"name": "MadHatter Finnigan", "aliases": ["Finnigan"], "last_seen_location": "BodyShop 2077", "intent": "hunt the player", "relationship_to_player": "hostile", "confidence": 0.9}}, '
+            '{"summary": "Player wants to upgrade their cybernetics", "entities": ["player", "cybernetics"], "type": "goal", "confidence": 0.8}]}\n'
+            "\n"
+            "What NOT to store:\n"
+            "- Generic atmosphere/descriptions\n"
+            "- Temporary moment-to-moment actions\n"
+            "\n"
+            "Rules:\n"
+            "- Prefer 'npc' type with an 'npc' object when a named character is involved.\n"
+            "- Include last_seen_location when known; infer relationship if implied (e.g., attacks -> hostile).\n"
+            "- Avoid adding generic 'player' to entities unless it adds disambiguation.\n"
+            "\n"
+            "Return ONLY the JSON object, nothing else."
+        )
+
+        transcript = "\n\n".join(
+            f"Turn {i}:\nPlayer: {turn.get('user_message', '')}\n\nDM: {turn.get('dm_response', '')}"
+            for i, turn in enumerate(turns, 1)
+        )
+        user_prompt = (
+            f"{transcript}\n\n"
+            "Extract the persistent facts from these turns that should be remembered. Return the JSON object:"
+        )
+
+        result = self._complete_json(
+            system_prompt,
+            user_prompt,
+            "memory_batch",
+            schema=MEMORY_BATCH_SCHEMA,
+            debug=True,
+            max_tokens=max(
+                JSON_PARAMS["max_tokens"], MEMORY_TOKENS_PER_TURN * len(turns)
+            ),
+        )
+        facts = result.get("facts") if result else None
+        if not isinstance(facts, list):
+            return []
+
+        required_keys = {"summary", "entities", "type", "confidence"}
+        return [
+            fact
+            for fact in facts
+            if isinstance(fact, dict)
+            and all(key in fact for key in required_keys)
+            and fact.get("summary") != "NO_CHANGES"
+            and fact.get("type") != "none"
+        ]
+
     def summarize_world_changes(
         self, planner_json: dict, resolved_outcome: dict | None = None
     ) -> dict | None:
@@ -282,7 +746,12 @@ class Chatter:
             "Return the JSON object:"
         )
 
-        result = self._complete_json(system_prompt, user_prompt, "world_change_summary")
+        result = self._complete_json(
+            system_prompt,
+            user_prompt,
+            "world_change_summary",
+            schema=WORLD_CHANGE_SCHEMA,
+        )
         if not result:
             return None
 
@@ -317,105 +786,79 @@ class Chatter:
 
         # Complete the JSON response
         result = self._complete_json(
-            system_content, user_content, "planner_response", debug=debug
+            system_content,
+            user_content,
+            "planner_response",
+            schema=PLANNER_SCHEMA,
+            debug=debug,
         )
         return result
 
     def _complete_json(
-        self, system: str, user: str, request_type: str, debug: bool = False
+        self,
+        system: str,
+        user: str,
+        request_type: str,
+        schema: Dict[str, Any] | None = None,
+        debug: bool = False,
+        max_tokens: int | None = None,
     ) -> dict | None:
-        """Complete a prompt expecting JSON response with retry on parse failure."""
+        """
+        Complete a prompt expecting one JSON object. With a schema (and
+        JSON_CONSTRAINED on) decoding is grammar-constrained to it, so the
+        reply always parses unless it hit max_tokens (JSON_PARAMS' unless
+        given); there is no retry. Generation ends as soon as the first
+        top-level object is complete.
+        """
         messages = cast(
-            List[ChatCompletionRequestMessage],
+            "List[ChatCompletionRequestMessage]",
             [{"role": "system", "content": system}, {"role": "user", "content": user}],
         )
-
-        for attempt in range(2):
+        params: Dict[str, Any] = dict(JSON_PARAMS)
+        if max_tokens is not None:
+            params["max_tokens"] = max_tokens
+        if schema is not None and JSON_CONSTRAINED:
+            params["response_format"] = {"type": "json_object", "schema": schema}
+        JSON_REQUESTS.inc(request_type=request_type)
+
+        # stream, and stop decoding the moment the first object closes;
+        # anything the model would write after it is discarded anyway
+        scanner = JsonObjectScanner()
+        parts: List[str] = []
+        try:
+            raw_stream = self.scheduler.stream(BACKGROUND, messages=messages, **params)
             try:
-                raw_response = self.llm.create_chat_completion(
-                    messages=messages,
-                    max_tokens=1024,  # Increased to handle complex planner responses
-                    temperature=0.2,
-                    top_p=0.8,
-                    frequency_penalty=0.0,
-                    presence_penalty=0.0,
-                    stream=False,
-                )
-
-                response = cast(CreateChatCompletionResponse, raw_response)
-                model_text = response["choices"][0]["message"]["content"] or ""
-
-                if debug:
-                    print(f"\n[{request_type}] Attempt {attempt + 1} - Raw response:")
-                    print(
-                        f"  Text: {model_text[:200]}{'...' if len(model_text) > 200 else ''}"
-                    )
-
-                # Strip markdown code fences if present
-                cleaned_text = model_text.strip()
-                if cleaned_text.startswith("```json"):
-                    cleaned_text = cleaned_text[7:]  # Remove ```json
-                elif cleaned_text.startswith("```"):
-                    cleaned_text = cleaned_text[3:]  # Remove ```
-                if cleaned_text.endswith("```"):
-                    cleaned_text = cleaned_text[:-3]  # Remove trailing ```
-                cleaned_text = cleaned_text.strip()
-
-                # Handle multiple JSON objects - take only the first one
-                # Find the first complete JSON object
-                if cleaned_text.startswith("{"):
-                    brace_count = 0
-                    first_obj_end = -1
-                    for i, char in enumerate(cleaned_text):
-                        if char == "{":
-                            brace_count += 1
-                        elif char == "}":
-                            brace_count -= 1
-                            if brace_count == 0:
-                                first_obj_end = i + 1
-                                break
-
-                    if first_obj_end > 0:
-                        cleaned_text = cleaned_text[:first_obj_end]
-
-                # Fix common JSON formatting errors
-                cleaned_text = cleaned_text.replace(
-                    ' "confidence": 0. ', ' "confidence": 0.'
-                )
-                # Fix "confidence": 0. 95 -> "confidence": 0.95
-                cleaned_text = re.sub(
-                    r'"confidence"\s*:\s*0\.\s+', '"confidence": 0.', cleaned_text
-                )
-
-                # Try to parse as JSON
-                try:
-                    parsed = json.loads(cleaned_text)
-                    if isinstance(parsed, dict):
-                        if debug:
-                            print("  ✓ Valid JSON parsed")
-                        return parsed
-                    elif debug:
-                        print(f"  ✗ Parsed but not a dict: {type(parsed)}")
-                except json.JSONDecodeError as e:
-                    if debug:
-                        print(f"  ✗ JSON parse error: {e}")
-                    if attempt == 0:
-                        # Retry with correction prompt
-                        correction_prompt = (
-                            f"Previous response was not valid JSON: {model_text[:100]}...\n"
-                            "Please return ONLY a valid JSON object with the required structure."
-                        )
-                        messages.append({"role": "assistant", "content": model_text})
-                        messages.append({"role": "user", "content": correction_prompt})
-                        continue
-                    return None
-
-            except Exception as e:
-                if debug:
-                    print(f"  ✗ Exception during generation: {e}")
-                return None
+                for chunk in cast(
+                    "Iterator[CreateChatCompletionStreamResponse]", raw_stream
+                ):
+                    delta = chunk["choices"][0]["delta"].get("content")
+                    if delta:
+                        parts.append(delta)
+                        if scanner.feed(delta) is not None:
+                            break
+            finally:
+                raw_stream.close()
+        except Exception as e:
+            if debug:
+                print(f"  ✗ Exception during generation: {e}")
+            return None
 
-        return None
+        model_text = "".join(parts)
+        if scanner.end is not None:
+            model_text = model_text[: scanner.end]
+        if debug:
+            print(f"\n[{request_type}] Raw response:")
+            print(f"  Text: {model_text[:200]}{'...' if len(model_text) > 200 else ''}")
+
+        parsed = parse_json_reply(model_text)
+        if parsed is None:
+            JSON_PARSE_FAILURES.inc(request_type=request_type)
+            if debug:
+                print("  ✗ Reply is not a JSON object")
+            return None
+        if debug:
+            print("  ✓ Valid JSON parsed")
+        return parsed
 
     def _safe_truncate(self, text: str, max_tokens: int) -> str:
         """Truncate text to approximately max_tokens, preserving word boundaries."""
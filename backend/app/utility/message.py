@@ -1,4 +1,6 @@
 # message.py
+import sys
+import time
 from datetime import datetime
 from typing import Optional
 
@@ -8,12 +10,16 @@ class Message:
     This is used to represent a message in the history.
     - Tokens is the approximate token count of the message.
     - The caller is responsible for calculating the tokens.
+    - Storage is compact: slots instead of a per-instance __dict__, an interned
+      role, and the timestamp kept as epoch seconds (exposed as a datetime).
 
     Mutation Policy:
     - After initialization, the 'role', 'content', 'tokens', 'timestamp', 'id' should be treated as immutable.
     - Only active should be mutated.
     """
 
+    __slots__ = ("role", "content", "tokens", "id", "active", "epoch")
+
     def __init__(
         self,
         role: str,
@@ -21,15 +27,24 @@ class Message:
         tokens: int,
         msg_id: Optional[int] = None,
         active: bool = True,
-        timestamp: Optional[datetime] = None,
+        timestamp: Optional[datetime | float] = None,
     ):
-        self.role = role
+        self.role = sys.intern(role)
         self.content = content
         self.tokens = tokens
         self.id = msg_id
-        self.timestamp = timestamp if timestamp is not None else datetime.now()
+        if timestamp is None:
+            self.epoch = time.time()
+        elif isinstance(timestamp, datetime):
+            self.epoch = timestamp.timestamp()
+        else:
+            self.epoch = float(timestamp)
         self.active = active
 
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.fromtimestamp(self.epoch)
+
     def deactivate(self) -> None:
         self.active = False
 
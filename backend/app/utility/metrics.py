@@ -0,0 +1,270 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+from . import tracing
+
+# Seconds; covers a cache-hit embedding (~ms) up to a long JSON completion
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+# Tokens per second for prefill and decode
+RATE_BUCKETS = (1, 2, 5, 10, 20, 35, 50, 75, 100, 200, 500, 1000, 2000, 5000)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(key: LabelKey, extra: Tuple[str, str] | None = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help_text: str, buckets: Iterable[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> (per-bucket counts, sum, count)
+        self._series: Dict[LabelKey, List] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the wall time of the block (also when it raises)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            return series[2] if series else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(
+                (k, (list(s[0]), s[1], s[2])) for k, s in self._series.items()
+            )
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = ("le", _format_value(bound))
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(key, le)} {cumulative}"
+                )
+            inf = ("le", "+Inf")
+            lines.append(f"{self.name}_bucket{_format_labels(key, inf)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+# A collector returns (name, help, kind, [(labels, value), ...]) families,
+# read at scrape time (sizes and stats that already live elsewhere)
+Family = Tuple[str, str, str, List[Tuple[Dict[str, object], float]]]
+Collector = Callable[[], Iterable[Family]]
+
+
+class Registry:
+    """
+    Process-wide metrics rendered in the Prometheus text exposition format
+    (version 0.0.4), so any Prometheus-compatible scraper can read /metrics
+    without a client library.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Collector] = []
+
+    def _get_or_add(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is None:
+                self._metrics[metric.name] = metric
+                return metric
+        if type(existing) is not type(metric):
+            raise ValueError(f"Metric {metric.name} already registered as another type")
+        return existing
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._get_or_add(Counter(name, help_text))  # type: ignore[return-value]
+
+    def histogram(
+        self, name: str, help_text: str, buckets: Iterable[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._get_or_add(  # type: ignore[return-value]
+            Histogram(name, help_text, buckets)
+        )
+
+    def add_collector(self, collector: Collector) -> None:
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        for collector in collectors:
+            try:
+                families = list(collector())
+            except Exception:
+                # Fail-closed; a broken collector must not break the scrape
+                continue
+            for name, help_text, kind, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    key = _label_key(labels)
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Shared series; the modules that record them import these names
+TURN_STAGE_SECONDS = REGISTRY.histogram(
+    "pdm_turn_stage_seconds",
+    "Wall time of each stage of a chat turn.",
+)
+TURN_SECONDS = REGISTRY.histogram(
+    "pdm_turn_seconds",
+    "Wall time of a whole chat turn, by endpoint mode.",
+)
+LLM_COMPLETION_SECONDS = REGISTRY.histogram(
+    "pdm_llm_completion_seconds",
+    "Time the model was held by one completion, by scheduler priority.",
+)
+LLM_FIRST_TOKEN_SECONDS = REGISTRY.histogram(
+    "pdm_llm_first_token_seconds",
+    "Streamed completions: time from holding the model to the first token (prefill).",
+)
+LLM_PROMPT_TOKENS = REGISTRY.counter(
+    "pdm_llm_prompt_tokens_total",
+    "Prompt tokens reported by non-streamed completions.",
+)
+LLM_COMPLETION_TOKENS = REGISTRY.counter(
+    "pdm_llm_completion_tokens_total",
+    "Generated tokens (usage for completions, chunk count for streams).",
+)
+LLM_TOKENS_PER_SECOND = REGISTRY.histogram(
+    "pdm_llm_tokens_per_second",
+    "Generated tokens per second; phase is decode (streams) or overall.",
+    buckets=RATE_BUCKETS,
+)
+JSON_REQUESTS = REGISTRY.counter(
+    "pdm_json_requests_total",
+    "JSON completions requested, by request type.",
+)
+JSON_PARSE_FAILURES = REGISTRY.counter(
+    "pdm_json_parse_failures_total",
+    "JSON completions whose reply did not parse as an object (e.g. cut off at max_tokens).",
+)
+EMBED_SECONDS = REGISTRY.histogram(
+    "pdm_embedding_seconds",
+    "Embedding model forward passes (cache misses only).",
+)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time one turn stage into pdm_turn_stage_seconds and the active trace."""
+    with TURN_STAGE_SECONDS.time(stage=name), tracing.span(name):
+        yield
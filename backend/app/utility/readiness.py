@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, Tuple
+
+PENDING = "pending"
+LOADING = "loading"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+
+# name -> (load, warm_up); warm_up may be None
+ComponentSpec = Dict[str, Tuple[Callable[[], object], Callable[[], object] | None]]
+
+
+class Readiness:
+    """
+    Load state of the heavy components (LLM, embedder) for /ready.
+    Each component goes pending -> loading -> warming -> ready, or failed,
+    with load and warm-up timings recorded along the way.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._components: Dict[str, dict] = {}
+
+    def register(self, name: str) -> None:
+        with self._lock:
+            self._components.setdefault(
+                name,
+                {
+                    "state": PENDING,
+                    "load_sec": None,
+                    "warmup_sec": None,
+                    "error": None,
+                },
+            )
+
+    def _update(self, name: str, **fields) -> None:
+        with self._lock:
+            self._components[name].update(fields)
+
+    def run(
+        self,
+        name: str,
+        load: Callable[[], object],
+        warm_up: Callable[[], object] | None = None,
+    ) -> bool:
+        """Load then warm up one component, recording state; never raises."""
+        self.register(name)
+        self._update(name, state=LOADING, error=None)
+        start = time.perf_counter()
+        try:
+            load()
+            loaded = time.perf_counter()
+            self._update(name, state=WARMING, load_sec=round(loaded - start, 3))
+            if warm_up is not None:
+                warm_up()
+            self._update(
+                name,
+                state=READY,
+                warmup_sec=round(time.perf_counter() - loaded, 3),
+            )
+            return True
+        except Exception as e:
+            self._update(name, state=FAILED, error=str(e))
+            return False
+
+    async def preload(self, components: ComponentSpec) -> bool:
+        """Load every component concurrently in worker threads."""
+        for name in components:
+            self.register(name)
+        results = await asyncio.gather(
+            *(
+                asyncio.to_thread(self.run, name, load, warm_up)
+                for name, (load, warm_up) in components.items()
+            )
+        )
+        return all(results)
+
+    def is_ready(self) -> bool:
+        with self._lock:
+            return bool(self._components) and all(
+                c["state"] == READY for c in self._components.values()
+            )
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            components = {name: dict(c) for name, c in self._components.items()}
+        ready = bool(components) and all(
+            c["state"] == READY for c in components.values()
+        )
+        return {"ready": ready, "components": components}
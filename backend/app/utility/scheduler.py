@@ -0,0 +1,346 @@
+import itertools
+import math
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+
+from . import tracing
+from .metrics import (
+    LLM_COMPLETION_SECONDS,
+    LLM_COMPLETION_TOKENS,
+    LLM_FIRST_TOKEN_SECONDS,
+    LLM_PROMPT_TOKENS,
+    LLM_TOKENS_PER_SECOND,
+)
+
+# Lower value runs first
+NARRATION = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {NARRATION: "narration", BACKGROUND: "background"}
+
+
+class SchedulerBusy(RuntimeError):
+    """Raised when the narration queue is full; retry_after is in seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Inference queue is full; retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class _StreamFailure:
+    """An exception raised on the decoding thread, re-raised to the consumer."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+_STREAM_END = object()
+
+
+class _WaitStats:
+    def __init__(self):
+        self.count = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_hold = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_wait_sec": self.total_wait / self.count if self.count else 0.0,
+            "max_wait_sec": self.max_wait,
+            "avg_hold_sec": self.total_hold / self.count if self.count else 0.0,
+        }
+
+
+def _has_content(chunk: Any) -> bool:
+    try:
+        return bool(chunk["choices"][0]["delta"].get("content"))
+    except (KeyError, IndexError, TypeError, AttributeError):
+        return False
+
+
+def _llama_ctx(llm: Any) -> Any:
+    return getattr(getattr(llm, "_ctx", None), "ctx", None)
+
+
+def _reset_perf(llm: Any) -> None:
+    """Zero llama.cpp's prompt/eval timers before a traced completion."""
+    ctx = _llama_ctx(llm)
+    if ctx is None:
+        return
+    try:
+        import llama_cpp
+
+        llama_cpp.llama_perf_context_reset(ctx)
+    except Exception:
+        pass
+
+
+def _perf_split(llm: Any) -> Tuple[float, float] | None:
+    """(prefill, decode) seconds of the last completion, when llama.cpp has them."""
+    ctx = _llama_ctx(llm)
+    if ctx is None:
+        return None
+    try:
+        import llama_cpp
+
+        perf = llama_cpp.llama_perf_context(ctx)
+        return perf.t_p_eval_ms / 1000.0, perf.t_eval_ms / 1000.0
+    except Exception:
+        return None
+
+
+def _trace_completion(
+    trace: "tracing.Trace", llm: Any, response: Any, start: float, elapsed: float
+) -> None:
+    """
+    Prefill and decode spans for a non-streamed completion, split by
+    llama.cpp's own timers; a single completion span when they are missing.
+    """
+    usage = (response.get("usage") if isinstance(response, dict) else None) or {}
+    prompt = usage.get("prompt_tokens")
+    completion = usage.get("completion_tokens")
+    split = _perf_split(llm)
+    if split is None:
+        trace.add(
+            "completion",
+            start,
+            elapsed,
+            prompt_tokens=prompt,
+            completion_tokens=completion,
+        )
+        return
+    prefill, decode = split
+    trace.add("prefill", start, prefill, prompt_tokens=prompt)
+    trace.add("decode", start + prefill, decode, completion_tokens=completion)
+
+
+def _observe_completion(kind: str, response: Any, elapsed: float) -> None:
+    """Token counts and throughput from a completion's usage block."""
+    LLM_COMPLETION_SECONDS.observe(elapsed, priority=kind)
+    usage = response.get("usage") if isinstance(response, dict) else None
+    if not usage:
+        return
+    prompt = usage.get("prompt_tokens") or 0
+    completion = usage.get("completion_tokens") or 0
+    LLM_PROMPT_TOKENS.inc(prompt, priority=kind)
+    LLM_COMPLETION_TOKENS.inc(completion, priority=kind)
+    if elapsed > 0 and completion:
+        LLM_TOKENS_PER_SECOND.observe(
+            completion / elapsed, priority=kind, phase="overall"
+        )
+
+
+class InferenceScheduler:
+    """
+    Owns the shared Llama instance and serializes every completion on it.
+    - Waiters are served by priority (NARRATION before BACKGROUND), then FIFO.
+    - A BACKGROUND waiter older than background_max_wait is promoted so JSON
+      tasks cannot starve under sustained narration load.
+    - At most max_queue NARRATION requests may wait; more raise SchedulerBusy.
+      BACKGROUND work is never rejected (its producers are bounded already).
+    """
+
+    def __init__(self, llm: Any, max_queue: int = 8, background_max_wait: float = 30.0):
+        self.llm = llm
+        self.max_queue = max_queue
+        self.background_max_wait = background_max_wait
+        self._cond = threading.Condition()
+        self._busy = False
+        self._seq = itertools.count()
+        # (priority, seq, enqueued_at)
+        self._waiters: List[Tuple[int, int, float]] = []
+        self._stats: Dict[int, _WaitStats] = {p: _WaitStats() for p in PRIORITY_NAMES}
+        self.rejected = 0
+
+    def _effective(self, waiter: Tuple[int, int, float], now: float) -> Tuple[int, int]:
+        priority, seq, enqueued = waiter
+        if priority == BACKGROUND and now - enqueued >= self.background_max_wait:
+            priority = NARRATION
+        return (priority, seq)
+
+    def _next_waiter(self) -> Tuple[int, int, float] | None:
+        if not self._waiters:
+            return None
+        now = time.monotonic()
+        return min(self._waiters, key=lambda w: self._effective(w, now))
+
+    def _narration_waiting(self) -> int:
+        return sum(1 for w in self._waiters if w[0] == NARRATION)
+
+    def _retry_after(self) -> int:
+        hold = self._stats[NARRATION].as_dict()["avg_hold_sec"] or 1.0
+        return max(1, math.ceil(hold * (self._narration_waiting() + 1)))
+
+    def check_admission(self) -> None:
+        """Raise SchedulerBusy if a new narration request would be rejected."""
+        with self._cond:
+            if self._busy and self._narration_waiting() >= self.max_queue:
+                self.rejected += 1
+                raise SchedulerBusy(self._retry_after())
+
+    @contextmanager
+    def slot(self, priority: int = NARRATION) -> Iterator[Any]:
+        """Hold exclusive use of the model for the duration of the block."""
+        enqueued = time.monotonic()
+        with self._cond:
+            if (
+                priority == NARRATION
+                and self._busy
+                and self._narration_waiting() >= self.max_queue
+            ):
+                self.rejected += 1
+                raise SchedulerBusy(self._retry_after())
+            waiter = (priority, next(self._seq), enqueued)
+            self._waiters.append(waiter)
+            try:
+                while self._busy or self._next_waiter() is not waiter:
+                    self._cond.wait()
+            finally:
+                self._waiters.remove(waiter)
+            self._busy = True
+            acquired = time.monotonic()
+            stats = self._stats[priority]
+            stats.count += 1
+            stats.total_wait += acquired - enqueued
+            stats.max_wait = max(stats.max_wait, acquired - enqueued)
+
+        try:
+            yield self.llm
+        finally:
+            with self._cond:
+                self._busy = False
+                stats.total_hold += time.monotonic() - acquired
+                self._cond.notify_all()
+
+    def complete(self, priority: int = NARRATION, **kwargs) -> Any:
+        """create_chat_completion(**kwargs) once the model is free."""
+        trace = tracing.current()
+        enqueued = time.perf_counter()
+        with self.slot(priority) as llm:
+            start = time.perf_counter()
+            if trace is not None:
+                trace.add("queue_wait", enqueued, start - enqueued)
+                _reset_perf(llm)
+            response = llm.create_chat_completion(**kwargs)
+            elapsed = time.perf_counter() - start
+            if trace is not None:
+                _trace_completion(trace, llm, response, start, elapsed)
+        _observe_completion(PRIORITY_NAMES[priority], response, elapsed)
+        return response
+
+    def stream(self, priority: int = NARRATION, **kwargs) -> Iterator[Any]:
+        """
+        Streamed create_chat_completion. Decoding runs on its own thread and
+        chunks are buffered, so the model is held only while it generates: a
+        slow consumer never keeps it from other requests. Closing the
+        iterator early (client gone, JSON object complete) stops decoding at
+        the next token. Errors, including SchedulerBusy, are raised by the
+        first next().
+        """
+        kind = PRIORITY_NAMES[priority]
+        trace = tracing.current()
+        enqueued = time.perf_counter()
+        chunks: "queue.Queue[Any]" = queue.Queue()
+        cancel = threading.Event()
+        started = threading.Event()
+        # start, first (content chunk), end, count
+        timing: Dict[str, Any] = {"first": None, "count": 0}
+
+        def produce() -> None:
+            try:
+                with self.slot(priority) as llm:
+                    if cancel.is_set():
+                        # consumer left while queued; hand the model back
+                        return
+                    timing["start"] = time.perf_counter()
+                    started.set()
+                    completion = llm.create_chat_completion(stream=True, **kwargs)
+                    try:
+                        for chunk in completion:
+                            if _has_content(chunk):
+                                if timing["first"] is None:
+                                    timing["first"] = time.perf_counter()
+                                timing["count"] += 1
+                            chunks.put(chunk)
+                            if cancel.is_set():
+                                break
+                    finally:
+                        # ends decoding while the model is still held
+                        close = getattr(completion, "close", None)
+                        if close is not None:
+                            close()
+                        timing["end"] = time.perf_counter()
+            except BaseException as e:
+                chunks.put(_StreamFailure(e))
+            finally:
+                chunks.put(_STREAM_END)
+
+        producer = threading.Thread(
+            target=produce, name="inference-stream", daemon=True
+        )
+        producer.start()
+        try:
+            while True:
+                item = chunks.get()
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, _StreamFailure):
+                    raise item.error
+                yield item
+        finally:
+            cancel.set()
+            if started.is_set():
+                # at most one more token; then the timings are final
+                producer.join()
+            if "end" in timing:
+                self._record_stream(kind, trace, enqueued, timing)
+
+    @staticmethod
+    def _record_stream(
+        kind: str,
+        trace: "tracing.Trace | None",
+        enqueued: float,
+        timing: Dict[str, Any],
+    ) -> None:
+        start, first, end = timing["start"], timing["first"], timing["end"]
+        count = timing["count"]
+        LLM_COMPLETION_SECONDS.observe(end - start, priority=kind)
+        if first is not None:
+            LLM_FIRST_TOKEN_SECONDS.observe(first - start, priority=kind)
+            # llama-cpp streams one content chunk per generated token
+            LLM_COMPLETION_TOKENS.inc(count, priority=kind)
+            if count > 1 and end > first:
+                LLM_TOKENS_PER_SECOND.observe(
+                    (count - 1) / (end - first), priority=kind, phase="decode"
+                )
+        if trace is not None:
+            trace.add("queue_wait", enqueued, start - enqueued)
+            # time to the first token is prefill (plus one decode step)
+            prefill_end = first if first is not None else end
+            trace.add("prefill", start, prefill_end - start)
+            trace.add(
+                "decode",
+                prefill_end,
+                end - prefill_end,
+                completion_tokens=count,
+            )
+
+    def depth(self) -> int:
+        with self._cond:
+            return len(self._waiters)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "busy": self._busy,
+                "waiting": len(self._waiters),
+                "max_queue": self.max_queue,
+                "rejected": self.rejected,
+                "priorities": {
+                    name: self._stats[p].as_dict() for p, name in PRIORITY_NAMES.items()
+                },
+            }
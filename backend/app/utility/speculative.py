@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import os
+import threading
+from os.path import expanduser
+from typing import TYPE_CHECKING, Any, Callable
+
+import numpy as np
+
+from .metrics import REGISTRY
+
+if TYPE_CHECKING:
+    from llama_cpp import Llama
+
+# Speculative decoding for the shared model: "off" (default), "prompt_lookup"
+# (draft tokens copied from n-gram matches in the prompt, no extra model) or
+# "draft" (a small model from the same family proposes the tokens)
+SPECULATIVE_DECODING = os.getenv("SPECULATIVE_DECODING", "off").lower()
+# Tokens proposed per step
+SPECULATIVE_NUM_PRED_TOKENS = int(os.getenv("SPECULATIVE_NUM_PRED_TOKENS", "10"))
+# Longest n-gram prompt lookup tries to match
+SPECULATIVE_MAX_NGRAM = int(os.getenv("SPECULATIVE_MAX_NGRAM", "2"))
+# Draft model (must share the main model's tokenizer)
+DRAFT_MODEL_PATH = os.getenv("DRAFT_MODEL_PATH")
+DRAFT_GPU_LAYERS = int(os.getenv("DRAFT_GPU_LAYERS", "-1"))
+
+DRAFT_TOKENS = REGISTRY.counter(
+    "pdm_speculative_draft_tokens_total",
+    "Tokens proposed by the speculative draft (resolved proposals only).",
+)
+ACCEPTED_TOKENS = REGISTRY.counter(
+    "pdm_speculative_accepted_tokens_total",
+    "Proposed tokens the main model accepted.",
+)
+
+DraftFn = Callable[..., np.ndarray]
+
+
+class SmallModelDraft:
+    """
+    Draft tokens from a small model: greedy-decode num_pred_tokens past the
+    main model's context. Llama.generate reuses the longest cached prefix,
+    so each step only evaluates the tokens added since the previous one.
+    Called as a llama-cpp draft model (duck-typed LlamaDraftModel).
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        num_pred_tokens: int = 8,
+        n_ctx: int = 4096,
+        n_gpu_layers: int = -1,
+    ):
+        from llama_cpp import Llama
+
+        self.num_pred_tokens = num_pred_tokens
+        self.llm: Llama = Llama(
+            model_path=expanduser(model_path),
+            n_ctx=n_ctx,
+            n_gpu_layers=n_gpu_layers,
+            verbose=False,
+        )
+
+    def __call__(self, input_ids: np.ndarray, /, **kwargs: Any) -> np.ndarray:
+        tokens = [int(t) for t in input_ids]
+        room = self.llm.n_ctx() - len(tokens)
+        limit = min(self.num_pred_tokens, room)
+        draft = []
+        if limit > 0:
+            for token in self.llm.generate(tokens, top_k=1, temp=0.0, reset=True):
+                draft.append(token)
+                if len(draft) >= limit:
+                    break
+        return np.array(draft, dtype=np.intc)
+
+
+class AcceptanceTracker:
+    """
+    Wraps a draft model and infers how many proposals the main model kept.
+    llama-cpp calls the draft once per verification step with the committed
+    context plus the newly sampled token, so between two calls the context
+    grows by (accepted drafts + 1). Proposals still open when a completion
+    ends, or followed by an unrelated context, are not counted.
+    """
+
+    def __init__(self, draft: DraftFn, name: str):
+        self.draft = draft
+        self.name = name
+        self._lock = threading.Lock()
+        self._last_len = 0
+        self._last_token: int | None = None
+        self._pending = 0
+        self.proposed = 0
+        self.accepted = 0
+        self.steps = 0
+
+    def _resolve(self, input_ids: np.ndarray) -> None:
+        if not self._pending:
+            return
+        grown = len(input_ids) - self._last_len
+        continues = (
+            grown >= 1
+            and grown - 1 <= self._pending
+            and int(input_ids[self._last_len - 1]) == self._last_token
+        )
+        if continues:
+            accepted = grown - 1
+            self.proposed += self._pending
+            self.accepted += accepted
+            self.steps += 1
+            DRAFT_TOKENS.inc(self._pending, mode=self.name)
+            ACCEPTED_TOKENS.inc(accepted, mode=self.name)
+        self._pending = 0
+
+    def __call__(self, input_ids: np.ndarray, /, **kwargs: Any) -> np.ndarray:
+        draft = self.draft(input_ids, **kwargs)
+        with self._lock:
+            self._resolve(input_ids)
+            self._last_len = len(input_ids)
+            self._last_token = int(input_ids[-1]) if len(input_ids) else None
+            self._pending = len(draft)
+        return draft
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "mode": self.name,
+                "steps": self.steps,
+                "proposed": self.proposed,
+                "accepted": self.accepted,
+                "acceptance_rate": (
+                    self.accepted / self.proposed if self.proposed else 0.0
+                ),
+                "accepted_per_step": self.accepted / self.steps if self.steps else 0.0,
+            }
+
+
+def make_draft_model(
+    mode: str | None = None, n_ctx: int = 4096
+) -> AcceptanceTracker | None:
+    """The draft model for Llama(draft_model=...) per SPECULATIVE_DECODING."""
+    mode = (mode or SPECULATIVE_DECODING).lower()
+    if mode in ("", "off", "0", "none"):
+        return None
+    if mode == "prompt_lookup":
+        from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
+
+        return AcceptanceTracker(
+            LlamaPromptLookupDecoding(
+                max_ngram_size=SPECULATIVE_MAX_NGRAM,
+                num_pred_tokens=SPECULATIVE_NUM_PRED_TOKENS,
+            ),
+            mode,
+        )
+    if mode == "draft":
+        if not DRAFT_MODEL_PATH:
+            raise ValueError("SPECULATIVE_DECODING=draft needs DRAFT_MODEL_PATH")
+        return AcceptanceTracker(
+            SmallModelDraft(
+                DRAFT_MODEL_PATH,
+                num_pred_tokens=SPECULATIVE_NUM_PRED_TOKENS,
+                n_ctx=n_ctx,
+                n_gpu_layers=DRAFT_GPU_LAYERS,
+            ),
+            mode,
+        )
+    raise ValueError(f"Unknown SPECULATIVE_DECODING mode: {mode}")
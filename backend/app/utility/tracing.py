@@ -0,0 +1,270 @@
+import json
+import logging
+import logging.handlers
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, ContextManager, Dict, Iterator, List, TypeVar
+
+# Request header that asks for the turn's trace in the response
+TRACE_HEADER = "X-Debug-Trace"
+# Rotating JSONL log of traced turns (unset: only header-requested turns are traced)
+TRACE_LOG = os.getenv("TRACE_LOG") or None
+TRACE_LOG_MAX_MB = float(os.getenv("TRACE_LOG_MAX_MB", "20"))
+TRACE_LOG_BACKUPS = int(os.getenv("TRACE_LOG_BACKUPS", "3"))
+# Fraction of turns written to TRACE_LOG
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+
+T = TypeVar("T")
+
+
+class Trace:
+    """
+    Nested timed spans for one chat turn (or one background job).
+    Spans are kept as a tree of dicts; offsets and durations are in ms from
+    the start of the trace. A Trace is only touched by the thread currently
+    running its turn, so it needs no lock.
+    """
+
+    def __init__(self, name: str, trace_id: str | None = None, **attrs: Any):
+        self.trace_id = trace_id or uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = attrs
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.duration_ms: float | None = None
+        self.spans: List[Dict[str, Any]] = []
+        self._stack: List[Dict[str, Any]] = []
+
+    def _ms(self, t: float) -> float:
+        return round((t - self._t0) * 1000.0, 3)
+
+    def _children(self) -> List[Dict[str, Any]]:
+        return self._stack[-1]["children"] if self._stack else self.spans
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+        """Time the block as a child of the innermost open span."""
+        node: Dict[str, Any] = {"name": name, "start_ms": self._ms(time.perf_counter())}
+        node.update(attrs)
+        node["children"] = []
+        self._children().append(node)
+        self._stack.append(node)
+        start = time.perf_counter()
+        try:
+            yield node
+        finally:
+            node["duration_ms"] = round((time.perf_counter() - start) * 1000.0, 3)
+            # tolerate a span closed out of order (e.g. an abandoned generator)
+            if node in self._stack:
+                del self._stack[self._stack.index(node) :]
+
+    def add(self, name: str, start: float, duration: float, **attrs: Any) -> None:
+        """Record an already-measured span (perf_counter start, seconds)."""
+        node: Dict[str, Any] = {
+            "name": name,
+            "start_ms": self._ms(start),
+            "duration_ms": round(duration * 1000.0, 3),
+        }
+        node.update(attrs)
+        node["children"] = []
+        self._children().append(node)
+
+    def annotate(self, **attrs: Any) -> None:
+        """Set attributes on the innermost open span (or the trace)."""
+        if self._stack:
+            self._stack[-1].update(attrs)
+        else:
+            self.attrs.update(attrs)
+
+    def finish(self) -> None:
+        if self.duration_ms is None:
+            self.duration_ms = self._ms(time.perf_counter())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            **self.attrs,
+            "spans": _prune(self.spans),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), separators=(",", ":"), default=str)
+
+
+def _prune(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    out = []
+    for node in spans:
+        node = dict(node)
+        children = node.pop("children", [])
+        if children:
+            node["children"] = _prune(children)
+        out.append(node)
+    return out
+
+
+_current: ContextVar[Trace | None] = ContextVar("pdm_trace", default=None)
+_NOOP = nullcontext()
+
+
+def current() -> Trace | None:
+    return _current.get()
+
+
+def span(name: str, **attrs: Any) -> ContextManager:
+    """
+    Child span of the active trace; a shared no-op when nothing is traced,
+    so instrumented code costs one context-variable read.
+    """
+    trace = _current.get()
+    if trace is None:
+        return _NOOP
+    return trace.span(name, **attrs)
+
+
+def annotate(**attrs: Any) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.annotate(**attrs)
+
+
+@contextmanager
+def activate(trace: Trace | None) -> Iterator[Trace | None]:
+    """Make `trace` the active trace for the block (no-op for None)."""
+    if trace is None:
+        yield None
+        return
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+def traced_iter(trace: Trace | None, iterator: Iterator[T]) -> Iterator[T]:
+    """
+    Re-activate `trace` around every step of a generator. Starlette runs
+    each step of a streaming body in a fresh context, so a trace set in one
+    step would otherwise be gone in the next.
+    """
+    if trace is None:
+        yield from iterator
+        return
+    while True:
+        with activate(trace):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+class TraceLog:
+    """Append finished traces as JSON lines to a size-rotated file."""
+
+    def __init__(self, path: str, max_mb: float = 20.0, backups: int = 3):
+        self.path = os.path.expanduser(path)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._handler = logging.handlers.RotatingFileHandler(
+            self.path,
+            maxBytes=int(max_mb * 1024 * 1024),
+            backupCount=backups,
+            encoding="utf-8",
+            delay=True,
+        )
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+        self._lock = threading.Lock()
+
+    def write(self, trace: Trace) -> None:
+        record = logging.LogRecord(
+            "pdm.trace", logging.INFO, __file__, 0, trace.to_json(), None, None
+        )
+        with self._lock:
+            self._handler.emit(record)
+
+    def close(self) -> None:
+        with self._lock:
+            self._handler.close()
+
+
+_log: TraceLog | None = None
+_log_lock = threading.Lock()
+
+
+def get_trace_log() -> TraceLog | None:
+    """The TRACE_LOG writer, opened on first use (None when unset)."""
+    global _log
+    if TRACE_LOG is None:
+        return None
+    with _log_lock:
+        if _log is None:
+            _log = TraceLog(TRACE_LOG, TRACE_LOG_MAX_MB, TRACE_LOG_BACKUPS)
+        return _log
+
+
+def set_trace_log(log: TraceLog | None) -> None:
+    """Replace the trace log writer (tests, tools)."""
+    global _log, TRACE_LOG
+    with _log_lock:
+        _log = log
+        TRACE_LOG = log.path if log is not None else None
+
+
+def begin(
+    name: str,
+    requested: bool = False,
+    parent: Trace | None = None,
+    **attrs: Any,
+) -> Trace | None:
+    """
+    A new Trace when the client requested one, when TRACE_LOG is set
+    (sampled by TRACE_SAMPLE_RATE), or as the follow-up of a traced parent;
+    otherwise None. Pair with end().
+    """
+    if parent is not None:
+        return Trace(name, trace_id=parent.trace_id, **attrs)
+    if requested:
+        return Trace(name, **attrs)
+    if get_trace_log() is not None and random.random() < TRACE_SAMPLE_RATE:
+        return Trace(name, **attrs)
+    return None
+
+
+def end(trace: Trace | None) -> None:
+    """Finish the trace and append it to TRACE_LOG, if set."""
+    if trace is None:
+        return
+    trace.finish()
+    log = get_trace_log()
+    if log is None:
+        return
+    try:
+        log.write(trace)
+    except Exception:
+        # Fail-closed; tracing must not break chats
+        pass
+
+
+@contextmanager
+def start_trace(
+    name: str,
+    requested: bool = False,
+    parent: Trace | None = None,
+    **attrs: Any,
+) -> Iterator[Trace | None]:
+    """begin() a trace, make it active for the block, then end() it."""
+    trace = begin(name, requested, parent, **attrs)
+    try:
+        with activate(trace):
+            yield trace
+    finally:
+        end(trace)
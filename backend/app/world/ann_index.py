@@ -0,0 +1,212 @@
+import math
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+
+def top_k(
+    scores: np.ndarray, k: int, rows: np.ndarray | None = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Best-first (rows, scores) for the k highest scores; ties keep row order.
+    `rows` maps positions in `scores` to matrix rows (identity when None).
+    """
+    if rows is None:
+        rows = np.arange(scores.shape[0])
+    count = scores.shape[0]
+    if k < count:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(count)
+    order = candidates[np.lexsort((rows[candidates], -scores[candidates]))]
+    return rows[order], scores[order]
+
+
+class ExactIndex:
+    """Brute-force search over every row; exact, O(n) per query."""
+
+    name = "exact"
+
+    def add(self, matrix: np.ndarray) -> None:
+        pass
+
+    def reset(self) -> None:
+        pass
+
+    def search(
+        self, matrix: np.ndarray, qvec: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        if matrix.shape[0] == 0 or k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        return top_k(matrix @ qvec, k)
+
+    def stats(self) -> dict:
+        return {"kind": self.name}
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index over the rows of a normalized vector matrix.
+    - Rows are clustered with spherical k-means into ~sqrt(n) lists; a query
+      scores the centroids and then only the rows of the nprobe best lists.
+    - nprobe is the recall/latency knob: more lists, higher recall, slower.
+    - New rows are assigned to their nearest centroid incrementally; the
+      index retrains once the store grows retrain_factor times past the size
+      it was trained on.
+    - Below min_train rows (or when a probe yields fewer than k rows) it
+      falls back to exact search.
+    The index holds row numbers only; the matrix is passed to every call, so
+    it may be reallocated or memory-mapped freely.
+    """
+
+    name = "ivf"
+
+    def __init__(
+        self,
+        nprobe: int = 8,
+        nlist: int | None = None,
+        min_train: int = 10_000,
+        retrain_factor: float = 4.0,
+        kmeans_iters: int = 10,
+        seed: int = 0,
+    ):
+        self.nprobe = nprobe
+        self.nlist = nlist
+        self.min_train = min_train
+        self.retrain_factor = retrain_factor
+        self.kmeans_iters = kmeans_iters
+        self.seed = seed
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the clustering, e.g. after the vectors were replaced."""
+        self._centroids: np.ndarray | None = None
+        self._lists: List[np.ndarray] = []
+        self._indexed = 0
+        self._trained_on = 0
+        self.exact_searches = 0
+        self.ann_searches = 0
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    def _kmeans(self, matrix: np.ndarray, nlist: int) -> np.ndarray:
+        rng = np.random.default_rng(self.seed)
+        n = matrix.shape[0]
+        sample_size = min(n, nlist * 64)
+        sample = np.asarray(matrix[np.sort(rng.choice(n, sample_size, replace=False))])
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(self.kmeans_iters):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(assign, kind="stable")
+            counts = np.bincount(assign, minlength=nlist)
+            filled = np.nonzero(counts)[0]
+            starts = np.concatenate(([0], np.cumsum(counts[filled])[:-1]))
+            sums = np.zeros_like(centroids)
+            sums[filled] = np.add.reduceat(sample[order], starts, axis=0)
+            empty = counts == 0
+            if empty.any():
+                # re-seed empty lists with random sample rows
+                sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.maximum(norms, 1e-12)
+        return centroids.astype(np.float32)
+
+    def _assign(self, vectors: np.ndarray, chunk: int = 16_384) -> np.ndarray:
+        out = np.empty(vectors.shape[0], dtype=np.int64)
+        for start in range(0, vectors.shape[0], chunk):
+            block = np.asarray(vectors[start : start + chunk])
+            out[start : start + chunk] = np.argmax(block @ self._centroids.T, axis=1)
+        return out
+
+    def _train(self, matrix: np.ndarray) -> None:
+        n = matrix.shape[0]
+        nlist = self.nlist or max(1, int(math.sqrt(n)))
+        nlist = min(nlist, n)
+        self._centroids = self._kmeans(matrix, nlist)
+        assign = self._assign(matrix)
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(nlist + 1))
+        self._lists = [order[bounds[c] : bounds[c + 1]] for c in range(nlist)]
+        self._indexed = n
+        self._trained_on = n
+
+    def add(self, matrix: np.ndarray) -> None:
+        """Index rows appended since the last call (matrix = all active rows)."""
+        n = matrix.shape[0]
+        if n < self.min_train:
+            return
+        if not self.trained or n > self._trained_on * self.retrain_factor:
+            self._train(matrix)
+            return
+        if n <= self._indexed:
+            return
+        rows = np.arange(self._indexed, n)
+        assign = self._assign(matrix[self._indexed : n])
+        for c in np.unique(assign):
+            self._lists[c] = np.concatenate([self._lists[c], rows[assign == c]])
+        self._indexed = n
+
+    def search(
+        self, matrix: np.ndarray, qvec: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        if matrix.shape[0] == 0 or k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        self.add(matrix)
+        if not self.trained:
+            self.exact_searches += 1
+            return top_k(matrix @ qvec, k)
+
+        nprobe = min(max(1, self.nprobe), len(self._lists))
+        cscores = self._centroids @ qvec
+        probe = np.argpartition(-cscores, nprobe - 1)[:nprobe]
+        rows = np.concatenate([self._lists[c] for c in probe])
+        if rows.shape[0] < k:
+            self.exact_searches += 1
+            return top_k(matrix @ qvec, k)
+
+        self.ann_searches += 1
+        return top_k(np.asarray(matrix[rows]) @ qvec, k, rows=rows)
+
+    def stats(self) -> dict:
+        sizes = [lst.shape[0] for lst in self._lists]
+        return {
+            "kind": self.name,
+            "trained": self.trained,
+            "nlist": len(self._lists),
+            "nprobe": self.nprobe,
+            "indexed": self._indexed,
+            "max_list": max(sizes, default=0),
+            "ann_searches": self.ann_searches,
+            "exact_searches": self.exact_searches,
+        }
+
+
+def make_index(kind: str = "exact", **kwargs):
+    """Index by name: "exact" or "ivf" (kwargs are IVFIndex settings)."""
+    kind = (kind or "exact").lower()
+    if kind == "ivf":
+        return IVFIndex(**kwargs)
+    if kind == "exact":
+        return ExactIndex()
+    raise ValueError(f"Unknown ANN index kind: {kind}")
+
+
+def recall_at_k(
+    matrix: np.ndarray, index, queries: Iterable[np.ndarray], k: int = 10
+) -> float:
+    """
+    Mean fraction of the exact top-k rows that `index` also returns.
+    Use it to check an nprobe setting against a real world before trusting it.
+    """
+    exact = ExactIndex()
+    found = 0
+    total = 0
+    for q in queries:
+        q = np.asarray(q, dtype=np.float32).reshape(-1)
+        truth, _ = exact.search(matrix, q, k)
+        got, _ = index.search(matrix, q, k)
+        found += len(set(truth.tolist()) & set(got.tolist()))
+        total += len(truth)
+    return found / total if total else 1.0
@@ -1,7 +1,7 @@
 import time
 from typing import List, Dict, Any, Tuple
 
-from ..utility.embeddings import dot_sim
+from ..utility import tracing
 from .memory import WorldMemory
 
 
@@ -25,24 +25,23 @@ def weighted_retrieve(
 
     Returns: top-k memory dicts sorted by weighted score.
     """
-    base = world_memory.retrieve(query, k=max(k * 2, 5))
+    base = world_memory.retrieve_scored(query, k=max(k * 2, 5))
     if not base:
         return []
 
-    now = time.time()
-    qvec = world_memory.embed_fn(query)
+    with tracing.span("rescore", candidates=len(base)):
+        now = time.time()
 
-    weighted: List[Tuple[float, float, float, float, Dict[str, Any]]] = []
-    for m in base:
-        score = dot_sim(qvec, m["vector"])  # similarity
-        age_sec = max(0.0, now - float(m.get("timestamp", now)))
-        recency = pow(0.5, age_sec / 600.0) * 0.05  # half-life ~10 min, max +0.05
-        bonus = _type_bonus(str(m.get("type", "")))
-        total = score + recency + bonus
-        weighted.append((total, score, recency, bonus, m))
+        weighted: List[Tuple[float, float, float, float, Dict[str, Any]]] = []
+        for score, m in base:  # score is cosine similarity
+            age_sec = max(0.0, now - float(m.get("timestamp", now)))
+            recency = pow(0.5, age_sec / 600.0) * 0.05  # half-life ~10 min, max +0.05
+            bonus = _type_bonus(str(m.get("type", "")))
+            total = score + recency + bonus
+            weighted.append((total, score, recency, bonus, m))
 
-    weighted.sort(key=lambda x: x[0], reverse=True)
-    top = weighted[:k]
+        weighted.sort(key=lambda x: x[0], reverse=True)
+        top = weighted[:k]
     return [m for (_, _, _, _, m) in top]
 
 
@@ -1,9 +1,14 @@
 from __future__ import annotations
 
 import inspect
-from typing import Any, Dict, Optional
+import threading
+import time
+from contextlib import nullcontext
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional
 
 from ..utility.llama import Chatter
+from ..utility import tracing
+from ..utility.metrics import TURN_SECONDS, stage
 from .memory import WorldMemory
 from .context_builder import (
     weighted_retrieve,
@@ -11,14 +16,32 @@ from .context_builder import (
     format_npc_cards,
 )
 from .memory_utils import sanitize_entities
+from .memory_queue import MemoryExtractionQueue
+from .turn_batch import Turn, TurnBatch
 
 
 class ConversationService:
     """Server-side orchestration for building context and handling chat turns."""
 
-    def __init__(self, chatter: Chatter, world_memory: WorldMemory):
+    def __init__(
+        self,
+        chatter: Chatter,
+        world_memory: WorldMemory,
+        memory_queue: MemoryExtractionQueue | None = None,
+        turn_lock: threading.Lock | None = None,
+        turn_batch: TurnBatch | None = None,
+    ):
         self.chatter = chatter
         self.world_memory = world_memory
+        # When set, memory extraction runs on the queue's worker instead of inline
+        self.memory_queue = memory_queue
+        # Per-session lock so two turns of one conversation never interleave
+        self.turn_lock = turn_lock
+        # Per-session buffer for batched extraction (None: every turn alone)
+        self.turn_batch = turn_batch
+
+    def _turn(self) -> ContextManager:
+        return self.turn_lock if self.turn_lock is not None else nullcontext()
 
     def _chatter_accepts_world_facts(self) -> bool:
         try:
@@ -45,14 +68,33 @@ class ConversationService:
         }
 
         try:
-            result: object = analyze(conversation_context)  # runtime-typed
+            with stage("analyze"):
+                result: object = analyze(conversation_context)  # runtime-typed
         except Exception:
             return
 
         summary: Optional[Dict[str, Any]] = result if isinstance(result, dict) else None
-        if summary is None:
+        if summary is not None:
+            self._store_memory(summary)
+
+    def _analyze_and_store_batch(self, turns: List[Turn]) -> None:
+        analyze = getattr(self.chatter, "analyze_turns_for_memories", None)
+        if not callable(analyze):
+            return
+
+        try:
+            with stage("analyze"):
+                result: object = analyze(turns)  # runtime-typed
+        except Exception:
             return
 
+        if not isinstance(result, list):
+            return
+        for fact in result:
+            if isinstance(fact, dict):
+                self._store_memory(fact)
+
+    def _store_memory(self, summary: Dict[str, Any]) -> None:
         try:
             conf = float(summary.get("confidence", 0.0))
         except Exception:
@@ -63,53 +105,149 @@ class ConversationService:
         entities = sanitize_entities(summary.get("entities"))
         npc_payload = summary.get("npc")
         try:
-            self.world_memory.add_memory(
-                summary.get("summary", ""),
-                entities,
-                summary.get("type", "other"),
-                npc=npc_payload,
-            )
+            with stage("store"):
+                self.world_memory.add_memory(
+                    summary.get("summary", ""),
+                    entities,
+                    summary.get("type", "other"),
+                    npc=npc_payload,
+                )
         except Exception:
             # Fail-closed; memory storage must not break chats
             return
 
-    def handle_user_message(self, user_message: str) -> str:
-        # If chatter doesn't support world_facts, skip building context entirely
-        supports_context = self._chatter_accepts_world_facts()
-
-        merged_context: Optional[str] = None
-        if supports_context:
-            try:
+    def _build_world_context(self, user_message: str) -> Optional[str]:
+        # memories extracted from the previous turn must be stored before we retrieve
+        if self.memory_queue is not None:
+            with stage("memory_wait"):
+                self.memory_queue.wait_for(self.world_memory)
+        try:
+            # query embedding happens in retrieve (see pdm_embedding_seconds)
+            with stage("retrieve"):
                 weighted = weighted_retrieve(self.world_memory, user_message, k=4)
-                facts_str = format_world_facts(weighted)
+            with stage("npc_lookup"):
                 npc_snaps = self.world_memory.get_relevant_npc_snapshots(
                     user_message, k=2
                 )
+            with stage("format"):
+                facts_str = format_world_facts(weighted)
                 npc_cards = format_npc_cards(npc_snaps)
 
-                if npc_cards and facts_str:
-                    merged_context = npc_cards + "\n\n" + facts_str
-                elif npc_cards:
-                    merged_context = npc_cards
-                else:
-                    merged_context = facts_str or None
-            except Exception:
-                merged_context = None
-
-        # Call chatter with or without world_facts depending on signature support
-        try:
-            if supports_context and merged_context is not None:
-                dm_response = self.chatter.chat(
-                    user_message, world_facts=merged_context
-                )
+            if npc_cards and facts_str:
+                return npc_cards + "\n\n" + facts_str
+            elif npc_cards:
+                return npc_cards
             else:
-                dm_response = self.chatter.chat(user_message)
-        except TypeError:
-            # Fallback if signature mismatch
-            dm_response = self.chatter.chat(user_message)
-
+                return facts_str or None
+        except Exception:
+            return None
+
+    def record_turn(self, user_message: str, dm_response: str) -> None:
+        """
+        Analyze a finished turn and store any new durable memories.
+        With a memory_queue this only enqueues the work and returns immediately.
+        With a turn_batch the turn is buffered and the gathered turns are
+        analyzed together once the batch is full.
+        """
         # Only analyze/store memory if chatter provides analyzer and we could build context
+        if not self._chatter_accepts_world_facts():
+            return
+        batch = self.turn_batch
+        if batch is not None and batch.enabled:
+            batch.flush_fn = self._extract_batch
+            turns = batch.add(user_message, dm_response)
+            if turns:
+                self._extract_batch(turns)
+            return
+        self._submit(
+            lambda: self._maybe_analyze_and_store_memory(user_message, dm_response)
+        )
+
+    def _extract_batch(self, turns: List[Turn], close_world: bool = False) -> None:
+        """Extract memories from gathered turns; optionally close the world after."""
+
+        def extract() -> None:
+            try:
+                self._analyze_and_store_batch(turns)
+            finally:
+                if close_world:
+                    self.world_memory.close()
+
+        self._submit(extract)
+
+    def _submit(self, extract: Callable[[], None]) -> None:
+        if self.memory_queue is None:
+            extract()
+            return
+        # extraction finishes after the reply, so a traced turn's job gets its
+        # own trace under the same trace id (written to the trace log)
+        parent = tracing.current()
+
+        def job() -> None:
+            if parent is None:
+                extract()
+                return
+            with tracing.start_trace("memory_extraction", parent=parent):
+                extract()
+
+        with stage("enqueue"):
+            self.memory_queue.submit(self.world_memory, job)
+
+    def _narrate(self, user_message: str) -> str:
+        # If chatter doesn't support world_facts, skip building context entirely
+        supports_context = self._chatter_accepts_world_facts()
+
+        merged_context: Optional[str] = None
         if supports_context:
-            self._maybe_analyze_and_store_memory(user_message, dm_response)
+            merged_context = self._build_world_context(user_message)
 
+        # Call chatter with or without world_facts depending on signature support
+        with stage("narrate"):
+            try:
+                if supports_context and merged_context is not None:
+                    dm_response = self.chatter.chat(
+                        user_message, world_facts=merged_context
+                    )
+                else:
+                    dm_response = self.chatter.chat(user_message)
+            except TypeError:
+                # Fallback if signature mismatch
+                dm_response = self.chatter.chat(user_message)
+        return dm_response
+
+    def handle_user_message(self, user_message: str) -> str:
+        with TURN_SECONDS.time(mode="chat"):
+            with self._turn():
+                dm_response = self._narrate(user_message)
+                self.record_turn(user_message, dm_response)
         return dm_response
+
+    def stream_user_message(self, user_message: str) -> Iterator[str]:
+        """
+        Yield the DM reply as text deltas while it is generated.
+        Once the stream is exhausted the turn is handed to record_turn(); with
+        a memory_queue that only enqueues, so extraction runs after the stream.
+        """
+        start = time.perf_counter()
+        with self._turn():
+            chat_stream = getattr(self.chatter, "chat_stream", None)
+            if not callable(chat_stream):
+                # Chatter cannot stream; deliver the whole reply as one chunk
+                dm_response = self._narrate(user_message)
+                yield dm_response
+            else:
+                merged_context: Optional[str] = None
+                if self._chatter_accepts_world_facts():
+                    merged_context = self._build_world_context(user_message)
+
+                parts = []
+                # wall time of the whole stream, as fast as the client reads it
+                with stage("narrate"):
+                    for delta in chat_stream(user_message, world_facts=merged_context):
+                        parts.append(delta)
+                        yield delta
+                dm_response = "".join(parts)
+
+            # still under the turn lock, so the next turn waits for this job
+            self.record_turn(user_message, dm_response)
+        TURN_SECONDS.observe(time.perf_counter() - start, mode="stream")
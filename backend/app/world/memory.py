@@ -1,16 +1,131 @@
 import time
 import uuid
-from typing import List, Dict, Any, Tuple
+from typing import Iterable, List, Dict, Any, Tuple
 
-from ..utility.embeddings import dot_sim
+import numpy as np
+
+from ..utility import tracing
+from .ann_index import ExactIndex, top_k
+from .world_store import WorldStore
+
+# Initial row capacity of the vector matrices; they grow by doubling.
+INITIAL_CAPACITY = 64
+
+
+def _grow_rows(matrix: np.ndarray, used: int, rows: int) -> np.ndarray:
+    """Return a copy of `matrix` with capacity for at least `rows` rows."""
+    capacity = max(matrix.shape[0], 1)
+    while capacity < rows:
+        capacity *= 2
+    used = min(used, matrix.shape[0])
+    grown = np.zeros((capacity,) + matrix.shape[1:], dtype=matrix.dtype)
+    grown[:used] = matrix[:used]
+    return grown
 
 
 class WorldMemory:
-    def __init__(self, embed_fn):
+    def __init__(
+        self, embed_fn, embed_many_fn=None, store: WorldStore | None = None, index=None
+    ):
         self.memories: List[Dict[str, Any]] = []
         self.embed_fn = embed_fn
+        # Optional batched embedder (texts -> [n, dim] array) for bulk paths
+        self.embed_many_fn = embed_many_fn
         # Lightweight NPC index mapping canonical_name -> snapshot dict
         self.npc_index: Dict[str, Dict[str, Any]] = {}
+        # Per-NPC vectors, recomputed only when a snapshot is upserted.
+        # Row i of _npc_vectors / _npc_seen belongs to npc_index key _npc_ids[i].
+        self._npc_ids: List[str] = []
+        self._npc_rows: Dict[str, int] = {}
+        self._npc_vectors: np.ndarray | None = None
+        self._npc_seen = np.zeros(INITIAL_CAPACITY, dtype=np.float64)
+        # Contiguous float32 matrix of normalized vectors; row i belongs to
+        # self.memories[i]. Allocated lazily once the embedding dim is known.
+        self._vectors: np.ndarray | None = None
+        # Nearest-neighbour index over _vectors used by retrieval and dedupe
+        # (see ann_index); exact brute force unless an ANN index is passed.
+        self.index = index if index is not None else ExactIndex()
+        # Optional durable backing; when set, the world is loaded from it here
+        # and every change is queued to it.
+        self.store = store
+        if store is not None:
+            self._load_from_store()
+
+    def _load_from_store(self) -> None:
+        loaded = self.store.load()
+        if loaded.vectors is not None:
+            # the read-only map is used as-is; the first append copies it into
+            # a growable in-RAM matrix
+            self._vectors = loaded.vectors
+            for i, m in enumerate(loaded.memories):
+                m["vector"] = loaded.vectors[i]
+            self.memories = loaded.memories
+
+        if loaded.npcs and loaded.npc_vectors is not None:
+            by_row = sorted(loaded.npcs.items(), key=lambda item: item[1][0])
+            self._npc_ids = [cid for cid, _ in by_row]
+            self._npc_rows = {cid: row for cid, (row, _) in by_row}
+            self.npc_index = {cid: snap for cid, (_, snap) in by_row}
+            count = len(self._npc_ids)
+            self._npc_vectors = _grow_rows(
+                np.array(loaded.npc_vectors[:count]), count, INITIAL_CAPACITY
+            )
+            self._npc_seen = _grow_rows(
+                np.array([float(s.get("last_seen_time", 0.0)) for _, (_, s) in by_row]),
+                count,
+                INITIAL_CAPACITY,
+            )
+
+        if loaded.stale:
+            self.reembed_all()
+
+    def flush(self, timeout: float | None = 30.0) -> bool:
+        """Wait until every change so far is on disk (no-op without a store)."""
+        return self.store.flush(timeout) if self.store is not None else True
+
+    def close(self) -> None:
+        if self.store is not None:
+            self.store.close()
+
+    def __len__(self) -> int:
+        return len(self.memories)
+
+    def _as_vector(self, vec) -> np.ndarray:
+        return np.asarray(vec, dtype=np.float32).reshape(-1)
+
+    def _embed_many(self, texts: List[str]) -> np.ndarray:
+        """Embed texts in one batch when a batched embedder is available."""
+        if self.embed_many_fn is not None:
+            return np.asarray(self.embed_many_fn(texts), dtype=np.float32)
+        return np.stack([self._as_vector(self.embed_fn(t)) for t in texts])
+
+    def _ensure_capacity(self, dim: int, rows: int) -> np.ndarray:
+        """Return the vector matrix, growing it so it can hold `rows` rows."""
+        if self._vectors is None:
+            self._vectors = np.zeros(
+                (max(INITIAL_CAPACITY, rows), dim), dtype=np.float32
+            )
+            return self._vectors
+
+        if self._vectors.shape[1] != dim:
+            raise ValueError(
+                f"Embedding dim mismatch: expected {self._vectors.shape[1]}, got {dim}"
+            )
+
+        if rows <= self._vectors.shape[0]:
+            return self._vectors
+
+        grown = _grow_rows(self._vectors, len(self.memories), rows)
+        self._vectors = grown
+        # entries expose their vector as a view into the matrix; rebind them
+        for i, m in enumerate(self.memories):
+            m["vector"] = grown[i]
+        return grown
+
+    def _active_vectors(self) -> np.ndarray:
+        if self._vectors is None:
+            return np.zeros((0, 0), dtype=np.float32)
+        return self._vectors[: len(self.memories)]
 
     def add_memory(
         self,
@@ -20,60 +135,163 @@ class WorldMemory:
         npc: Dict[str, Any] | None = None,
         dedupe_check: bool = False,
         similarity_threshold: float = 0.85,
+        dedupe_window: int | None = 10,
     ) -> str:
-        """Store a durable world fact."""
+        """
+        Store a durable world fact. With dedupe_check, a near-duplicate among
+        the last dedupe_window memories (the whole store via the index when
+        None) is returned instead of storing a new one.
+        """
+        with tracing.span("embed"):
+            vec = self._as_vector(self.embed_fn(summary))
+
         if dedupe_check and self.memories:
-            vec = self.embed_fn(summary)
-            recent_memories = self.memories[-10:]
-            for memory in recent_memories:
-                similarity = dot_sim(vec, memory["vector"])
-                if similarity >= similarity_threshold:
-                    return memory["id"]
+            dup = self._find_duplicate(vec, similarity_threshold, dedupe_window)
+            if dup is not None:
+                return dup["id"]
 
-        memory_id = str(uuid.uuid4())
-        vec = self.embed_fn(summary)
+        entry = self._append(summary, entities, mem_type, vec)
+        self.index.add(self._active_vectors())
+        # If this is an NPC memory with structured data, upsert the NPC snapshot
+        npc_payload = npc
+        if mem_type == "npc" and isinstance(npc_payload, dict):
+            self._upsert_npc_from_payload(npc_payload, entry)
+        return entry["id"]
+
+    def _find_duplicate(
+        self, vec: np.ndarray, threshold: float, window: int | None
+    ) -> Dict[str, Any] | None:
+        if window is None:
+            rows, scores = self.index.search(self._active_vectors(), vec, 1)
+            if rows.size and scores[0] >= threshold:
+                return self.memories[int(rows[0])]
+            return None
+        start = max(0, len(self.memories) - window)
+        recent = self._active_vectors()[start:]
+        hits = np.nonzero(recent @ vec >= threshold)[0]
+        return self.memories[start + int(hits[0])] if hits.size else None
+
+    def add_memories(self, items: Iterable[Dict[str, Any]]) -> List[str]:
+        """
+        Bulk-store world facts (e.g. world imports), embedding all summaries in
+        one batch. Each item has "summary", "entities", "type" and optionally
+        "npc", like the add_memory arguments. Returns the new memory ids.
+        """
+        items = list(items)
+        if not items:
+            return []
+        vecs = self._embed_many([str(item.get("summary", "")) for item in items])
+
+        ids: List[str] = []
+        touched: List[str] = []
+        for item, vec in zip(items, vecs):
+            entry = self._append(
+                str(item.get("summary", "")),
+                list(item.get("entities") or []),
+                str(item.get("type", "other")),
+                vec,
+            )
+            npc_payload = item.get("npc")
+            if entry["type"] == "npc" and isinstance(npc_payload, dict):
+                cid = self._upsert_npc_from_payload(npc_payload, entry, reindex=False)
+                if cid:
+                    touched.append(cid)
+            ids.append(entry["id"])
+
+        self.index.add(self._active_vectors())
+        if touched:
+            self.reindex_npcs(touched)
+        return ids
+
+    def _append(
+        self, summary: str, entities: List[str], mem_type: str, vec: np.ndarray
+    ) -> Dict[str, Any]:
+        row = len(self.memories)
+        matrix = self._ensure_capacity(vec.shape[0], row + 1)
+        matrix[row] = vec
 
         entry = {
-            "id": memory_id,
+            "id": str(uuid.uuid4()),
             "summary": summary,
             "entities": entities,
             "type": mem_type,
             "timestamp": time.time(),
-            "vector": vec,
+            "vector": matrix[row],
         }
-
         self.memories.append(entry)
-        # If this is an NPC memory with structured data, upsert the NPC snapshot
-        npc_payload = npc
-        if mem_type == "npc" and isinstance(npc_payload, dict):
-            self._upsert_npc_from_payload(npc_payload, entry)
-        return memory_id
+        if self.store is not None:
+            meta = {k: v for k, v in entry.items() if k != "vector"}
+            self.store.append_memory(row, meta, vec)
+        return entry
 
-    def retrieve(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+    def reembed_all(self) -> None:
         """
-        Return top-k relevant memories by cosine similarity.
+        Recompute every memory and NPC vector in batches, e.g. after switching
+        embedding models. Memory ids, order and timestamps are preserved.
         """
-        qvec = self.embed_fn(query)
+        if self.memories:
+            vecs = self._embed_many([m["summary"] for m in self.memories])
+            self._vectors = None
+            matrix = self._ensure_capacity(vecs.shape[1], len(vecs))
+            matrix[: len(vecs)] = vecs
+            for i, m in enumerate(self.memories):
+                m["vector"] = matrix[i]
+        self.index.reset()
+        self._npc_vectors = None
+        self.reindex_npcs(persist=False)
+        if self.store is not None:
+            npc_vectors = (
+                None
+                if self._npc_vectors is None
+                else self._npc_vectors[: len(self._npc_ids)]
+            )
+            self.store.rewrite_vectors(self._active_vectors(), npc_vectors)
 
-        # qvec and m["vector"] are both normalized  dot product
-        scored: List[Tuple[float, Dict[str, Any]]] = []
-        for m in self.memories:
-            score = dot_sim(qvec, m["vector"])
-            scored.append((score, m))
+    def clear(self) -> None:
+        """Drop all memories and NPC snapshots."""
+        self.memories.clear()
+        self.npc_index.clear()
+        self._vectors = None
+        self._npc_ids = []
+        self._npc_rows = {}
+        self._npc_vectors = None
+        self.index.reset()
+        if self.store is not None:
+            self.store.clear()
 
-        scored.sort(key=lambda x: x[0], reverse=True)
-        return [m for (score, m) in scored[:k]]
+    def retrieve_scored(
+        self, query: str, k: int = 5
+    ) -> List[Tuple[float, Dict[str, Any]]]:
+        """
+        Return top-k (score, memory) pairs by cosine similarity, best first.
+        """
+        count = len(self.memories)
+        if count == 0 or k <= 0:
+            return []
+        with tracing.span("embed"):
+            qvec = self._as_vector(self.embed_fn(query))
+
+        # rows and qvec are both normalized -> dot product == cosine similarity
+        with tracing.span("search", rows=count, index=self.index.name):
+            rows, scores = self.index.search(self._active_vectors(), qvec, k)
+        return [(float(s), self.memories[int(i)]) for i, s in zip(rows, scores)]
+
+    def retrieve(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Return top-k relevant memories by cosine similarity.
+        """
+        return [m for (_, m) in self.retrieve_scored(query, k=k)]
 
     # ---------- NPC support ----------
     def _canonicalize_name(self, name: str) -> str:
         return " ".join(name.strip().lower().split())
 
     def _upsert_npc_from_payload(
-        self, npc: Dict[str, Any], source_entry: Dict[str, Any]
-    ):
+        self, npc: Dict[str, Any], source_entry: Dict[str, Any], reindex: bool = True
+    ) -> str | None:
         name = str(npc.get("name", "")).strip()
         if not name:
-            return
+            return None
         cid = self._canonicalize_name(name)
 
         now = time.time()
@@ -138,29 +356,68 @@ class WorldMemory:
             snapshot["history"] = hist[-10:]  # cap length
 
         self.npc_index[cid] = snapshot
+        if reindex:
+            vec = self._as_vector(self.embed_fn(self._npc_text(snapshot)))
+            self._index_npc(cid, vec)
+        return cid
+
+    def _npc_text(self, snap: Dict[str, Any]) -> str:
+        # small text rep for similarity: name + aliases + intent + location
+        parts = [snap.get("name", "")]
+        parts.extend(snap.get("aliases", []) or [])
+        parts.append(snap.get("intent", "") or "")
+        parts.append(snap.get("last_seen_location", "") or "")
+        return " | ".join([p for p in parts if p])
+
+    def reindex_npcs(
+        self, cids: Iterable[str] | None = None, persist: bool = True
+    ) -> None:
+        """Batch-recompute cached NPC vectors (all NPCs when cids is None)."""
+        targets = list(dict.fromkeys(self.npc_index if cids is None else cids))
+        targets = [cid for cid in targets if cid in self.npc_index]
+        if not targets:
+            return
+        vecs = self._embed_many([self._npc_text(self.npc_index[c]) for c in targets])
+        for cid, vec in zip(targets, vecs):
+            self._index_npc(cid, vec, persist=persist)
+
+    def _index_npc(self, cid: str, vec: np.ndarray, persist: bool = True) -> None:
+        """Store the vector for one NPC snapshot in the NPC matrix."""
+        snapshot = self.npc_index[cid]
+        row = self._npc_rows.get(cid)
+        if row is None:
+            row = len(self._npc_ids)
+            self._npc_ids.append(cid)
+            self._npc_rows[cid] = row
+
+        if self._npc_vectors is None:
+            self._npc_vectors = np.zeros(
+                (INITIAL_CAPACITY, vec.shape[0]), dtype=np.float32
+            )
+        if row >= self._npc_vectors.shape[0]:
+            self._npc_vectors = _grow_rows(self._npc_vectors, row, row + 1)
+        if row >= self._npc_seen.shape[0]:
+            self._npc_seen = _grow_rows(self._npc_seen, row, row + 1)
+
+        self._npc_vectors[row] = vec
+        self._npc_seen[row] = float(snapshot.get("last_seen_time", 0.0))
+        if persist and self.store is not None:
+            self.store.put_npc(cid, row, snapshot, vec)
 
     def get_relevant_npc_snapshots(
         self, query: str, k: int = 2
     ) -> List[Dict[str, Any]]:
         """Return up to k NPC snapshots relevant to the query by name/alias similarity."""
-        if not self.npc_index:
+        count = len(self._npc_ids)
+        if count == 0 or self._npc_vectors is None or k <= 0:
             return []
-        qvec = self.embed_fn(query)
-
-        scored: List[Tuple[float, Dict[str, Any]]] = []
-        for snap in self.npc_index.values():
-            # build a small text rep for similarity: name + aliases + intent + location
-            parts = [snap.get("name", "")]
-            parts.extend(snap.get("aliases", []) or [])
-            parts.append(snap.get("intent", "") or "")
-            parts.append(snap.get("last_seen_location", "") or "")
-            text = " | ".join([p for p in parts if p])
-            svec = self.embed_fn(text) if text else qvec
-            score = dot_sim(qvec, svec)
-            # slight boost for recency
-            age_sec = max(0.0, time.time() - float(snap.get("last_seen_time", 0.0)))
-            recency = pow(0.5, age_sec / 600.0) * 0.05
-            scored.append((score + recency, snap))
+        with tracing.span("embed"):
+            qvec = self._as_vector(self.embed_fn(query))
 
-        scored.sort(key=lambda x: x[0], reverse=True)
-        return [snap for (_, snap) in scored[:k]]
+        with tracing.span("search", rows=count):
+            scores = self._npc_vectors[:count] @ qvec
+            # slight boost for recency
+            age_sec = np.maximum(0.0, time.time() - self._npc_seen[:count])
+            scores = scores + np.power(0.5, age_sec / 600.0) * 0.05
+            rows, _ = top_k(scores, k)
+        return [self.npc_index[self._npc_ids[i]] for i in rows]
@@ -0,0 +1,126 @@
+import queue
+import threading
+from typing import Callable, Dict, Hashable, Tuple
+
+
+class MemoryExtractionQueue:
+    """
+    Bounded in-process queue that runs memory extraction jobs on one worker thread.
+    - Jobs are tagged with a key (the WorldMemory they write to). wait_for(key)
+      blocks until that key has no queued or running jobs, so a turn's memories
+      are stored before the next turn on the same world retrieves.
+    - When the queue is full the submitting thread runs the job itself
+      (backpressure instead of dropping memories).
+    - shutdown() drains all jobs and stops the worker; the queue restarts lazily.
+    """
+
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = maxsize
+        self._queue: "queue.Queue[Tuple[Hashable, Callable[[], None]] | None]" = (
+            queue.Queue(maxsize)
+        )
+        self._cond = threading.Condition()
+        self._pending: Dict[Hashable, int] = {}
+        self._thread: threading.Thread | None = None
+        self._draining = False
+        self.completed = 0
+        self.failed = 0
+        self.ran_inline = 0
+
+    def submit(self, key: Hashable, job: Callable[[], None]) -> None:
+        with self._cond:
+            self._pending[key] = self._pending.get(key, 0) + 1
+            inline = self._draining
+            if not inline:
+                self._ensure_worker()
+
+        if not inline:
+            try:
+                self._queue.put_nowait((key, job))
+                return
+            except queue.Full:
+                pass
+
+        with self._cond:
+            self.ran_inline += 1
+        self._run(key, job)
+
+    def _ensure_worker(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._work, name="memory-extraction", daemon=True
+            )
+            self._thread.start()
+
+    def _work(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            self._run(*item)
+
+    def _run(self, key: Hashable, job: Callable[[], None]) -> None:
+        ok = False
+        try:
+            job()
+            ok = True
+        except Exception:
+            # Fail-closed; memory extraction must not break chats
+            pass
+        finally:
+            with self._cond:
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                remaining = self._pending.get(key, 0) - 1
+                if remaining > 0:
+                    self._pending[key] = remaining
+                else:
+                    self._pending.pop(key, None)
+                self._cond.notify_all()
+
+    def wait_for(self, key: Hashable, timeout: float | None = None) -> bool:
+        """Block until no jobs for `key` are queued or running."""
+        with self._cond:
+            return self._cond.wait_for(lambda: key not in self._pending, timeout)
+
+    def pending(self, key: Hashable) -> int:
+        """Number of jobs for `key` queued or running."""
+        with self._cond:
+            return self._pending.get(key, 0)
+
+    def depth(self) -> int:
+        """Number of jobs queued or running."""
+        with self._cond:
+            return sum(self._pending.values())
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "depth": sum(self._pending.values()),
+                "maxsize": self.maxsize,
+                "completed": self.completed,
+                "failed": self.failed,
+                "ran_inline": self.ran_inline,
+            }
+
+    def shutdown(self, timeout: float | None = 30.0) -> bool:
+        """Run every queued job, then stop the worker. Returns False on timeout."""
+        with self._cond:
+            self._draining = True
+            thread = self._thread
+        try:
+            with self._cond:
+                drained = self._cond.wait_for(lambda: not self._pending, timeout)
+            if thread is not None and thread.is_alive():
+                try:
+                    self._queue.put(None, timeout=timeout)
+                    thread.join(timeout)
+                except queue.Full:
+                    pass
+            return drained
+        finally:
+            with self._cond:
+                self._thread = None
+                self._draining = False
@@ -0,0 +1,305 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List
+
+from ..utility.llama import Chatter
+from .memory import WorldMemory
+from .memory_queue import MemoryExtractionQueue
+from .turn_batch import TurnBatch
+
+DEFAULT_SESSION_ID = "default"
+
+
+class _TurnLock:
+    """A Lock that reports its release, so waiters need not poll locked()."""
+
+    def __init__(self, on_release: Callable[[], None] | None = None):
+        self._lock = threading.Lock()
+        self._on_release = on_release
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        return self._lock.acquire(blocking, timeout)
+
+    def release(self) -> None:
+        self._lock.release()
+        if self._on_release is not None:
+            self._on_release()
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    def __enter__(self) -> "_TurnLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class Session:
+    """
+    One player's conversation: its own Chatter (and therefore History) and its
+    own WorldMemory. Both are built lazily on first use; all Chatters share the
+    one Llama model loaded at class level.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        chatter_factory: Callable[[], Chatter],
+        world_factory: Callable[[str], WorldMemory],
+        memory_queue: MemoryExtractionQueue | None = None,
+        on_change: Callable[[], None] | None = None,
+    ):
+        self.session_id = session_id
+        self._chatter_factory = chatter_factory
+        self._world_factory = world_factory
+        self.memory_queue = memory_queue
+        self._chatter: Chatter | None = None
+        self._world_memory: WorldMemory | None = None
+        self._init_lock = threading.Lock()
+        # held for the duration of a turn so turns in one session never overlap
+        self.turn_lock = _TurnLock(on_change)
+        # requests holding the session (SessionStore.get(pin=True)); guarded
+        # by the store's lock
+        self._pins = 0
+        self._on_change = on_change
+        # turns waiting for batched memory extraction (MEMORY_BATCH_TURNS)
+        self.turn_batch = TurnBatch()
+        self.last_active = time.time()
+        self._closed = threading.Event()
+
+    @property
+    def chatter(self) -> Chatter:
+        with self._init_lock:
+            if self._chatter is None:
+                self._chatter = self._chatter_factory()
+            return self._chatter
+
+    @property
+    def world_memory(self) -> WorldMemory:
+        with self._init_lock:
+            if self._world_memory is None:
+                self._world_memory = self._world_factory(self.session_id)
+            return self._world_memory
+
+    def reset_history(self) -> None:
+        """Start a fresh conversation; world state is kept."""
+        with self._init_lock:
+            self._chatter = None
+
+    def in_use(self) -> bool:
+        """A request holds the session or a turn is running on it."""
+        return self._pins > 0 or self.turn_lock.locked()
+
+    def is_idle(self) -> bool:
+        """Not in use and no memory extraction queued for its world."""
+        if self.in_use():
+            return False
+        if self.memory_queue is None:
+            return True
+        with self._init_lock:
+            world = self._world_memory
+        return world is None or self.memory_queue.pending(world) == 0
+
+    def close(self) -> None:
+        """
+        Flush the world to its store, if it has one. Turns still waiting for
+        batched extraction are handed to the extractor, which closes the
+        world once their memories are stored (see wait_closed).
+        """
+        try:
+            if self.turn_batch.flush(close_world=True):
+                return
+            with self._init_lock:
+                world = self._world_memory
+            close = getattr(world, "close", None)
+            if close is not None:
+                close()
+        finally:
+            self._closed.set()
+            if self._on_change is not None:
+                self._on_change()
+
+    def is_closed(self) -> bool:
+        """close() returned and the extraction it handed off has finished."""
+        return self._closed.is_set() and self.is_idle()
+
+    def wait_closed(self) -> None:
+        """Block until is_closed(), so the world's directory can be reopened."""
+        self._closed.wait()
+        if self.memory_queue is None:
+            return
+        with self._init_lock:
+            world = self._world_memory
+        if world is not None:
+            self.memory_queue.wait_for(world)
+
+
+class SessionStore:
+    """
+    Resident sessions keyed by id, with LRU eviction of idle sessions once
+    more than max_sessions are resident. Sessions pinned by a request, in the
+    middle of a turn, or with memory extraction still queued on memory_queue
+    are never evicted, so the store may briefly exceed the cap. Evicted
+    sessions are closed outside the store lock; an id is reopened only once
+    its old session is out of use and finished closing, so two WorldMemories
+    never write one world directory.
+    """
+
+    def __init__(
+        self,
+        chatter_factory: Callable[[], Chatter],
+        world_factory: Callable[[str], WorldMemory],
+        max_sessions: int = 32,
+        memory_queue: MemoryExtractionQueue | None = None,
+    ):
+        self.chatter_factory = chatter_factory
+        self.world_factory = world_factory
+        self.max_sessions = max_sessions
+        self.memory_queue = memory_queue
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+        # evicted or dropped sessions whose close may still be running
+        self._closing: Dict[str, Session] = {}
+        self._lock = threading.Lock()
+        # notified when a session's turn ends, its pin is released or its
+        # close() returns
+        self._changed = threading.Condition(self._lock)
+        self.evictions = 0
+
+    def get(self, session_id: str, pin: bool = False) -> Session:
+        """
+        Return the session, creating it (and evicting idle ones) if needed.
+        With pin the session is not evicted until release(session), so a
+        request's turn never runs on a world that was closed under it.
+        """
+        while True:
+            with self._lock:
+                closing = self._reopen_blocker(session_id)
+                if closing is None:
+                    session = self._sessions.get(session_id)
+                    if session is None:
+                        session = Session(
+                            session_id,
+                            self.chatter_factory,
+                            self.world_factory,
+                            self.memory_queue,
+                            self._notify,
+                        )
+                        self._sessions[session_id] = session
+                    self._sessions.move_to_end(session_id)
+                    session.last_active = time.time()
+                    if pin:
+                        session._pins += 1
+                    victims = self._evict_idle(keep=session_id)
+                    break
+            # only the extraction the old session handed off is left
+            closing.wait_closed()
+        # closing may extract memories inline (queue full or draining)
+        for victim in victims:
+            victim.close()
+        return session
+
+    def release(self, session: Session) -> None:
+        """Undo one get(pin=True); the session may be evicted again."""
+        with self._lock:
+            session._pins -= 1
+            self._changed.notify_all()
+
+    def _notify(self) -> None:
+        with self._lock:
+            self._changed.notify_all()
+
+    def _reopen_blocker(self, session_id: str) -> Session | None:
+        """
+        With the lock held, wait until session_id is resident or its evicted
+        session is out of use and closed. Returns that old session while the
+        extraction it handed off is still running, else None.
+        """
+        while True:
+            if session_id in self._sessions:
+                return None
+            closing = self._closing.get(session_id)
+            if closing is None or closing.is_closed():
+                self._closing.pop(session_id, None)
+                return None
+            if closing._closed.is_set() and not closing.in_use():
+                return closing
+            # a turn still runs on it, or its close() has not returned
+            self._changed.wait()
+
+    def peek(self, session_id: str) -> Session | None:
+        """Return the session if resident, without creating or touching it."""
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def drop(self, session_id: str) -> bool:
+        """Remove the session; it is closed once it is out of use."""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is None:
+                return False
+            self._closing[session_id] = session
+            self._changed.wait_for(lambda: not session.in_use())
+        session.close()
+        return True
+
+    def close_all(self) -> None:
+        """Flush every resident session's world, e.g. at shutdown."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+        for session in sessions:
+            session.close()
+
+    def flush_turn_batches(self) -> None:
+        """Hand every session's pending turns to memory extraction."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+        for session in sessions:
+            session.turn_batch.flush()
+
+    def resident_worlds(self) -> List[WorldMemory]:
+        """WorldMemories already built by resident sessions (none are created)."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+        worlds = []
+        for session in sessions:
+            with session._init_lock:
+                if session._world_memory is not None:
+                    worlds.append(session._world_memory)
+        return worlds
+
+    def _evict_idle(self, keep: str) -> List[Session]:
+        """Remove idle sessions over the cap; the caller closes them unlocked."""
+        for sid in [sid for sid, s in self._closing.items() if s.is_closed()]:
+            del self._closing[sid]
+        if len(self._sessions) <= self.max_sessions:
+            return []
+        victims: List[str] = []
+        excess = len(self._sessions) - self.max_sessions
+        for sid, session in self._sessions.items():  # oldest first
+            if len(victims) >= excess:
+                break
+            if sid != keep and session.is_idle():
+                victims.append(sid)
+        evicted = []
+        for sid in victims:
+            # persisted worlds are flushed so the session can be reopened
+            session = self._sessions.pop(sid)
+            self._closing[sid] = session
+            evicted.append(session)
+        self.evictions += len(evicted)
+        return evicted
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "resident": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,83 @@
+import os
+import threading
+from typing import Callable, Dict, List
+
+# Turns gathered before one batched memory extraction (1: extract every turn
+# on its own, as before; 0: no turn cap, only MEMORY_BATCH_TOKENS; with
+# MEMORY_BATCH_TOKENS set, 1 also means no turn cap)
+MEMORY_BATCH_TURNS = int(os.getenv("MEMORY_BATCH_TURNS", "1"))
+# Extract early once the gathered turns reach about this many tokens (0: off)
+MEMORY_BATCH_TOKENS = int(os.getenv("MEMORY_BATCH_TOKENS", "0"))
+# Rough tokens-per-character for the threshold; no tokenizer call per turn
+CHARS_PER_TOKEN = 4
+
+Turn = Dict[str, str]
+FlushFn = Callable[[List[Turn], bool], None]
+
+
+class TurnBatch:
+    """
+    Finished turns of one session waiting for memory extraction, so one
+    completion can pull the facts of several turns. add() hands back the
+    gathered turns once max_turns or max_tokens is reached. flush() passes
+    whatever is still pending to flush_fn (set by the ConversationService
+    that fills the batch), e.g. when the session is evicted or at shutdown.
+    """
+
+    def __init__(
+        self, max_turns: int = MEMORY_BATCH_TURNS, max_tokens: int = MEMORY_BATCH_TOKENS
+    ):
+        if max_tokens > 0 and max_turns == 1:
+            # a one-turn cap would flush before the token threshold is reached
+            max_turns = 0
+        if max_turns <= 0 and max_tokens <= 0:
+            max_turns = 1
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.flush_fn: FlushFn | None = None
+        self._lock = threading.Lock()
+        self._turns: List[Turn] = []
+        self._tokens = 0
+
+    @property
+    def enabled(self) -> bool:
+        """False when every turn is extracted on its own."""
+        return self.max_turns != 1
+
+    def add(self, user_message: str, dm_response: str) -> List[Turn] | None:
+        """Buffer a turn; returns the batch to extract once it is full."""
+        turn = {"user_message": user_message, "dm_response": dm_response}
+        with self._lock:
+            self._turns.append(turn)
+            self._tokens += (len(user_message) + len(dm_response)) // CHARS_PER_TOKEN
+            full = (0 < self.max_turns <= len(self._turns)) or (
+                0 < self.max_tokens <= self._tokens
+            )
+            if not full:
+                return None
+            return self._drain()
+
+    def _drain(self) -> List[Turn]:
+        turns, self._turns, self._tokens = self._turns, [], 0
+        return turns
+
+    def drain(self) -> List[Turn]:
+        with self._lock:
+            return self._drain()
+
+    def flush(self, close_world: bool = False) -> bool:
+        """
+        Hand pending turns to flush_fn. Returns True when it took them (and,
+        with close_world, will close the world once they are stored).
+        """
+        with self._lock:
+            flush_fn = self.flush_fn
+            turns = self._drain() if flush_fn is not None else []
+        if not turns or flush_fn is None:
+            return False
+        flush_fn(turns, close_world)
+        return True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._turns)
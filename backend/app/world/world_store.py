@@ -0,0 +1,286 @@
+import json
+import os
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+STORE_VERSION = 1
+
+
+@dataclass
+class LoadedWorld:
+    """Everything WorldStore.load() recovers from disk."""
+
+    memories: List[Dict[str, Any]] = field(default_factory=list)
+    # read-only [len(memories), dim] mapping of vectors.f32, or None when empty
+    vectors: np.ndarray | None = None
+    # canonical NPC name -> (row, snapshot)
+    npcs: Dict[str, Tuple[int, Dict[str, Any]]] = field(default_factory=dict)
+    npc_vectors: np.ndarray | None = None
+    # True when the vectors were written by a different embedding model
+    stale: bool = False
+
+
+class WorldStore:
+    """
+    Durable on-disk backing for one WorldMemory.
+    - vectors.f32: memory vectors as raw float32 rows, mapped with np.memmap
+      on load so nothing is re-embedded.
+    - npc_vectors.f32: NPC vectors, one row per NPC, rewritten in place.
+    - log.jsonl: append-only log of memory metadata and NPC snapshot updates;
+      the latest snapshot for an NPC wins.
+    - meta.json: format version, embedding dim and model name.
+    Writes are queued and applied by one writer thread in batches with a
+    single fsync per batch (group commit), so callers never wait on disk.
+    A torn tail after a crash is ignored on load.
+    """
+
+    def __init__(
+        self, directory: str, model_name: str | None = None, fsync: bool = True
+    ):
+        self.directory = os.path.expanduser(directory)
+        self.model_name = model_name
+        self.fsync = fsync
+        self.dim: int | None = None
+        self._vec_path = os.path.join(self.directory, "vectors.f32")
+        self._npc_vec_path = os.path.join(self.directory, "npc_vectors.f32")
+        self._log_path = os.path.join(self.directory, "log.jsonl")
+        self._meta_path = os.path.join(self.directory, "meta.json")
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._queue: "queue.Queue[tuple | None]" = queue.Queue()
+        self._cond = threading.Condition()
+        self._enqueued = 0
+        self._applied = 0
+        self._thread: threading.Thread | None = None
+        self.commits = 0
+        self.records_written = 0
+        self.errors = 0
+
+    # ---------- loading ----------
+    def _read_meta(self) -> Dict[str, Any]:
+        try:
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return meta if isinstance(meta, dict) else {}
+
+    def _map_rows(self, path: str, rows: int) -> np.ndarray | None:
+        if not self.dim or rows <= 0:
+            return None
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        rows = min(rows, size // (self.dim * 4))
+        if rows <= 0:
+            return None
+        mapped = np.memmap(path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+        # plain ndarray over the same mapping; memmap row indexing is slow
+        return mapped.view(np.ndarray)
+
+    def _read_log(self) -> List[Dict[str, Any]]:
+        """Parse log.jsonl, cutting off a torn final line so appends stay aligned."""
+        try:
+            with open(self._log_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return []
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            with open(self._log_path, "r+b") as f:
+                f.truncate(end)
+        body = data[:end].rstrip(b"\n")
+        try:
+            # one parse for the whole log is far faster than one per line
+            return json.loads(b"[" + body.replace(b"\n", b",") + b"]")
+        except ValueError:
+            pass
+        records = []
+        for line in body.splitlines():
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+        return records
+
+    def load(self) -> LoadedWorld:
+        """Read the log and map the vector files. Call before any writes."""
+        meta = self._read_meta()
+        if meta.get("version") != STORE_VERSION or not meta.get("dim"):
+            return LoadedWorld()
+        self.dim = int(meta["dim"])
+
+        by_row: Dict[int, Dict[str, Any]] = {}
+        npcs: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        for rec in self._read_log():
+            op = rec.get("op")
+            if op == "memory":
+                by_row[int(rec["row"])] = rec["memory"]
+            elif op == "npc":
+                npcs[rec["cid"]] = (int(rec["row"]), rec["snapshot"])
+
+        memories: List[Dict[str, Any]] = []
+        while len(memories) in by_row:
+            memories.append(by_row[len(memories)])
+        vectors = self._map_rows(self._vec_path, len(memories))
+        # only memories whose vector made it to disk are usable; a later
+        # append reuses the row of any record dropped here
+        memories = memories[: 0 if vectors is None else vectors.shape[0]]
+
+        npc_rows = 1 + max((row for row, _ in npcs.values()), default=-1)
+        npc_vectors = self._map_rows(self._npc_vec_path, npc_rows)
+        usable = 0 if npc_vectors is None else npc_vectors.shape[0]
+        npcs = {cid: v for cid, v in npcs.items() if v[0] < usable}
+
+        stale = bool(self.model_name and meta.get("model_name") != self.model_name)
+        return LoadedWorld(memories, vectors, npcs, npc_vectors, stale)
+
+    # ---------- writes (queued) ----------
+    def _submit(self, item: tuple) -> None:
+        with self._cond:
+            self._enqueued += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._work, name="world-store", daemon=True
+                )
+                self._thread.start()
+        self._queue.put(item)
+
+    def append_memory(self, row: int, memory: Dict[str, Any], vec: np.ndarray) -> None:
+        line = json.dumps({"op": "memory", "row": row, "memory": memory})
+        self._submit(("memory", row, line, np.array(vec, dtype=np.float32)))
+
+    def put_npc(
+        self, cid: str, row: int, snapshot: Dict[str, Any], vec: np.ndarray
+    ) -> None:
+        line = json.dumps({"op": "npc", "cid": cid, "row": row, "snapshot": snapshot})
+        self._submit(("npc", row, line, np.array(vec, dtype=np.float32)))
+
+    def rewrite_vectors(
+        self, vectors: np.ndarray, npc_vectors: np.ndarray | None
+    ) -> None:
+        """Replace every stored vector, e.g. after re-embedding."""
+        npc_copy = (
+            None if npc_vectors is None else np.array(npc_vectors, dtype=np.float32)
+        )
+        self._submit(("rewrite", np.array(vectors, dtype=np.float32), npc_copy))
+
+    def clear(self) -> None:
+        self._submit(("clear",))
+
+    # ---------- writer thread ----------
+    def _work(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            items = [item for item in batch if item is not None]
+            try:
+                self._commit(items)
+            except Exception:
+                # Fail-closed; persistence problems must not break chats
+                with self._cond:
+                    self.errors += 1
+            finally:
+                with self._cond:
+                    self._applied += len(items)
+                    self._cond.notify_all()
+            if stop:
+                return
+
+    def _write_meta(self, dim: int) -> None:
+        self.dim = dim
+        tmp = self._meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": STORE_VERSION, "dim": dim, "model_name": self.model_name}, f
+            )
+        os.replace(tmp, self._meta_path)
+
+    def _commit(self, items: List[tuple]) -> None:
+        if not items:
+            return
+        flags = os.O_RDWR | os.O_CREAT
+        vec_fd = os.open(self._vec_path, flags, 0o644)
+        npc_fd = os.open(self._npc_vec_path, flags, 0o644)
+        try:
+            with open(self._log_path, "a", encoding="utf-8") as log:
+                for item in items:
+                    self._apply(item, log, vec_fd, npc_fd)
+                log.flush()
+                if self.fsync:
+                    # vectors before the log, so a logged record has its vector
+                    os.fsync(vec_fd)
+                    os.fsync(npc_fd)
+                    os.fsync(log.fileno())
+        finally:
+            os.close(vec_fd)
+            os.close(npc_fd)
+        with self._cond:
+            self.commits += 1
+            self.records_written += len(items)
+
+    def _apply(self, item: tuple, log, vec_fd: int, npc_fd: int) -> None:
+        kind = item[0]
+        if kind == "clear":
+            log.flush()
+            log.truncate(0)
+            os.ftruncate(vec_fd, 0)
+            os.ftruncate(npc_fd, 0)
+            return
+
+        if kind == "rewrite":
+            _, matrix, npc_matrix = item
+            if matrix.size:
+                self._write_meta(int(matrix.shape[1]))
+            os.ftruncate(vec_fd, 0)
+            os.pwrite(vec_fd, matrix.tobytes(), 0)
+            os.ftruncate(npc_fd, 0)
+            if npc_matrix is not None:
+                os.pwrite(npc_fd, npc_matrix.tobytes(), 0)
+            return
+
+        _, row, line, vec = item
+        if self.dim != vec.shape[0]:
+            self._write_meta(int(vec.shape[0]))
+        fd = vec_fd if kind == "memory" else npc_fd
+        os.pwrite(fd, vec.tobytes(), row * self.dim * 4)
+        log.write(line + "\n")
+
+    # ---------- lifecycle ----------
+    def flush(self, timeout: float | None = 30.0) -> bool:
+        """Block until every queued write is on disk. Returns False on timeout."""
+        with self._cond:
+            target = self._enqueued
+            return self._cond.wait_for(lambda: self._applied >= target, timeout)
+
+    def close(self, timeout: float | None = 30.0) -> bool:
+        """Flush and stop the writer thread; it restarts lazily on the next write."""
+        flushed = self.flush(timeout)
+        with self._cond:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+        return flushed
+
+    def pending(self) -> int:
+        with self._cond:
+            return self._enqueued - self._applied
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "directory": self.directory,
+                "pending": self._enqueued - self._applied,
+                "commits": self.commits,
+                "records_written": self.records_written,
+                "errors": self.errors,
+            }
@@ -0,0 +1,210 @@
+"""
+Calibrate an inference profile for this host.
+
+Loads the model once per (thread count, batch size) pair, times prefill of a
+--prompt-tokens prompt and --decode-tokens single-token decode steps, then
+writes the fastest settings to INFERENCE_CONFIG, where Chatter picks them up
+with INFERENCE_PROFILE set to the same profile:
+
+    python -m backend.benchmarks.calibrate --model ~/models/small-Q4_K_M.gguf
+    python -m backend.benchmarks.calibrate --threads 8,16 --batches 256,512 --dry-run
+
+Decode is memory-bandwidth bound, so its best thread count is usually at or
+below the physical core count; prefill is compute bound and favours more
+threads and larger batches. The two are picked separately (n_threads from
+decode, n_threads_batch and n_batch from prefill).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from dataclasses import replace
+from typing import Callable, Dict, List, Tuple
+
+from ..app.utility.inference_profile import (
+    INFERENCE_CONFIG,
+    KV_CACHE_TYPES,
+    InferenceProfile,
+    default_profile,
+    physical_cores,
+    save_profile,
+)
+
+# (prefill tokens/sec, decode tokens/sec)
+Measurement = Tuple[float, float]
+MeasureFn = Callable[[InferenceProfile], Measurement]
+
+FILLER = (
+    "The caravan reached the harbor at dusk, and the dungeon master described "
+    "the lanterns, the gulls, the smell of tar and the watchful guards. "
+)
+
+
+def default_thread_counts() -> List[int]:
+    """Quarter, half, three quarters and all logical cores, plus physical cores."""
+    logical = os.cpu_count() or 1
+    counts = {max(1, logical * k // 4) for k in (1, 2, 3, 4)}
+    counts.add(physical_cores())
+    return sorted(counts)
+
+
+def _int_list(text: str) -> List[int]:
+    return [int(part) for part in text.split(",") if part.strip()]
+
+
+def llama_measure(
+    model_path: str, prompt_tokens: int, decode_tokens: int, repeats: int
+) -> MeasureFn:
+    """A MeasureFn that times a real model with llama-cpp."""
+
+    def measure(profile: InferenceProfile) -> Measurement:
+        from llama_cpp import Llama
+
+        llm = Llama(
+            model_path=os.path.expanduser(model_path),
+            n_ctx=prompt_tokens + decode_tokens + 16,
+            verbose=False,
+            **profile.llama_kwargs(),
+        )
+        try:
+            text = FILLER * (prompt_tokens // 16 + 1)
+            tokens = llm.tokenize(text.encode("utf-8"))[:prompt_tokens]
+            prefill, decode = [], []
+            for _ in range(repeats):
+                llm.reset()
+                start = time.perf_counter()
+                llm.eval(tokens)
+                prefill.append(len(tokens) / (time.perf_counter() - start))
+                # the forward pass is the cost; the token fed back is irrelevant
+                start = time.perf_counter()
+                for i in range(decode_tokens):
+                    llm.eval([tokens[i % len(tokens)]])
+                decode.append(decode_tokens / (time.perf_counter() - start))
+            return statistics.median(prefill), statistics.median(decode)
+        finally:
+            llm.close()
+
+    return measure
+
+
+def calibrate(
+    measure: MeasureFn,
+    base: InferenceProfile,
+    thread_counts: List[int],
+    batch_sizes: List[int],
+    log: Callable[[str], None] = lambda line: None,
+) -> Tuple[InferenceProfile, List[Dict]]:
+    """
+    Time every (threads, batch) pair and return the base profile with the
+    best decode thread count and the best prefill thread count and batch,
+    plus the raw results.
+    """
+    results = []
+    for n_batch in batch_sizes:
+        for threads in thread_counts:
+            candidate = replace(
+                base,
+                n_threads=threads,
+                n_threads_batch=threads,
+                n_batch=n_batch,
+                n_ubatch=min(base.n_ubatch, n_batch),
+            )
+            prefill_tps, decode_tps = measure(candidate)
+            results.append(
+                {
+                    "n_threads": threads,
+                    "n_batch": n_batch,
+                    "prefill_tps": round(prefill_tps, 2),
+                    "decode_tps": round(decode_tps, 2),
+                }
+            )
+            log(
+                f"threads={threads:<3} batch={n_batch:<5} "
+                f"prefill={prefill_tps:8.1f} tok/s  decode={decode_tps:6.2f} tok/s"
+            )
+    best_decode = max(results, key=lambda r: r["decode_tps"])
+    best_prefill = max(results, key=lambda r: r["prefill_tps"])
+    best = replace(
+        base,
+        n_threads=best_decode["n_threads"],
+        n_threads_batch=best_prefill["n_threads"],
+        n_batch=best_prefill["n_batch"],
+        n_ubatch=min(base.n_ubatch, best_prefill["n_batch"]),
+    )
+    return best, results
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--model",
+        default=os.getenv("MODEL_PATH", "~/dev/llm/Harbinger-24B-Q5_K_M.gguf"),
+        help="GGUF to benchmark (default: MODEL_PATH)",
+    )
+    parser.add_argument("--profile", default="cpu", choices=("cpu", "gpu"))
+    parser.add_argument(
+        "--threads", type=_int_list, help="comma-separated thread counts to try"
+    )
+    parser.add_argument(
+        "--batches",
+        type=_int_list,
+        default=[128, 256, 512, 1024],
+        help="comma-separated n_batch sizes to try",
+    )
+    parser.add_argument("--prompt-tokens", type=int, default=512)
+    parser.add_argument("--decode-tokens", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=2, help="median of N runs")
+    parser.add_argument(
+        "--kv-cache-type", choices=sorted(KV_CACHE_TYPES), default="f16"
+    )
+    parser.add_argument("--flash-attn", action="store_true")
+    parser.add_argument(
+        "--mlock", action="store_true", help="lock the weights in RAM (no swapping)"
+    )
+    parser.add_argument("--no-mmap", action="store_true")
+    parser.add_argument("--out", default=INFERENCE_CONFIG, help="config file to write")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="print the result, write nothing"
+    )
+    return parser
+
+
+def main(argv: List[str] | None = None, measure: MeasureFn | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    base = replace(
+        default_profile(args.profile),
+        kv_cache_type=args.kv_cache_type,
+        flash_attn=args.flash_attn,
+        use_mlock=args.mlock,
+        use_mmap=not args.no_mmap,
+    )
+    if measure is None:
+        measure = llama_measure(
+            args.model, args.prompt_tokens, args.decode_tokens, args.repeats
+        )
+    thread_counts = args.threads or default_thread_counts()
+    best, results = calibrate(
+        measure,
+        base,
+        thread_counts,
+        args.batches,
+        log=lambda line: print(line, file=sys.stderr),
+    )
+    calibration = {
+        "model": os.path.basename(args.model),
+        "prompt_tokens": args.prompt_tokens,
+        "decode_tokens": args.decode_tokens,
+        "results": results,
+    }
+    report = {"profile": best.name, "settings": best.to_dict()}
+    if not args.dry_run:
+        report["written_to"] = save_profile(best, args.out, calibration)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
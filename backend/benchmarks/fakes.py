@@ -0,0 +1,282 @@
+"""
+Deterministic stand-ins for the model-backed components, so benchmarks and
+load tests run offline without torch, llama_cpp or a GPU.
+"""
+
+import random
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Sequence
+
+import numpy as np
+
+from ..app.utility.history import History
+from ..app.utility.scheduler import BACKGROUND, NARRATION, InferenceScheduler
+
+
+class HashEmbedder:
+    """
+    Bag-of-words embedder: each word is hashed to a signed dimension and the
+    sum is L2-normalized. Same text, same vector; shared words raise the
+    cosine similarity, which is enough for retrieval to behave sensibly.
+    Matches the EmbeddingModel interface used by WorldMemory.
+    """
+
+    def __init__(self, dim: int = 384, model_name: str = "fake-hash"):
+        self.dim = dim
+        self.model_name = model_name
+
+    def _vector(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            h = zlib.crc32(word.encode("utf-8"))
+            vec[h % self.dim] += 1.0 if (h >> 16) & 1 else -1.0
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else vec
+
+    def embed(self, text: str) -> List[float]:
+        return self._vector(text).tolist()
+
+    def embed_many(self, texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([self._vector(t) for t in texts])
+
+    def cache_stats(self) -> dict:
+        return {"model_name": self.model_name}
+
+
+class SlowHashEmbedder(HashEmbedder):
+    """HashEmbedder that also sleeps like a real encoder forward pass."""
+
+    def __init__(self, latency_ms: float = 5.0, per_text_ms: float = 0.5, **kwargs):
+        super().__init__(**kwargs)
+        self.latency_ms = latency_ms
+        self.per_text_ms = per_text_ms
+
+    def embed(self, text: str) -> List[float]:
+        time.sleep((self.latency_ms + self.per_text_ms) / 1000.0)
+        return super().embed(text)
+
+    def embed_many(self, texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+        time.sleep((self.latency_ms + self.per_text_ms * len(texts)) / 1000.0)
+        return super().embed_many(texts, batch_size)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class SimulatedLlm:
+    """
+    Stand-in for llama_cpp.Llama.create_chat_completion with GPU-like timing:
+    prefill costs prompt_tokens / prefill_tps seconds, then each generated
+    token costs 1 / decode_tps. Streams yield one chunk per token.
+    time_scale < 1 compresses every delay (e.g. 0.1 for quick runs).
+    Not thread-safe by design, like the real model: callers go through an
+    InferenceScheduler.
+    """
+
+    WORDS = "the torchlight flickers across wet stone as distant bells ring".split()
+
+    def __init__(
+        self,
+        prefill_tps: float = 1500.0,
+        decode_tps: float = 35.0,
+        reply_tokens: int = 120,
+        time_scale: float = 1.0,
+        seed: int = 0,
+    ):
+        self.prefill_tps = prefill_tps
+        self.decode_tps = decode_tps
+        self.reply_tokens = reply_tokens
+        self.time_scale = time_scale
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def _sleep(self, seconds: float) -> None:
+        if seconds > 0 and self.time_scale > 0:
+            time.sleep(seconds * self.time_scale)
+
+    def _plan(self, messages: List[Dict[str, Any]], max_tokens: int | None):
+        prompt = sum(estimate_tokens(str(m.get("content", ""))) + 5 for m in messages)
+        with self._lock:
+            jitter = self._rng.uniform(0.5, 1.5)
+        n = max(1, int(self.reply_tokens * jitter))
+        if max_tokens:
+            n = min(n, max_tokens)
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt
+            self.completion_tokens += n
+        return prompt, n
+
+    def create_chat_completion(
+        self, messages, max_tokens: int | None = None, stream: bool = False, **kwargs
+    ):
+        prompt, n = self._plan(messages, max_tokens)
+        if stream:
+            return self._stream(prompt, n)
+        self._sleep(prompt / self.prefill_tps + n / self.decode_tps)
+        text = " ".join(self.WORDS[i % len(self.WORDS)] for i in range(n))
+        return {
+            "choices": [{"message": {"role": "assistant", "content": text}}],
+            "usage": {"prompt_tokens": prompt, "completion_tokens": n},
+        }
+
+    def _stream(self, prompt: int, n: int) -> Iterator[Dict[str, Any]]:
+        self._sleep(prompt / self.prefill_tps)
+        for i in range(n):
+            self._sleep(1.0 / self.decode_tps)
+            word = self.WORDS[i % len(self.WORDS)]
+            yield {"choices": [{"delta": {"content": word + " "}}]}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+            }
+
+
+class FakeChatter:
+    """
+    Chatter stand-in driving a shared scheduler (and so a SimulatedLlm) the
+    way the real Chatter does: narration at NARRATION priority with a real
+    History, memory analysis at BACKGROUND priority. memory_rate is the
+    fraction of turns that yield a storable fact.
+    """
+
+    def __init__(
+        self,
+        scheduler: InferenceScheduler,
+        max_history_tokens: int = 14_336,
+        memory_rate: float = 0.5,
+        seed: int | None = None,
+    ):
+        self.scheduler = scheduler
+        self.memory_rate = memory_rate
+        self._rng = random.Random(seed)
+        self.history = History(
+            max_history_tokens, "You are the dungeon master.", "system", 12
+        )
+
+    def _messages(self, world_facts: str | None) -> List[Dict[str, Any]]:
+        messages = self.history.build_context()
+        if world_facts:
+            # stable_prefix layout: facts folded into the latest player message
+            latest = messages[-1]
+            messages = messages[:-1] + [
+                {"role": "user", "content": f"{world_facts}\n\n{latest['content']}"}
+            ]
+        return messages
+
+    def chat(self, user_input: str, world_facts: str | None = None) -> str:
+        self.history.add_message("user", user_input, estimate_tokens(user_input) + 5)
+        response = self.scheduler.complete(
+            NARRATION, messages=self._messages(world_facts), max_tokens=512
+        )
+        text = response["choices"][0]["message"]["content"]
+        tokens = response["usage"]["completion_tokens"] + 5
+        self.history.add_message("assistant", text, tokens)
+        return text
+
+    def chat_stream(
+        self, user_input: str, world_facts: str | None = None
+    ) -> Iterator[str]:
+        self.history.add_message("user", user_input, estimate_tokens(user_input) + 5)
+        parts: List[str] = []
+        try:
+            for chunk in self.scheduler.stream(
+                NARRATION, messages=self._messages(world_facts), max_tokens=512
+            ):
+                delta = chunk["choices"][0]["delta"].get("content")
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        finally:
+            if parts:
+                text = "".join(parts)
+                self.history.add_message("assistant", text, estimate_tokens(text) + 5)
+
+    def analyze_conversation_for_memories(self, conversation_context: dict):
+        prompt = f"{conversation_context.get('context', '')}\nReturn the JSON object:"
+        self.scheduler.complete(
+            BACKGROUND,
+            messages=[
+                {"role": "system", "content": "Extract ONE persistent fact. " * 40},
+                {"role": "user", "content": prompt},
+            ],
+            max_tokens=80,
+        )
+        if self._rng.random() >= self.memory_rate:
+            return None
+        user_message = str(conversation_context.get("user_message", ""))
+        return {
+            "summary": f"The player said: {user_message[:120]}",
+            "entities": [w for w in user_message.split() if w[:1].isupper()][:3],
+            "type": "other",
+            "confidence": 0.9,
+        }
+
+    def analyze_turns_for_memories(self, turns: List[dict]) -> List[dict]:
+        transcript = "\n\n".join(
+            f"Player: {t.get('user_message', '')}\n\nDM: {t.get('dm_response', '')}"
+            for t in turns
+        )
+        self.scheduler.complete(
+            BACKGROUND,
+            messages=[
+                {"role": "system", "content": "Extract the persistent facts. " * 40},
+                {"role": "user", "content": f"{transcript}\nReturn the JSON object:"},
+            ],
+            max_tokens=80 * len(turns),
+        )
+        facts = []
+        for turn in turns:
+            if self._rng.random() >= self.memory_rate:
+                continue
+            user_message = str(turn.get("user_message", ""))
+            facts.append(
+                {
+                    "summary": f"The player said: {user_message[:120]}",
+                    "entities": [w for w in user_message.split() if w[:1].isupper()][
+                        :3
+                    ],
+                    "type": "other",
+                    "confidence": 0.9,
+                }
+            )
+        return facts
+
+
+PLACES = ["harbor", "market", "keep", "forest", "temple", "docks", "mine", "tavern"]
+PEOPLE = ["Mira", "Garrick", "Finnigan", "Elara", "Thorne", "Vex", "Odo", "Lysa"]
+TYPES = ["npc", "location", "item", "goal", "threat", "world_state", "other"]
+
+
+def synthetic_fact(i: int) -> dict:
+    """The i-th fact of a reproducible synthetic campaign."""
+    person = PEOPLE[i % len(PEOPLE)]
+    place = PLACES[(i // len(PEOPLE)) % len(PLACES)]
+    mem_type = TYPES[i % len(TYPES)]
+    item = {
+        "summary": f"{person} {i} was seen near the {place} carrying relic {i % 97}",
+        "entities": [f"{person} {i}", place],
+        "type": mem_type,
+    }
+    if mem_type == "npc":
+        item["npc"] = {
+            "name": f"{person} {i % 500}",
+            "last_seen_location": place,
+            "intent": f"find relic {i % 97}",
+            "relationship_to_player": "neutral",
+            "confidence": 0.8,
+        }
+    return item
@@ -0,0 +1,224 @@
+"""
+Micro-benchmarks for the world-memory and history hot paths.
+
+Runs offline with the deterministic HashEmbedder and prints JSON results
+that can be saved and compared between commits:
+
+    python -m backend.benchmarks.hot_paths --scales 100,10000 --out before.json
+    python -m backend.benchmarks.hot_paths --compare before.json
+
+--compare exits non-zero when a benchmark's median is slower than the
+baseline by more than --threshold (default 1.25x).
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from ..app.utility.history import History
+from ..app.utility.llama import clean_json_text
+from ..app.world.context_builder import (
+    format_npc_cards,
+    format_world_facts,
+    weighted_retrieve,
+)
+from ..app.world.ann_index import make_index
+from ..app.world.memory import WorldMemory
+from ..app.world.memory_utils import sanitize_entities
+from .fakes import HashEmbedder, synthetic_fact
+
+DEFAULT_SCALES = (100, 10_000, 100_000)
+QUERIES = [
+    "who was seen near the harbor",
+    "Mira carrying a relic at the market",
+    "threats around the temple",
+    "Garrick 42 in the forest",
+]
+JSON_REPLY = (
+    "```json\n"
+    '{"summary": "Mira distrusts the player", "entities": ["Mira", "player"], '
+    '"type": "npc", "confidence": 0. 9, "npc": {"name": "Mira", "aliases": [], '
+    '"last_seen_location": "docks", "intent": "sell {rare} goods", '
+    '"relationship_to_player": "hostile", "confidence": 0.9}}\n'
+    '{"summary": "second object"}\n'
+    "```"
+)
+
+
+def measure(fn: Callable[[], object], min_time: float = 0.2, max_iters: int = 2000):
+    """Time fn() repeatedly; returns per-call statistics in microseconds."""
+    fn()  # warm-up
+    samples: List[float] = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < max_iters and (
+        len(samples) < 5 or time.perf_counter() < deadline
+    ):
+        start = time.perf_counter_ns()
+        fn()
+        samples.append((time.perf_counter_ns() - start) / 1000.0)
+    samples.sort()
+    return {
+        "iterations": len(samples),
+        "median_us": round(statistics.median(samples), 2),
+        "mean_us": round(statistics.fmean(samples), 2),
+        "p95_us": round(samples[int(0.95 * (len(samples) - 1))], 2),
+        "min_us": round(samples[0], 2),
+    }
+
+
+def build_world(
+    embedder: HashEmbedder, scale: int, index: str = "exact"
+) -> WorldMemory:
+    wm = WorldMemory(
+        embedder.embed, embed_many_fn=embedder.embed_many, index=make_index(index)
+    )
+    chunk = 5_000
+    for start in range(0, scale, chunk):
+        wm.add_memories(
+            synthetic_fact(i) for i in range(start, min(scale, start + chunk))
+        )
+    return wm
+
+
+def build_history(scale: int) -> History:
+    history = History(14_336, "You are the dungeon master.", "system", 12)
+    for i in range(scale):
+        role = "user" if i % 2 == 0 else "assistant"
+        history.add_message(role, f"message {i} " * 20, 60)
+    return history
+
+
+def run_scale(scale: int, min_time: float, index: str = "exact") -> List[Dict]:
+    embedder = HashEmbedder()
+    results: List[Dict] = []
+
+    def record(name: str, fn: Callable[[], object]) -> None:
+        stats = measure(fn, min_time=min_time)
+        results.append({"name": name, "scale": scale, **stats})
+
+    start = time.perf_counter()
+    wm = build_world(embedder, scale, index)
+    results.append(
+        {
+            "name": "world.add_memories_bulk",
+            "scale": scale,
+            "iterations": 1,
+            "total_sec": round(time.perf_counter() - start, 3),
+        }
+    )
+
+    counter = iter(range(scale, scale + 10_000_000))
+    record(
+        "world.add_memory",
+        lambda: wm.add_memory(**_as_kwargs(synthetic_fact(next(counter)))),
+    )
+    queries = iter(QUERIES * 1_000_000)
+    record("world.retrieve", lambda: wm.retrieve(next(queries), k=5))
+    record(
+        "context.weighted_retrieve", lambda: weighted_retrieve(wm, next(queries), k=5)
+    )
+    record(
+        "world.get_relevant_npc_snapshots",
+        lambda: wm.get_relevant_npc_snapshots(next(queries), k=2),
+    )
+
+    facts = wm.retrieve(QUERIES[0], k=8)
+    snaps = wm.get_relevant_npc_snapshots(QUERIES[1], k=2)
+    entities = ["Mira", "player", "mira", " Garrick ", "", 7, "Harbor", "harbor"] * 2
+    record("context.format_world_facts", lambda: format_world_facts(facts))
+    record("context.format_npc_cards", lambda: format_npc_cards(snaps))
+    record("memory_utils.sanitize_entities", lambda: sanitize_entities(entities))
+
+    history = build_history(scale)
+    record("history.build_context", history.build_context)
+    record("llama.clean_json_text", lambda: clean_json_text(JSON_REPLY))
+    return results
+
+
+def _as_kwargs(item: Dict) -> Dict:
+    return {
+        "summary": item["summary"],
+        "entities": item["entities"],
+        "mem_type": item["type"],
+        "npc": item.get("npc"),
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Describe every benchmark whose median regressed beyond threshold."""
+    base = {
+        (r["name"], r["scale"]): r
+        for r in baseline.get("results", [])
+        if "median_us" in r
+    }
+    regressions = []
+    for r in current["results"]:
+        old = base.get((r["name"], r["scale"]))
+        if old is None or "median_us" not in r or not old["median_us"]:
+            continue
+        ratio = r["median_us"] / old["median_us"]
+        if ratio > threshold:
+            regressions.append(
+                f"{r['name']} @ {r['scale']}: {old['median_us']}us -> "
+                f"{r['median_us']}us ({ratio:.2f}x)"
+            )
+    return regressions
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--scales",
+        default=",".join(map(str, DEFAULT_SCALES)),
+        help="comma-separated world / history sizes",
+    )
+    parser.add_argument(
+        "--min-time", type=float, default=0.2, help="seconds per benchmark"
+    )
+    parser.add_argument(
+        "--index", default="exact", help="WorldMemory retrieval index: exact or ivf"
+    )
+    parser.add_argument("--out", help="write JSON results to this file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "scales": scales,
+            "index": args.index,
+        },
+        "results": [
+            r for scale in scales for r in run_scale(scale, args.min_time, args.index)
+        ],
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
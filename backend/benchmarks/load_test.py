@@ -0,0 +1,365 @@
+"""
+End-to-end HTTP load test for the chat API.
+
+Without --url it serves the real FastAPI app in-process (uvicorn on a free
+local port) with the model-backed pieces swapped for stand-ins: a
+SimulatedLlm behind a real InferenceScheduler, FakeChatter sessions and a
+hashed embedder with simulated latency. Everything else (routing, sessions,
+turn locks, retrieval, the memory-extraction queue) is the production code,
+so queueing, locking and retrieval overhead show up in the numbers.
+
+    python -m backend.benchmarks.load_test --concurrency 16 --duration 30
+    python -m backend.benchmarks.load_test --url http://localhost:8000 --duration 60
+
+Virtual users loop: think (exponential, mean --think-time), then send one
+request picked from --mix. Prints per-endpoint p50/p95/p99 latency,
+throughput and error rates as JSON.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import socket
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+import httpx
+
+from ..app.utility.scheduler import InferenceScheduler
+from ..app.world.memory import WorldMemory
+from ..app.world.sessions import SessionStore
+from .fakes import (
+    FakeChatter,
+    HashEmbedder,
+    SimulatedLlm,
+    SlowHashEmbedder,
+    synthetic_fact,
+)
+
+PLAYER_LINES = [
+    "I walk to the harbor and ask Mira about the missing relic",
+    "I draw my sword and check the alley behind the tavern",
+    "Who is Garrick and why is he following me?",
+    "I search the temple for hidden doors",
+    "I offer the merchant ten gold for the map",
+    "I sneak into the keep after midnight",
+]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list (0.0 when empty)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+@dataclass
+class EndpointStats:
+    latencies: List[float] = field(default_factory=list)
+    first_token: List[float] = field(default_factory=list)
+    statuses: Dict[str, int] = field(default_factory=dict)
+    errors: int = 0
+
+    def record(self, status: str, latency: float, ok: bool, ttft: float | None = None):
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if ok:
+            self.latencies.append(latency)
+            if ttft is not None:
+                self.first_token.append(ttft)
+        else:
+            self.errors += 1
+
+    def summary(self, elapsed: float) -> dict:
+        lat = sorted(self.latencies)
+        count = len(lat) + self.errors
+        out = {
+            "requests": count,
+            "ok": len(lat),
+            "errors": self.errors,
+            "error_rate": round(self.errors / count, 4) if count else 0.0,
+            "throughput_rps": round(len(lat) / elapsed, 3) if elapsed > 0 else 0.0,
+            "statuses": dict(sorted(self.statuses.items())),
+            "latency_ms": _latency_summary(lat),
+        }
+        if self.first_token:
+            out["first_token_ms"] = _latency_summary(sorted(self.first_token))
+        return out
+
+
+def _latency_summary(sorted_sec: List[float]) -> dict:
+    ms = [v * 1000.0 for v in sorted_sec]
+    return {
+        "p50": round(percentile(ms, 50), 2),
+        "p95": round(percentile(ms, 95), 2),
+        "p99": round(percentile(ms, 99), 2),
+        "mean": round(sum(ms) / len(ms), 2) if ms else 0.0,
+        "max": round(ms[-1], 2) if ms else 0.0,
+    }
+
+
+def parse_mix(text: str) -> List[Tuple[str, float]]:
+    """ "chat=0.7,stream=0.3" -> [("chat", 0.7), ("stream", 0.3)]."""
+    mix = []
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ("chat", "stream"):
+            raise ValueError(f"Unknown endpoint in mix: {name!r}")
+        mix.append((name, float(weight or 1.0)))
+    return mix
+
+
+async def _send_chat(client, stats, payload) -> None:
+    start = time.perf_counter()
+    try:
+        response = await client.post("/chat", json=payload)
+        ok = response.status_code == 200 and "reply" in response.json()
+        stats.record(str(response.status_code), time.perf_counter() - start, ok)
+    except httpx.HTTPError as e:
+        stats.record(type(e).__name__, time.perf_counter() - start, False)
+
+
+async def _send_stream(client, stats, payload) -> None:
+    start = time.perf_counter()
+    ttft = None
+    event = None
+    ok = False
+    try:
+        async with client.stream("POST", "/chat/stream", json=payload) as response:
+            status = str(response.status_code)
+            if response.status_code == 200:
+                async for line in response.aiter_lines():
+                    if line.startswith("event: "):
+                        event = line[7:]
+                        if event == "token" and ttft is None:
+                            ttft = time.perf_counter() - start
+                        ok = event == "done"
+                        if event == "error":
+                            break
+            else:
+                await response.aread()
+        stats.record(status, time.perf_counter() - start, ok, ttft)
+    except httpx.HTTPError as e:
+        stats.record(type(e).__name__, time.perf_counter() - start, False)
+
+
+async def _virtual_user(
+    user: int,
+    client: httpx.AsyncClient,
+    stats: Dict[str, EndpointStats],
+    args: argparse.Namespace,
+    deadline: float,
+    budget: List[int],
+) -> None:
+    rng = random.Random(args.seed + user)
+    names = [n for n, _ in args.mix]
+    weights = [w for _, w in args.mix]
+    session_id = "load-shared" if args.shared_session else f"load-{user}"
+    while time.perf_counter() < deadline:
+        if args.think_time > 0:
+            await asyncio.sleep(rng.expovariate(1.0 / args.think_time))
+        if time.perf_counter() >= deadline:
+            return
+        if args.requests:
+            if budget[0] <= 0:
+                return
+            budget[0] -= 1
+        endpoint = rng.choices(names, weights)[0]
+        payload = {"message": rng.choice(PLAYER_LINES), "session_id": session_id}
+        if endpoint == "chat":
+            await _send_chat(client, stats["/chat"], payload)
+        else:
+            await _send_stream(client, stats["/chat/stream"], payload)
+
+
+async def run_load(
+    base_url: str,
+    args: argparse.Namespace,
+    transport: httpx.AsyncBaseTransport | None = None,
+) -> dict:
+    """Drive base_url with args.concurrency virtual users; returns the report."""
+    stats = {"/chat": EndpointStats(), "/chat/stream": EndpointStats()}
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    timeout = httpx.Timeout(args.timeout)
+    budget = [args.requests or 0]
+    start = time.perf_counter()
+    deadline = start + (args.duration if args.duration > 0 else float("inf"))
+    async with httpx.AsyncClient(
+        base_url=base_url, transport=transport, limits=limits, timeout=timeout
+    ) as client:
+        await asyncio.gather(
+            *(
+                _virtual_user(u, client, stats, args, deadline, budget)
+                for u in range(args.concurrency)
+            )
+        )
+    elapsed = time.perf_counter() - start
+    return {
+        "config": {
+            "concurrency": args.concurrency,
+            "duration_sec": args.duration,
+            "requests": args.requests,
+            "think_time_sec": args.think_time,
+            "mix": dict(args.mix),
+            "shared_session": args.shared_session,
+        },
+        "elapsed_sec": round(elapsed, 3),
+        "endpoints": {
+            name: s.summary(elapsed)
+            for name, s in stats.items()
+            if s.latencies or s.errors
+        },
+    }
+
+
+def build_fake_app(args: argparse.Namespace):
+    """
+    The production app with model-backed dependencies replaced by stand-ins.
+    Returns (app, cleanup, stats_fn).
+    """
+    from ..app import dependencies
+    from ..app.main import app
+
+    llm = SimulatedLlm(
+        prefill_tps=args.prefill_tps,
+        decode_tps=args.decode_tps,
+        reply_tokens=args.reply_tokens,
+        time_scale=args.time_scale,
+        seed=args.seed,
+    )
+    scheduler = InferenceScheduler(llm, max_queue=args.queue_size)
+    embedder = SlowHashEmbedder(latency_ms=args.embed_ms * args.time_scale)
+    seed_facts = [synthetic_fact(i) for i in range(args.world_size)]
+
+    seeder = HashEmbedder()  # same vectors, no simulated latency
+
+    def new_world(session_id: str) -> WorldMemory:
+        # seeding is setup, not load: embed it without the simulated delay
+        wm = WorldMemory(embedder.embed, embed_many_fn=seeder.embed_many)
+        if seed_facts:
+            wm.add_memories(seed_facts)
+        wm.embed_many_fn = embedder.embed_many
+        return wm
+
+    seq = iter(range(1_000_000_000))
+    store = SessionStore(
+        lambda: FakeChatter(scheduler, memory_rate=args.memory_rate, seed=next(seq)),
+        new_world,
+        max_sessions=max(args.concurrency * 2, 32),
+    )
+    app.dependency_overrides[dependencies.get_session_store] = lambda: store
+    app.dependency_overrides[dependencies.get_inference_scheduler] = lambda: scheduler
+
+    def cleanup() -> None:
+        store.flush_turn_batches()
+        dependencies.get_memory_queue().shutdown()
+        app.dependency_overrides.clear()
+
+    def server_stats() -> dict:
+        return {
+            "scheduler": scheduler.stats(),
+            "memory_queue": dependencies.get_memory_queue().stats(),
+            "sessions": store.stats(),
+            "simulated_llm": llm.stats(),
+        }
+
+    return app, cleanup, server_stats
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_in_thread(app) -> Tuple[str, object]:
+    """Run app under uvicorn in a daemon thread; returns (base_url, server)."""
+    import uvicorn
+
+    port = _free_port()
+    config = uvicorn.Config(
+        app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"
+    )
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}", server
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="target a running server instead of stand-ins")
+    parser.add_argument("--concurrency", type=int, default=8, help="virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument(
+        "--requests", type=int, default=0, help="stop after N (0: no cap)"
+    )
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean seconds")
+    parser.add_argument(
+        "--mix", type=parse_mix, default=parse_mix("chat=0.5,stream=0.5")
+    )
+    parser.add_argument(
+        "--shared-session", action="store_true", help="one session for all users"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=300.0, help="per-request seconds"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the JSON report to this file")
+    sim = parser.add_argument_group("stand-ins (ignored with --url)")
+    sim.add_argument("--prefill-tps", type=float, default=1500.0)
+    sim.add_argument("--decode-tps", type=float, default=35.0)
+    sim.add_argument("--reply-tokens", type=int, default=120)
+    sim.add_argument("--embed-ms", type=float, default=5.0)
+    sim.add_argument("--memory-rate", type=float, default=0.5)
+    sim.add_argument(
+        "--world-size", type=int, default=1000, help="seed facts per session"
+    )
+    sim.add_argument("--queue-size", type=int, default=8, help="INFERENCE_QUEUE_SIZE")
+    sim.add_argument(
+        "--time-scale", type=float, default=1.0, help="scale all simulated delays"
+    )
+    return parser
+
+
+def main(argv: List[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    if not args.duration and not args.requests:
+        args.duration = 30.0
+
+    cleanup = None
+    server = None
+    server_stats = None
+    base_url = args.url
+    if not base_url:
+        app, cleanup, server_stats = build_fake_app(args)
+        base_url, server = serve_in_thread(app)
+    try:
+        report = asyncio.run(run_load(base_url, args))
+        if server_stats is not None:
+            report["server"] = server_stats()
+    finally:
+        if server is not None:
+            server.should_exit = True
+        if cleanup is not None:
+            cleanup()
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -26,7 +26,9 @@ class DebugConsole:
         # Initialize components
         self.chatter = Chatter(model_path)
         self.embed_model = get_embedding_model()
-        self.world_memory = WorldMemory(self.embed_model.embed)
+        self.world_memory = WorldMemory(
+            self.embed_model.embed, embed_many_fn=self.embed_model.embed_many
+        )
 
         # Chat history for context
         self.chat_history = []
@@ -217,8 +219,11 @@ class DebugConsole:
             ),
         ]
 
-        for summary, entities, mem_type in samples:
-            mem_id = self.world_memory.add_memory(summary, entities, mem_type)
+        mem_ids = self.world_memory.add_memories(
+            {"summary": summary, "entities": entities, "type": mem_type}
+            for summary, entities, mem_type in samples
+        )
+        for (summary, _, _), mem_id in zip(samples, mem_ids):
             print(f"✓ Added: {summary[:50]}... (ID: {mem_id[:8]})")
 
     def process_chat_message(self, user_message: str):
@@ -344,7 +349,7 @@ class DebugConsole:
                 elif user_input == "/add_sample":
                     self.add_sample_memories()
                 elif user_input == "/clear_memory":
-                    self.world_memory.memories.clear()
+                    self.world_memory.clear()
                     print("✓ World memory cleared")
                 elif user_input.startswith("/embed "):
                     text = user_input[7:].strip()
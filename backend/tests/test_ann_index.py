@@ -0,0 +1,85 @@
+# test_ann_index.py
+import numpy as np
+
+from backend.app.world.ann_index import (
+    ExactIndex,
+    IVFIndex,
+    make_index,
+    recall_at_k,
+)
+from backend.app.world.memory import WorldMemory
+from backend.tests.test_memory import _fake_embed
+
+
+def _clustered(n: int, dim: int = 32, centers: int = 50, seed: int = 0):
+    """Normalized vectors scattered around random topic centers."""
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((centers, dim))
+    vecs = topics[rng.integers(0, centers, n)] + 0.5 * rng.standard_normal((n, dim))
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    return vecs.astype(np.float32), rng
+
+
+def test_small_store_uses_exact_search():
+    matrix, rng = _clustered(500)
+    index = IVFIndex(min_train=1000)
+    q = matrix[3]
+    rows, scores = index.search(matrix, q, 5)
+    exact_rows, exact_scores = ExactIndex().search(matrix, q, 5)
+    assert rows.tolist() == exact_rows.tolist()
+    assert np.allclose(scores, exact_scores)
+    assert not index.trained
+    assert index.stats()["exact_searches"] == 1
+
+
+def test_recall_at_k_against_exact_search():
+    matrix, rng = _clustered(20_000)
+    queries = matrix[rng.choice(len(matrix), 50, replace=False)]
+
+    index = IVFIndex(nprobe=8, min_train=1000)
+    assert recall_at_k(matrix, index, queries, k=10) >= 0.9
+    assert index.trained
+    assert index.stats()["ann_searches"] == 50
+
+    # probing every list is exact
+    index.nprobe = index.stats()["nlist"]
+    assert recall_at_k(matrix, index, queries, k=10) == 1.0
+
+
+def test_incremental_inserts_are_searchable():
+    matrix, rng = _clustered(5_000)
+    index = IVFIndex(nprobe=4, min_train=1000, retrain_factor=100)
+    index.add(matrix[:4_000])
+    assert index.stats()["indexed"] == 4_000
+
+    for n in range(4_001, 4_021):
+        index.add(matrix[:n])
+        rows, _ = index.search(matrix[:n], matrix[n - 1], 1)
+        assert rows[0] == n - 1
+    assert index.stats()["indexed"] == 4_020
+
+
+def test_world_memory_with_ivf_index():
+    index = make_index("ivf", nprobe=64, min_train=100)
+    wm = WorldMemory(_fake_embed, index=index)
+    for i in range(300):
+        wm.add_memory(f"the guard {i} patrols gate {i % 7}", [], "other")
+    dragon = wm.add_memory("the dragon sleeps in the cave", ["dragon"], "threat")
+    assert index.trained
+
+    assert wm.retrieve("dragon cave", k=1)[0]["id"] == dragon
+    # whole-store dedupe goes through the index
+    assert (
+        wm.add_memory(
+            "the dragon sleeps in the cave",
+            [],
+            "threat",
+            dedupe_check=True,
+            dedupe_window=None,
+        )
+        == dragon
+    )
+
+    wm.clear()
+    assert not index.trained
+    assert wm.retrieve("dragon", k=1) == []
@@ -1,9 +1,15 @@
+import json
+import time
+
 import pytest
+from fastapi import Depends
 from fastapi.testclient import TestClient
 
 import backend.app.dependencies as dependencies
 import backend.app.main as main
 from backend.app.main import app
+from backend.app.utility.scheduler import SchedulerBusy
+from backend.tests.test_memory import _fake_embed
 
 
 class FakeChatter:
@@ -19,9 +25,29 @@ class FakeChatter:
 def reset_chatter_cache():
     if hasattr(dependencies.get_chatter, "cache_clear"):
         dependencies.get_chatter.cache_clear()
+    dependencies.get_session_store.cache_clear()
+    dependencies.get_readiness.cache_clear()
     yield
     if hasattr(dependencies.get_chatter, "cache_clear"):
         dependencies.get_chatter.cache_clear()
+    dependencies.get_session_store.cache_clear()
+    dependencies.get_readiness.cache_clear()
+
+
+class FakeEmbeddings:
+    model_name = "fake"
+
+    def embed(self, text: str) -> list[float]:
+        return _fake_embed(text)
+
+    def embed_many(self, texts):
+        return [_fake_embed(t) for t in texts]
+
+
+@pytest.fixture(autouse=True)
+def fake_embeddings(monkeypatch):
+    # keep the real embedding model (and torch) out of API tests
+    monkeypatch.setattr(dependencies, "get_embeddings", FakeEmbeddings)
 
 
 @pytest.fixture
@@ -31,7 +57,7 @@ def fake_chatter():
 
 @pytest.fixture
 def client(monkeypatch, fake_chatter):
-    monkeypatch.setattr(main, "get_chatter", lambda: fake_chatter)
+    monkeypatch.setattr(main, "load_model", lambda: None)
     app.dependency_overrides[dependencies.get_chatter] = lambda: fake_chatter
     with TestClient(app) as client:
         yield client
@@ -41,7 +67,7 @@ def client(monkeypatch, fake_chatter):
 @pytest.fixture
 def client_no_raise(monkeypatch, fake_chatter):
     """TestClient that doesn't raise exceptions, allowing testing of 500 responses."""
-    monkeypatch.setattr(main, "get_chatter", lambda: fake_chatter)
+    monkeypatch.setattr(main, "load_model", lambda: None)
     app.dependency_overrides[dependencies.get_chatter] = lambda: fake_chatter
     with TestClient(app, raise_server_exceptions=False) as client:
         yield client
@@ -54,6 +80,40 @@ def test_health(client):
     assert response.json() == {"status": "ok"}
 
 
+def _wait_for_ready(client, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        response = client.get("/ready")
+        states = {c["state"] for c in response.json()["components"].values()}
+        if not states & {"pending", "loading", "warming"}:
+            return response
+        if time.monotonic() > deadline:
+            return response
+        time.sleep(0.01)
+
+
+def test_ready_after_preload(client):
+    response = _wait_for_ready(client)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ready"] is True
+    assert set(body["components"]) == {"llm", "embeddings"}
+    assert body["components"]["embeddings"]["state"] == "ready"
+
+
+def test_not_ready_when_a_component_fails(monkeypatch, fake_chatter):
+    def fail():
+        raise RuntimeError("No GPU detected. GPU is required.")
+
+    monkeypatch.setattr(main, "load_model", fail)
+    with TestClient(app) as client:
+        response = _wait_for_ready(client)
+    assert response.status_code == 503
+    llm = response.json()["components"]["llm"]
+    assert llm["state"] == "failed"
+    assert "No GPU" in llm["error"]
+
+
 def test_chat(client):
     response = client.post("/chat", json={"message": "Hello"})
     assert response.status_code == 200
@@ -244,3 +304,192 @@ def test_health_response_content_type(client):
     response = client.get("/health")
     assert response.status_code == 200
     assert response.headers["content-type"].startswith("application/json")
+
+
+def _parse_sse(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+class FakeStreamingChatter(FakeChatter):
+    def chat_stream(self, message: str, world_facts: str | None = None):
+        self.calls.append(message)
+        yield "echo: "
+        yield message
+
+
+def test_chat_stream_falls_back_to_single_chunk(client, fake_chatter):
+    response = client.post("/chat/stream", json={"message": "Hello"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert _parse_sse(response.text) == [
+        ("token", {"delta": "echo: Hello"}),
+        ("done", {"reply": "echo: Hello"}),
+    ]
+    assert fake_chatter.calls == ["Hello"]
+
+
+def test_chat_stream_emits_token_events(client):
+    streaming_chatter = FakeStreamingChatter()
+    app.dependency_overrides[dependencies.get_chatter] = lambda: streaming_chatter
+
+    response = client.post("/chat/stream", json={"message": "Hi"})
+    assert response.status_code == 200
+    assert _parse_sse(response.text) == [
+        ("token", {"delta": "echo: "}),
+        ("token", {"delta": "Hi"}),
+        ("done", {"reply": "echo: Hi"}),
+    ]
+    assert streaming_chatter.calls == ["Hi"]
+
+
+def test_chat_stream_reports_errors_as_event(client):
+    class FailingStreamChatter:
+        def chat_stream(self, message: str, world_facts: str | None = None):
+            raise RuntimeError("Model failed to generate response")
+            yield  # pragma: no cover
+
+    app.dependency_overrides[dependencies.get_chatter] = FailingStreamChatter
+
+    response = client.post("/chat/stream", json={"message": "Hi"})
+    assert response.status_code == 200
+    event, data = _parse_sse(response.text)[-1]
+    assert event == "error"
+    assert "Model failed" in data["message"]
+
+
+def test_chat_stream_reports_late_busy_as_429_event(client):
+    class BusyStreamChatter:
+        def chat_stream(self, message: str, world_facts: str | None = None):
+            # the slot was lost to a burst after admission
+            raise SchedulerBusy(retry_after=3)
+            yield  # pragma: no cover
+
+    app.dependency_overrides[dependencies.get_chatter] = BusyStreamChatter
+
+    response = client.post("/chat/stream", json={"message": "Hi"})
+    event, data = _parse_sse(response.text)[-1]
+    assert event == "error"
+    assert (data["status"], data["retry_after"]) == (429, 3)
+
+
+def test_chat_stream_requires_message(client):
+    response = client.post("/chat/stream", json={})
+    assert response.status_code == 422
+
+
+def test_chat_sessions_are_isolated(client):
+    chatters = {}
+
+    def chatter_for_session(session=Depends(dependencies.get_session)):
+        return chatters.setdefault(session.session_id, FakeChatter())
+
+    app.dependency_overrides[dependencies.get_chatter] = chatter_for_session
+
+    client.post("/chat", json={"message": "one", "session_id": "alice"})
+    client.post("/chat", json={"message": "two", "session_id": "bob"})
+    client.post("/chat", json={"message": "three"}, headers={"X-Session-Id": "bob"})
+    client.post("/chat", json={"message": "four"})
+
+    assert chatters["alice"].calls == ["one"]
+    assert chatters["bob"].calls == ["two", "three"]
+    assert chatters["default"].calls == ["four"]
+    store = dependencies.get_session_store()
+    assert store.peek("alice").world_memory is not store.peek("bob").world_memory
+    # requests pin their session only until the response is sent
+    assert not store.peek("alice").in_use()
+
+
+def test_body_session_id_wins_over_header(client):
+    chatters = {}
+
+    def chatter_for_session(session=Depends(dependencies.get_session)):
+        return chatters.setdefault(session.session_id, FakeChatter())
+
+    app.dependency_overrides[dependencies.get_chatter] = chatter_for_session
+
+    response = client.post(
+        "/chat",
+        json={"message": "hi", "session_id": "alice"},
+        headers={"X-Session-Id": "bob"},
+    )
+    assert response.status_code == 200
+    assert list(chatters) == ["alice"]
+
+    bad = client.post("/chat", json={"message": "hi", "session_id": 7})
+    assert bad.status_code == 422
+
+
+def test_clear_resets_only_named_session(client):
+    store = dependencies.get_session_store()
+    alice = store.get("alice")
+    bob = store.get("bob")
+    alice._chatter = FakeChatter()
+    bob._chatter = FakeChatter()
+
+    response = client.post("/chat/clear", json={"clear": True, "session_id": "alice"})
+    assert response.json() == {"success": True}
+    assert alice._chatter is None
+    assert bob._chatter is not None
+
+
+def test_chat_returns_429_when_inference_queue_full(client_no_raise):
+    from backend.app.utility.scheduler import SchedulerBusy
+
+    class FullScheduler:
+        def check_admission(self):
+            raise SchedulerBusy(retry_after=7)
+
+    app.dependency_overrides[dependencies.get_inference_scheduler] = FullScheduler
+
+    for path in ("/chat", "/chat/stream"):
+        response = client_no_raise.post(path, json={"message": "Hello"})
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "7"
+        assert response.json()["detail"]["error"] == "Server busy"
+
+
+def test_metrics_exposes_turn_stages_and_sizes(client):
+    assert client.post("/chat", json={"message": "Hello"}).status_code == 200
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert 'pdm_turn_seconds_count{mode="chat"}' in text
+    assert 'pdm_turn_stage_seconds_bucket{stage="narrate",le="+Inf"}' in text
+    assert "pdm_sessions_resident 1" in text
+    assert "pdm_memory_queue_depth" in text
+
+
+def test_debug_trace_header_returns_turn_trace(client):
+    response = client.post(
+        "/chat", json={"message": "Hello"}, headers={"X-Debug-Trace": "1"}
+    )
+    assert response.status_code == 200
+    trace = json.loads(response.headers["X-Debug-Trace"])
+    assert trace["name"] == "chat"
+    assert [s["name"] for s in trace["spans"]] == ["narrate"]
+
+    plain = client.post("/chat", json={"message": "Hello"})
+    assert "X-Debug-Trace" not in plain.headers
+
+
+def test_debug_trace_in_stream_done_event(client):
+    class ContextStreamingChatter(FakeStreamingChatter):
+        def chat(self, message: str, world_facts: str | None = None) -> str:
+            return super().chat(message)
+
+    streaming_chatter = ContextStreamingChatter()
+    app.dependency_overrides[dependencies.get_chatter] = lambda: streaming_chatter
+
+    response = client.post(
+        "/chat/stream", json={"message": "Hi"}, headers={"X-Debug-Trace": "1"}
+    )
+    event, data = _parse_sse(response.text)[-1]
+    assert event == "done"
+    names = [s["name"] for s in data["trace"]["spans"]]
+    assert names[0] == "memory_wait"
+    assert "retrieve" in names and "narrate" in names
@@ -0,0 +1,36 @@
+# test_benchmarks.py
+import json
+
+from backend.benchmarks import hot_paths
+from backend.benchmarks.fakes import HashEmbedder
+
+
+def test_hash_embedder_is_deterministic_and_normalized():
+    a = HashEmbedder(dim=64)
+    b = HashEmbedder(dim=64)
+    v = a.embed_many(["the dragon sleeps", "the dragon sleeps", "cook dinner"])
+    assert v.shape == (3, 64)
+    assert v[0].tolist() == b.embed("the dragon sleeps")
+    assert abs(float(v[0] @ v[0]) - 1.0) < 1e-5
+    assert float(v[0] @ v[1]) > float(v[0] @ v[2])
+
+
+def test_benchmark_report_and_compare(tmp_path):
+    out = tmp_path / "bench.json"
+    assert hot_paths.main(["--scales", "50", "--min-time", "0", "--out", str(out)]) == 0
+    report = json.loads(out.read_text())
+    names = {r["name"] for r in report["results"]}
+    assert {
+        "world.retrieve",
+        "context.weighted_retrieve",
+        "history.build_context",
+        "llama.clean_json_text",
+    } <= names
+    assert all(r["scale"] == 50 for r in report["results"])
+
+    slower = json.loads(out.read_text())
+    for r in slower["results"]:
+        if "median_us" in r:
+            r["median_us"] *= 2
+    assert hot_paths.compare(slower, report, threshold=1.25)
+    assert hot_paths.compare(report, report, threshold=1.25) == []
@@ -0,0 +1,72 @@
+# test_embedding_cache.py
+import numpy as np
+
+from backend.app.utility.embedding_cache import EmbeddingCache
+
+
+def _vec(*values):
+    return np.array(values, dtype=np.float32)
+
+
+def test_miss_then_hit():
+    cache = EmbeddingCache("model-a", max_entries=4)
+    assert cache.get("hello") is None
+    cache.put("hello", _vec(1.0, 0.0))
+    assert np.array_equal(cache.get("hello"), _vec(1.0, 0.0))
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_lru_eviction():
+    cache = EmbeddingCache("model-a", max_entries=2)
+    cache.put("a", _vec(1.0))
+    cache.put("b", _vec(2.0))
+    cache.get("a")  # a is now most recent
+    cache.put("c", _vec(3.0))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats()["entries"] == 2
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    cache = EmbeddingCache("model-a", max_entries=1, disk_dir=str(tmp_path))
+    cache.put("a", _vec(1.0, 2.0))
+    cache.put("b", _vec(3.0, 4.0))  # evicts "a" from memory only
+    assert np.array_equal(cache.get("a"), _vec(1.0, 2.0))
+    assert cache.stats()["disk_hits"] == 1
+
+    reopened = EmbeddingCache("model-a", max_entries=1, disk_dir=str(tmp_path))
+    assert np.array_equal(reopened.get("b"), _vec(3.0, 4.0))
+    assert reopened.stats()["disk_entries"] == 2
+
+
+def test_disk_tier_invalidated_on_model_change(tmp_path):
+    cache = EmbeddingCache("model-a", disk_dir=str(tmp_path))
+    cache.put("a", _vec(1.0, 2.0))
+
+    other = EmbeddingCache("model-b", disk_dir=str(tmp_path))
+    assert other.get("a") is None
+    assert other.stats()["disk_entries"] == 0
+
+
+def test_torn_write_is_truncated_on_load(tmp_path):
+    cache = EmbeddingCache("model-a", disk_dir=str(tmp_path))
+    cache.put("a", _vec(1.0, 2.0))
+    cache.put("b", _vec(3.0, 4.0))
+    # crash mid-put: an orphan half row, and a key line cut short
+    with open(tmp_path / "vectors.f32", "ab") as f:
+        f.write(_vec(9.0, 9.0).tobytes()[:4])
+    with open(tmp_path / "keys.txt", "a", encoding="utf-8") as f:
+        f.write("deadbeef")
+
+    reopened = EmbeddingCache("model-a", disk_dir=str(tmp_path))
+    assert reopened.stats()["disk_entries"] == 2
+    reopened.put("c", _vec(5.0, 6.0))
+
+    again = EmbeddingCache("model-a", disk_dir=str(tmp_path))
+    for text, vec in (("a", _vec(1.0, 2.0)), ("b", _vec(3.0, 4.0))):
+        assert np.array_equal(again.get(text), vec)
+    assert np.array_equal(again.get("c"), _vec(5.0, 6.0))
@@ -103,3 +103,45 @@ def test_recency_bias():
     assert history.history[2].active
     assert history.history[3].active
     assert not history.history[4].active
+
+
+def test_window_evicts_oldest_first():
+    history = _make_history()
+    msgs = [history.add_message("user", f"message {i}", 20) for i in range(6)]
+    # 10 system tokens + four 20-token messages fill the 100-token budget
+    assert [m.content for m in history._select_messages()[1:]] == [
+        "message 2",
+        "message 3",
+        "message 4",
+        "message 5",
+    ]
+    assert [m.active for m in msgs] == [False, False, True, True, True, True]
+
+
+def test_window_cost_is_independent_of_lifetime():
+    history = _make_history()
+    for i in range(10_000):
+        history.add_message("user", f"message {i}", 20)
+    assert len(history.history) == 10_001
+    assert len(history._window) == 4
+    assert history._window_tokens == 90
+    assert history.build_context()[-1]["content"] == "message 9999"
+
+
+def test_remove_last_restores_the_window():
+    history = _make_history(max_history_tokens=40)
+    history.add_message("user", "first", 10)
+    history.add_message("assistant", "second", 10)
+    before = history.build_context()
+    msg = history.add_message("user", "pushes out the first", 20)
+    assert len(history.build_context()) == 3
+
+    history.remove_last(msg)
+    assert history.build_context() == before
+    assert history._window_tokens == 30
+    history.add_message("user", "third", 10)
+    assert [m["content"] for m in history.build_context()][1:] == [
+        "first",
+        "second",
+        "third",
+    ]
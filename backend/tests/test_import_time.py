@@ -0,0 +1,38 @@
+# test_import_time.py
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Modules that take seconds to import and must only load on first model use
+HEAVY_MODULES = ("torch", "sentence_transformers", "llama_cpp")
+# Generous wall-clock budget for importing the app in a fresh interpreter
+IMPORT_BUDGET_SEC = float(os.getenv("IMPORT_BUDGET_SEC", "2.0"))
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+def _measure_import(module: str) -> dict:
+    code = (
+        "import json, sys, time\n"
+        "t = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = time.perf_counter() - t\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(json.dumps({'elapsed': elapsed, 'heavy': heavy}))\n"
+    )
+    out = subprocess.check_output(
+        [sys.executable, "-c", code], cwd=REPO_ROOT, text=True, env=os.environ.copy()
+    )
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def test_app_import_does_not_load_heavy_modules():
+    result = _measure_import("backend.app.main")
+    assert result["heavy"] == []
+    assert result["elapsed"] < IMPORT_BUDGET_SEC, result
+
+
+def test_world_modules_import_without_models():
+    for module in ("backend.app.world.memory", "backend.app.utility.llama"):
+        assert _measure_import(module)["heavy"] == []
@@ -0,0 +1,110 @@
+# test_inference_profile.py
+import json
+from dataclasses import replace
+
+import pytest
+
+from backend.app.utility import llama
+from backend.app.utility.inference_profile import (
+    default_profile,
+    load_profile,
+    save_profile,
+)
+from backend.app.utility.llama import Chatter
+from backend.benchmarks import calibrate
+
+
+def test_gpu_profile_keeps_full_offload_and_vram_check():
+    profile = default_profile("gpu")
+    kwargs = profile.llama_kwargs()
+    assert kwargs["n_gpu_layers"] == -1
+    assert kwargs["n_batch"] == 512
+    assert "type_k" not in kwargs
+    assert profile.uses_gpu and profile.min_free_vram_mib == 23400
+
+
+def test_cpu_profile_offloads_nothing():
+    profile = default_profile("cpu")
+    assert not profile.uses_gpu
+    assert profile.llama_kwargs()["n_threads"] >= 1
+
+
+def test_config_file_overrides_defaults(tmp_path):
+    path = tmp_path / "inference.json"
+    profile = load_profile("cpu", str(path))
+    tuned = replace(
+        profile, n_threads=6, n_threads_batch=12, n_batch=256, kv_cache_type="q8_0"
+    )
+    save_profile(tuned, str(path), calibration={"results": []})
+    save_profile(default_profile("gpu"), str(path))
+
+    loaded = load_profile("cpu", str(path))
+    assert (loaded.n_threads, loaded.n_threads_batch, loaded.n_batch) == (6, 12, 256)
+    kwargs = loaded.llama_kwargs()
+    assert kwargs["type_k"] == kwargs["type_v"] == 8
+    assert kwargs["n_ubatch"] == 256
+    # the other profile's section survives
+    assert set(json.loads(path.read_text())) == {"cpu", "gpu"}
+
+
+def test_unknown_settings_are_rejected(tmp_path):
+    path = tmp_path / "inference.json"
+    path.write_text(json.dumps({"cpu": {"n_thread": 4}}))
+    with pytest.raises(ValueError):
+        load_profile("cpu", str(path))
+    with pytest.raises(ValueError):
+        load_profile("tpu", str(path))
+
+
+def test_cpu_profile_skips_gpu_check(monkeypatch):
+    monkeypatch.setattr(Chatter, "_initialized", False)
+    monkeypatch.setattr(Chatter, "_init_error", None)
+    monkeypatch.setattr(Chatter, "profile", None)
+    monkeypatch.setattr(llama, "load_profile", lambda: default_profile("cpu"))
+
+    def no_gpu():
+        raise AssertionError("nvidia-smi queried for the CPU profile")
+
+    monkeypatch.setattr(llama, "get_free_vram_mib", no_gpu)
+    monkeypatch.setattr(llama, "make_draft_model", lambda n_ctx: None)
+    Chatter._initialize_model("missing.gguf")
+    assert Chatter.profile.name == "cpu"
+    # without llama_cpp (or the file) the load itself fails, not the GPU check
+    assert "GPU" not in str(Chatter._init_error)
+
+
+def test_calibrate_picks_decode_and_prefill_settings_separately():
+    def measure(profile):
+        # decode peaks at 8 threads; prefill keeps scaling with threads and batch
+        decode = 10.0 - abs(profile.n_threads - 8)
+        prefill = profile.n_threads_batch * profile.n_batch / 100.0
+        return prefill, decode
+
+    best, results = calibrate.calibrate(
+        measure, default_profile("cpu"), [4, 8, 16], [256, 512]
+    )
+    assert len(results) == 6
+    assert best.n_threads == 8
+    assert (best.n_threads_batch, best.n_batch) == (16, 512)
+    assert best.n_gpu_layers == 0
+
+
+def test_calibrate_command_writes_config(tmp_path, capsys):
+    out = tmp_path / "inference.json"
+
+    def measure(profile):
+        return float(profile.n_batch), float(profile.n_threads)
+
+    argv = ["--threads", "2,4", "--batches", "128,256", "--out", str(out)]
+    assert calibrate.main(argv + ["--kv-cache-type", "q8_0"], measure=measure) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report["settings"]["n_threads"] == 4
+    assert report["settings"]["n_batch"] == 256
+
+    loaded = load_profile("cpu", str(out))
+    assert (loaded.n_threads, loaded.n_batch, loaded.kv_cache_type) == (
+        4,
+        256,
+        "q8_0",
+    )
+    assert len(json.loads(out.read_text())["cpu"]["calibration"]["results"]) == 4
@@ -0,0 +1,163 @@
+# test_json_completion.py
+import json
+
+import pytest
+
+from backend.app.utility import llama
+from backend.app.utility.json_schemas import (
+    MEMORY_ANALYSIS_SCHEMA,
+    MEMORY_BATCH_SCHEMA,
+)
+from backend.app.utility.llama import Chatter, JsonObjectScanner, parse_json_reply
+
+
+class RecordingScheduler:
+    """Streams each reply a few characters per chunk, like token deltas."""
+
+    def __init__(self, replies, chunk_size=3):
+        self.replies = list(replies)
+        self.chunk_size = chunk_size
+        self.calls = []
+        self.streamed = 0
+
+    def stream(self, priority, **kwargs):
+        self.calls.append(kwargs)
+        reply = self.replies.pop(0)
+        yield {"choices": [{"delta": {"role": "assistant"}}]}
+        for i in range(0, len(reply), self.chunk_size):
+            self.streamed += 1
+            yield {"choices": [{"delta": {"content": reply[i : i + self.chunk_size]}}]}
+
+
+@pytest.fixture
+def chatter():
+    return Chatter.__new__(Chatter)
+
+
+def test_memory_analysis_is_schema_constrained(chatter):
+    reply = {
+        "summary": "Mira is hostile to the player",
+        "entities": ["Mira"],
+        "type": "npc",
+        "confidence": 0.9,
+        "npc": {"name": "Mira", "relationship_to_player": "hostile"},
+    }
+    chatter.scheduler = RecordingScheduler([json.dumps(reply)])
+
+    result = chatter.analyze_conversation_for_memories(
+        {"user_message": "Hi Mira", "dm_response": "Mira draws a knife."}
+    )
+
+    assert result == reply
+    (call,) = chatter.scheduler.calls
+    assert call["response_format"] == {
+        "type": "json_object",
+        "schema": MEMORY_ANALYSIS_SCHEMA,
+    }
+    assert call["max_tokens"] == llama.JSON_PARAMS["max_tokens"]
+
+
+def test_unparseable_reply_is_not_retried(chatter):
+    # only a completion cut off at max_tokens can fail under a grammar
+    chatter.scheduler = RecordingScheduler(['{"summary": "cut off', "{}"])
+    assert chatter._complete_json("sys", "user", "memory_analysis") is None
+    assert len(chatter.scheduler.calls) == 1
+
+
+def test_unconstrained_mode_sends_no_schema(chatter, monkeypatch):
+    monkeypatch.setattr(llama, "JSON_CONSTRAINED", False)
+    chatter.scheduler = RecordingScheduler(['```json\n{"a": 1}\n```'])
+    result = chatter._complete_json(
+        "sys", "user", "memory_analysis", schema=MEMORY_ANALYSIS_SCHEMA
+    )
+    assert result == {"a": 1}
+    assert "response_format" not in chatter.scheduler.calls[0]
+
+
+def test_parse_json_reply():
+    assert parse_json_reply('{"a": 1}') == {"a": 1}
+    assert parse_json_reply('  {"a": 1}\n') == {"a": 1}
+    assert parse_json_reply('{"a": 1}\n{"b": 2}') == {"a": 1}
+    assert parse_json_reply("[1, 2]") is None
+    assert parse_json_reply("no json here") is None
+
+
+def test_generation_stops_when_the_first_object_closes(chatter):
+    first = '{"summary": "a {braced} \\"quote\\" }", "entities": []}'
+    chatter.scheduler = RecordingScheduler([first + "\n" + '{"summary": "x"}' * 50])
+
+    result = chatter._complete_json("sys", "user", "memory_analysis")
+
+    assert result == json.loads(first)
+    # only the chunks up to the closing brace were decoded
+    assert chatter.scheduler.streamed == -(-len(first) // 3)
+
+
+def _scan(pieces):
+    scanner = JsonObjectScanner()
+    for piece in pieces:
+        end = scanner.feed(piece)
+        if end is not None:
+            return end
+    return None
+
+
+def test_scanner_ignores_braces_in_strings_and_escapes():
+    text = '```json\n{"a": "}{", "b": "\\"}", "c": {"d": [1, {"e": 2}]}} trailing {'
+    end = text.index("}} trailing") + 2
+    assert _scan([text]) == end
+    # same answer however the text is split, including on a backslash
+    assert _scan(list(text)) == end
+    assert _scan([text[:13], text[13:14], text[14:]]) == end
+    assert _scan(['{"a": "unterminated']) is None
+    assert _scan(["no object"]) is None
+
+
+def test_turn_batch_analysis_returns_every_fact(chatter):
+    facts = [
+        {
+            "summary": "Mira guards the harbor",
+            "entities": ["Mira"],
+            "type": "npc",
+            "confidence": 0.9,
+        },
+        {"summary": "NO_CHANGES", "entities": [], "type": "none", "confidence": 0.0},
+        {"summary": "missing keys"},
+        {
+            "summary": "A storm is coming",
+            "entities": [],
+            "type": "threat",
+            "confidence": 0.7,
+        },
+    ]
+    chatter.scheduler = RecordingScheduler([json.dumps({"facts": facts})])
+
+    result = chatter.analyze_turns_for_memories(
+        [
+            {"user_message": "Hi Mira", "dm_response": "Mira nods."},
+            {"user_message": "Weather?", "dm_response": "Clouds gather."},
+        ]
+    )
+
+    assert [f["summary"] for f in result] == [
+        "Mira guards the harbor",
+        "A storm is coming",
+    ]
+    (call,) = chatter.scheduler.calls
+    assert call["response_format"]["schema"] == MEMORY_BATCH_SCHEMA
+    prompt = call["messages"][1]["content"]
+    assert "Turn 1:" in prompt and "Turn 2:" in prompt
+    assert call["max_tokens"] == llama.JSON_PARAMS["max_tokens"]
+
+
+def test_turn_batch_reply_budget_grows_with_the_batch(chatter):
+    chatter.scheduler = RecordingScheduler([json.dumps({"facts": []})])
+    turns = [{"user_message": "x", "dm_response": "y"}] * 12
+    chatter.analyze_turns_for_memories(turns)
+    (call,) = chatter.scheduler.calls
+    assert call["max_tokens"] == 12 * llama.MEMORY_TOKENS_PER_TURN
+
+
+def test_turn_batch_analysis_without_reply_is_empty(chatter):
+    chatter.scheduler = RecordingScheduler(['{"facts": [{"summary'])
+    assert chatter.analyze_turns_for_memories([{"user_message": "x"}]) == []
@@ -0,0 +1,62 @@
+# test_load_test.py
+import asyncio
+
+import httpx
+
+from backend.app import dependencies
+from backend.benchmarks import load_test
+
+
+def test_percentile_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert load_test.percentile(values, 50) == 50.0
+    assert load_test.percentile(values, 99) == 99.0
+    assert load_test.percentile([], 95) == 0.0
+
+
+def test_parse_mix():
+    assert load_test.parse_mix("chat=0.7,stream=0.3") == [
+        ("chat", 0.7),
+        ("stream", 0.3),
+    ]
+
+
+def test_load_run_against_stand_ins():
+    args = load_test.build_parser().parse_args(
+        [
+            "--concurrency",
+            "3",
+            "--requests",
+            "12",
+            "--duration",
+            "0",
+            "--think-time",
+            "0",
+            "--time-scale",
+            "0.001",
+            "--world-size",
+            "50",
+            "--memory-rate",
+            "1.0",
+        ]
+    )
+    # the memory queue is a process-wide singleton shared with other tests
+    completed = dependencies.get_memory_queue().stats()["completed"]
+    app, cleanup, server_stats = load_test.build_fake_app(args)
+    try:
+        transport = httpx.ASGITransport(app=app)
+        report = asyncio.run(load_test.run_load("http://loadtest", args, transport))
+    finally:
+        cleanup()  # drains the memory-extraction queue
+    stats = server_stats()
+
+    endpoints = report["endpoints"]
+    total = sum(e["requests"] for e in endpoints.values())
+    assert total == 12
+    for e in endpoints.values():
+        assert e["errors"] == 0
+        assert e["latency_ms"]["p50"] <= e["latency_ms"]["p99"]
+    assert stats["sessions"]["resident"] == 3
+    # every turn ran narration plus background memory analysis on the model
+    assert stats["simulated_llm"]["calls"] == 24
+    assert stats["memory_queue"]["completed"] == completed + 12
@@ -0,0 +1,149 @@
+# test_memory.py
+import hashlib
+import math
+
+import numpy as np
+
+from backend.app.world.memory import WorldMemory, INITIAL_CAPACITY
+
+
+def _fake_embed(text: str, dim: int = 32) -> list[float]:
+    """Deterministic bag-of-words embedding, L2-normalized."""
+    vec = [0.0] * dim
+    for word in text.lower().split():
+        h = int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16)
+        vec[h % dim] += 1.0
+    mag = math.sqrt(sum(x * x for x in vec))
+    return [x / mag for x in vec] if mag else vec
+
+
+def _reference_scores(wm: WorldMemory, query: str, k: int) -> list[float]:
+    qvec = _fake_embed(query)
+    scores = [sum(a * b for a, b in zip(qvec, m["vector"])) for m in wm.memories]
+    return sorted(scores, reverse=True)[:k]
+
+
+def test_retrieve_empty():
+    wm = WorldMemory(_fake_embed)
+    assert wm.retrieve("anything") == []
+
+
+def test_retrieve_matches_reference_ranking():
+    wm = WorldMemory(_fake_embed)
+    for i in range(INITIAL_CAPACITY * 3):
+        wm.add_memory(f"the guard {i} patrols gate {i % 7}", [], "other")
+    wm.add_memory("the dragon sleeps in the cave", ["dragon"], "threat")
+
+    for query, k in [("dragon cave", 1), ("guard gate 3", 5), ("patrols", 500)]:
+        got = [score for (score, _) in wm.retrieve_scored(query, k=k)]
+        assert np.allclose(got, _reference_scores(wm, query, k), atol=1e-6)
+
+    assert wm.retrieve("dragon cave", k=1)[0]["summary"].startswith("the dragon")
+
+
+def test_vectors_are_float32_rows_of_matrix():
+    wm = WorldMemory(_fake_embed)
+    for i in range(INITIAL_CAPACITY + 1):
+        wm.add_memory(f"fact {i}", [], "other")
+    first = wm.memories[0]["vector"]
+    assert first.dtype == np.float32
+    assert np.shares_memory(first, wm._vectors)
+    assert np.allclose(first, _fake_embed("fact 0"))
+
+
+def test_dedupe_returns_existing_id():
+    wm = WorldMemory(_fake_embed)
+    first = wm.add_memory("the tavern burns down", [], "world_state")
+    again = wm.add_memory("the tavern burns down", [], "world_state", dedupe_check=True)
+    assert again == first
+    assert len(wm.memories) == 1
+
+
+def test_clear():
+    wm = WorldMemory(_fake_embed)
+    wm.add_memory("a fact", [], "other", npc=None)
+    wm.clear()
+    assert wm.memories == []
+    assert wm.retrieve("a fact") == []
+
+
+def _npc(name, location, intent="wander"):
+    return {
+        "name": name,
+        "aliases": [],
+        "last_seen_location": location,
+        "intent": intent,
+        "relationship_to_player": "neutral",
+        "confidence": 0.9,
+    }
+
+
+def test_npc_lookup_embeds_only_the_query():
+    calls = []
+
+    def counting_embed(text):
+        calls.append(text)
+        return _fake_embed(text)
+
+    wm = WorldMemory(counting_embed)
+    for i in range(INITIAL_CAPACITY + 5):
+        wm.add_memory(f"npc {i} appears", [], "npc", npc=_npc(f"Npc{i}", "market"))
+    wm.add_memory(
+        "Finnigan lurks", [], "npc", npc=_npc("Finnigan", "sewers", "hunt player")
+    )
+
+    calls.clear()
+    snaps = wm.get_relevant_npc_snapshots("Finnigan sewers hunt", k=2)
+    assert calls == ["Finnigan sewers hunt"]
+    assert snaps[0]["name"] == "Finnigan"
+    assert len(snaps) == 2
+
+
+def test_npc_vector_refreshed_on_upsert():
+    wm = WorldMemory(_fake_embed)
+    wm.add_memory("Mira at docks", [], "npc", npc=_npc("Mira", "docks"))
+    wm.add_memory("Olaf at docks", [], "npc", npc=_npc("Olaf", "docks"))
+    wm.add_memory("Mira moved", [], "npc", npc=_npc("Mira", "lighthouse tower"))
+
+    assert len(wm.npc_index) == 2
+    snaps = wm.get_relevant_npc_snapshots("lighthouse tower", k=1)
+    assert snaps[0]["name"] == "Mira"
+
+
+def test_add_memories_uses_one_batch():
+    batches = []
+
+    def embed_many(texts):
+        batches.append(list(texts))
+        return np.array([_fake_embed(t) for t in texts], dtype=np.float32)
+
+    wm = WorldMemory(_fake_embed, embed_many_fn=embed_many)
+    ids = wm.add_memories(
+        [
+            {
+                "summary": "the bridge collapsed",
+                "entities": ["bridge"],
+                "type": "other",
+            },
+            {
+                "summary": "Mira guards the docks",
+                "type": "npc",
+                "npc": _npc("Mira", "docks"),
+            },
+        ]
+    )
+    assert len(ids) == 2
+    assert batches[0] == ["the bridge collapsed", "Mira guards the docks"]
+    assert len(batches) == 2  # summaries, then touched NPC snapshots
+    assert wm.retrieve("bridge collapsed", k=1)[0]["id"] == ids[0]
+    assert wm.get_relevant_npc_snapshots("Mira docks", k=1)[0]["name"] == "Mira"
+
+
+def test_reembed_all_preserves_ids():
+    wm = WorldMemory(_fake_embed)
+    ids = [wm.add_memory(f"fact {i}", [], "other") for i in range(3)]
+    wm.add_memory("Mira at docks", [], "npc", npc=_npc("Mira", "docks"))
+    wm.reembed_all()
+    assert [m["id"] for m in wm.memories][:3] == ids
+    assert np.allclose(wm.memories[1]["vector"], _fake_embed("fact 1"))
+    assert wm.get_relevant_npc_snapshots("Mira", k=1)[0]["name"] == "Mira"
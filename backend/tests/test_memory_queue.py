@@ -0,0 +1,109 @@
+# test_memory_queue.py
+import threading
+
+from backend.app.world.memory_queue import MemoryExtractionQueue
+
+
+def test_wait_for_blocks_until_job_done():
+    q = MemoryExtractionQueue(maxsize=4)
+    release = threading.Event()
+    stored = []
+
+    def job():
+        release.wait(5)
+        stored.append("fact")
+
+    q.submit("world", job)
+    assert q.depth() == 1
+    assert q.wait_for("world", timeout=0.05) is False
+    assert q.wait_for("other", timeout=0.05) is True
+
+    release.set()
+    assert q.wait_for("world", timeout=5) is True
+    assert stored == ["fact"]
+    assert q.depth() == 0
+    q.shutdown()
+
+
+def test_full_queue_runs_job_inline():
+    q = MemoryExtractionQueue(maxsize=1)
+    release = threading.Event()
+    started = threading.Event()
+    order = []
+
+    def blocker():
+        started.set()
+        release.wait(5)
+        order.append("blocker")
+
+    q.submit("world", blocker)
+    started.wait(5)
+    q.submit("world", lambda: order.append("queued"))
+    q.submit("world", lambda: order.append("inline"))  # queue full
+    assert order == ["inline"]
+    assert q.stats()["ran_inline"] == 1
+
+    release.set()
+    assert q.shutdown(timeout=5)
+    assert sorted(order) == ["blocker", "inline", "queued"]
+
+
+def test_shutdown_drains_and_failures_are_counted():
+    q = MemoryExtractionQueue()
+    done = []
+
+    def failing():
+        raise RuntimeError("analysis failed")
+
+    q.submit("world", failing)
+    for i in range(5):
+        q.submit("world", lambda i=i: done.append(i))
+    assert q.shutdown(timeout=5)
+    assert done == [0, 1, 2, 3, 4]
+    stats = q.stats()
+    assert stats["completed"] == 5
+    assert stats["failed"] == 1
+    assert stats["depth"] == 0
+
+    # the queue restarts lazily after a drain
+    q.submit("world", lambda: done.append(5))
+    assert q.wait_for("world", timeout=5)
+    assert done[-1] == 5
+    q.shutdown()
+
+
+def test_next_turn_sees_previous_turn_memory():
+    from backend.app.world.conversation_service import ConversationService
+    from backend.app.world.memory import WorldMemory
+    from backend.tests.test_memory import _fake_embed
+
+    release = threading.Event()
+
+    class AnalyzingChatter:
+        def __init__(self):
+            self.facts = []
+
+        def chat(self, message: str, world_facts: str | None = None) -> str:
+            self.facts.append(world_facts)
+            return "The dragon wakes."
+
+        def analyze_conversation_for_memories(self, context: dict) -> dict:
+            release.wait(5)
+            return {
+                "summary": "the dragon is awake",
+                "entities": ["dragon"],
+                "type": "threat",
+                "confidence": 0.9,
+            }
+
+    q = MemoryExtractionQueue()
+    chatter = AnalyzingChatter()
+    service = ConversationService(chatter, WorldMemory(_fake_embed), q)
+
+    service.handle_user_message("I poke the dragon")
+    assert q.depth() == 1  # extraction is off the request path
+
+    threading.Timer(0.05, release.set).start()
+    service.handle_user_message("is the dragon awake")
+    assert "the dragon is awake" in (chatter.facts[-1] or "")
+    q.shutdown()
@@ -70,3 +70,16 @@ def test_message_str_format():
         msg_id=99,
     )
     assert str(message) == "assistant: The dragon roars."
+
+
+def test_message_is_compact():
+    message = _make_message()
+    assert not hasattr(message, "__dict__")
+    assert isinstance(message.epoch, float)
+
+
+def test_message_accepts_epoch_timestamp():
+    ts = datetime(2025, 1, 1, 12, 0, 0)
+    message = _make_message(timestamp=ts.timestamp())
+    assert message.timestamp == ts
+    assert message.epoch == ts.timestamp()
@@ -0,0 +1,71 @@
+# test_metrics.py
+from backend.app.utility import metrics
+from backend.app.utility.metrics import Registry
+from backend.app.utility.scheduler import BACKGROUND, NARRATION, InferenceScheduler
+
+
+def test_render_counters_and_histograms():
+    registry = Registry()
+    requests = registry.counter("demo_requests_total", "Requests.")
+    requests.inc(kind="a")
+    requests.inc(2, kind='say "hi"')
+    latency = registry.histogram("demo_seconds", "Latency.", buckets=(0.1, 1.0))
+    latency.observe(0.05, stage="x")
+    latency.observe(0.5, stage="x")
+    latency.observe(5.0, stage="x")
+
+    text = registry.render()
+    assert "# TYPE demo_requests_total counter" in text
+    assert 'demo_requests_total{kind="a"} 1' in text
+    assert 'demo_requests_total{kind="say \\"hi\\""} 2' in text
+    assert "# TYPE demo_seconds histogram" in text
+    # buckets are cumulative and end with +Inf == count
+    assert 'demo_seconds_bucket{stage="x",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{stage="x",le="1"} 2' in text
+    assert 'demo_seconds_bucket{stage="x",le="+Inf"} 3' in text
+    assert 'demo_seconds_sum{stage="x"} 5.55' in text
+    assert 'demo_seconds_count{stage="x"} 3' in text
+    assert text.endswith("\n")
+
+
+def test_collectors_are_read_at_scrape_time_and_failures_skipped():
+    registry = Registry()
+    size = [3]
+    registry.add_collector(lambda: [("demo_size", "Size.", "gauge", [({}, size[0])])])
+
+    def broken():
+        raise RuntimeError("boom")
+
+    registry.add_collector(broken)
+    assert "demo_size 3" in registry.render()
+    size[0] = 7
+    assert "demo_size 7" in registry.render()
+
+
+class UsageLlm:
+    def create_chat_completion(self, stream=False, **kwargs):
+        if stream:
+            return iter(
+                [{"choices": [{"delta": {"role": "assistant"}}]}]
+                + [{"choices": [{"delta": {"content": w}}]} for w in "abcd"]
+            )
+        return {"usage": {"prompt_tokens": 30, "completion_tokens": 12}}
+
+
+def test_scheduler_records_tokens_and_first_token():
+    prompt = metrics.LLM_PROMPT_TOKENS.value(priority="background")
+    completion = metrics.LLM_COMPLETION_TOKENS.value(priority="background")
+    streamed = metrics.LLM_COMPLETION_TOKENS.value(priority="narration")
+    first_tokens = metrics.LLM_FIRST_TOKEN_SECONDS.count(priority="narration")
+
+    scheduler = InferenceScheduler(UsageLlm())
+    scheduler.complete(BACKGROUND, messages=[])
+    list(scheduler.stream(NARRATION, messages=[]))
+
+    assert metrics.LLM_PROMPT_TOKENS.value(priority="background") == prompt + 30
+    assert metrics.LLM_COMPLETION_TOKENS.value(priority="background") == completion + 12
+    # the role-only chunk is not a token
+    assert metrics.LLM_COMPLETION_TOKENS.value(priority="narration") == streamed + 4
+    assert (
+        metrics.LLM_FIRST_TOKEN_SECONDS.count(priority="narration") == first_tokens + 1
+    )
@@ -0,0 +1,154 @@
+# test_prompt_layout.py
+import sys
+import types
+
+import pytest
+
+from backend.app.utility import llama
+from backend.app.utility.history import History
+from backend.app.utility.inference_profile import default_profile
+from backend.app.utility.llama import Chatter
+from backend.app.utility.scheduler import SchedulerBusy
+
+FACTS = "World Facts (use to stay consistent; do not contradict):\n- Mira is hostile"
+
+
+@pytest.fixture
+def chatter():
+    c = Chatter.__new__(Chatter)
+    c.history = History(1000, "system prompt", "system", 4)
+    for role, text in (("user", "hi"), ("assistant", "hello"), ("user", "go on")):
+        c.history.add_message(role, text, 2)
+    return c
+
+
+def _roles(messages):
+    return [m["role"] for m in messages]
+
+
+def test_stable_prefix_folds_facts_into_latest_user_message(chatter, monkeypatch):
+    monkeypatch.setattr(llama, "PROMPT_LAYOUT", "stable_prefix")
+    messages = chatter._build_messages(FACTS)
+    assert _roles(messages) == ["system", "user", "assistant", "user"]
+    assert messages[-1]["content"] == f"{FACTS}\n\ngo on"
+    # history itself is untouched
+    assert chatter.history.build_context()[-1]["content"] == "go on"
+
+
+def test_facts_first_puts_facts_after_system_prompt(chatter, monkeypatch):
+    monkeypatch.setattr(llama, "PROMPT_LAYOUT", "facts_first")
+    messages = chatter._build_messages(FACTS)
+    assert _roles(messages) == ["system", "system", "user", "assistant", "user"]
+    assert messages[1]["content"] == FACTS
+
+
+def test_no_facts_leaves_history_as_is(chatter):
+    assert chatter._build_messages(None) == chatter.history.build_context()
+
+
+def test_stable_prefix_keeps_earlier_turns_identical(chatter, monkeypatch):
+    monkeypatch.setattr(llama, "PROMPT_LAYOUT", "stable_prefix")
+    first = chatter._build_messages(FACTS)
+    chatter.history.add_message("assistant", "the road forks", 3)
+    chatter.history.add_message("user", "left", 1)
+    second = chatter._build_messages("NPC Cards:\n- Garrick")
+
+    # everything before the previous turn's (fact-carrying) user message is
+    # rendered identically, so its KV state is reused
+    assert second[: len(first) - 1] == first[:-1]
+    assert second[len(first) - 1] == {"role": "user", "content": "go on"}
+    assert _roles(second) == ["system"] + ["user", "assistant"] * 2 + ["user"]
+
+
+class BusyOnceScheduler:
+    """Rejects the first request, as a full narration queue would."""
+
+    def __init__(self):
+        self.rejected = False
+
+    def _admit(self):
+        if not self.rejected:
+            self.rejected = True
+            raise SchedulerBusy(retry_after=2)
+
+    def complete(self, priority, **kwargs):
+        self._admit()
+        return {"choices": [{"message": {"content": "the gate opens"}}]}
+
+    def stream(self, priority, **kwargs):
+        self._admit()
+        yield {"choices": [{"delta": {"content": "the gate opens"}}]}
+
+
+@pytest.mark.parametrize("streamed", [False, True])
+def test_rejected_turn_leaves_history_unchanged(chatter, streamed):
+    chatter.scheduler = BusyOnceScheduler()
+    before = chatter.history.build_context()
+
+    def turn():
+        if streamed:
+            return "".join(chatter.chat_stream("open the gate"))
+        return chatter.chat("open the gate")
+
+    with pytest.raises(SchedulerBusy):
+        turn()
+    assert chatter.history.build_context() == before
+
+    # the client's retry adds exactly one user/assistant pair
+    assert turn() == "the gate opens"
+    after = chatter.history.build_context()
+    assert after[: len(before)] == before
+    assert after[len(before) :] == [
+        {"role": "user", "content": "open the gate"},
+        {"role": "assistant", "content": "the gate opens"},
+    ]
+
+
+class FakeLlama:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.cache = None
+
+    def set_cache(self, cache):
+        self.cache = cache
+
+
+class FakeRAMCache:
+    def __init__(self, capacity_bytes):
+        self.capacity_bytes = capacity_bytes
+
+
+@pytest.fixture
+def fake_llama_cpp(monkeypatch):
+    module = types.ModuleType("llama_cpp")
+    module.Llama = FakeLlama
+    module.LlamaRAMCache = FakeRAMCache
+    monkeypatch.setitem(sys.modules, "llama_cpp", module)
+    monkeypatch.setattr(llama, "_silence_llama_logs", lambda: None)
+    monkeypatch.setattr(llama, "make_draft_model", lambda n_ctx: None)
+    monkeypatch.setattr(llama, "load_profile", lambda: default_profile("gpu"))
+    monkeypatch.setattr(llama, "get_free_vram_mib", lambda: 48000)
+    for name, value in (
+        ("_initialized", False),
+        ("_init_error", None),
+        ("_llm", None),
+        ("_scheduler", None),
+        ("_speculation", None),
+        ("profile", None),
+    ):
+        monkeypatch.setattr(Chatter, name, value)
+
+
+def test_prompt_cache_is_attached(fake_llama_cpp, monkeypatch):
+    monkeypatch.setattr(llama, "PROMPT_CACHE_MB", 64)
+    Chatter._initialize_model("model.gguf")
+    assert Chatter._init_error is None
+    assert Chatter._llm.cache.capacity_bytes == 64 * 1024 * 1024
+    assert Chatter.get_scheduler() is not None
+
+
+def test_prompt_cache_can_be_disabled(fake_llama_cpp, monkeypatch):
+    monkeypatch.setattr(llama, "PROMPT_CACHE_MB", 0)
+    Chatter._initialize_model("model.gguf")
+    assert Chatter._init_error is None
+    assert Chatter._llm.cache is None
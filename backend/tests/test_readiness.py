@@ -0,0 +1,49 @@
+# test_readiness.py
+import asyncio
+import threading
+
+from backend.app.utility.readiness import FAILED, PENDING, READY, Readiness
+
+
+def test_component_load_and_warm_up_are_timed():
+    readiness = Readiness()
+    calls = []
+    assert readiness.run(
+        "llm", lambda: calls.append("load"), lambda: calls.append("warm")
+    )
+    assert calls == ["load", "warm"]
+
+    status = readiness.snapshot()
+    assert status["ready"] is True
+    llm = status["components"]["llm"]
+    assert llm["state"] == READY
+    assert llm["load_sec"] >= 0 and llm["warmup_sec"] >= 0
+    assert llm["error"] is None
+
+
+def test_failed_component_is_not_ready():
+    readiness = Readiness()
+    readiness.register("embeddings")
+    assert readiness.snapshot()["components"]["embeddings"]["state"] == PENDING
+
+    def boom():
+        raise RuntimeError("No GPU detected")
+
+    readiness.run("llm", boom)
+    assert not readiness.is_ready()
+    llm = readiness.snapshot()["components"]["llm"]
+    assert llm["state"] == FAILED
+    assert llm["error"] == "No GPU detected"
+
+
+def test_preload_runs_components_concurrently():
+    # each load waits for the other; a sequential preload would time out
+    barrier = threading.Barrier(2, timeout=5)
+    readiness = Readiness()
+    ok = asyncio.run(
+        readiness.preload(
+            {"llm": (barrier.wait, None), "embeddings": (barrier.wait, None)}
+        )
+    )
+    assert ok
+    assert readiness.is_ready()
@@ -0,0 +1,173 @@
+# test_scheduler.py
+import threading
+import time
+
+import pytest
+
+from backend.app.utility.scheduler import (
+    BACKGROUND,
+    NARRATION,
+    InferenceScheduler,
+    SchedulerBusy,
+)
+
+
+class FakeLlm:
+    def __init__(self):
+        self.calls = []
+
+    def create_chat_completion(self, **kwargs):
+        self.calls.append(kwargs.get("tag"))
+        if kwargs.get("stream"):
+            return iter(["a", "b"])
+        return {"tag": kwargs.get("tag")}
+
+
+def _hold(scheduler):
+    """Occupy the model from another thread until the returned event is set."""
+    release = threading.Event()
+    held = threading.Event()
+
+    def run():
+        with scheduler.slot(NARRATION):
+            held.set()
+            release.wait(5)
+
+    threading.Thread(target=run, daemon=True).start()
+    held.wait(5)
+    return release
+
+
+def _wait_for_waiters(scheduler, n):
+    deadline = time.monotonic() + 5
+    while scheduler.depth() < n and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+
+def test_complete_and_stream_use_the_llm():
+    llm = FakeLlm()
+    scheduler = InferenceScheduler(llm)
+    assert scheduler.complete(NARRATION, tag="x") == {"tag": "x"}
+    assert list(scheduler.stream(BACKGROUND, tag="y")) == ["a", "b"]
+    assert llm.calls == ["x", "y"]
+    assert scheduler.stats()["priorities"]["narration"]["count"] == 1
+
+
+def test_narration_runs_before_background():
+    llm = FakeLlm()
+    scheduler = InferenceScheduler(llm)
+    release = _hold(scheduler)
+
+    threads = [
+        threading.Thread(
+            target=scheduler.complete, args=(BACKGROUND,), kwargs={"tag": "bg"}
+        ),
+    ]
+    threads[0].start()
+    _wait_for_waiters(scheduler, 1)
+    threads.append(
+        threading.Thread(
+            target=scheduler.complete, args=(NARRATION,), kwargs={"tag": "dm"}
+        )
+    )
+    threads[1].start()
+    _wait_for_waiters(scheduler, 2)
+
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert llm.calls == ["dm", "bg"]
+
+
+def test_old_background_work_is_promoted():
+    llm = FakeLlm()
+    scheduler = InferenceScheduler(llm, background_max_wait=0.0)
+    release = _hold(scheduler)
+
+    bg = threading.Thread(
+        target=scheduler.complete, args=(BACKGROUND,), kwargs={"tag": "bg"}
+    )
+    bg.start()
+    _wait_for_waiters(scheduler, 1)
+    dm = threading.Thread(
+        target=scheduler.complete, args=(NARRATION,), kwargs={"tag": "dm"}
+    )
+    dm.start()
+    _wait_for_waiters(scheduler, 2)
+
+    release.set()
+    bg.join(5)
+    dm.join(5)
+    assert llm.calls == ["bg", "dm"]
+
+
+def test_full_queue_rejects_narration_only():
+    scheduler = InferenceScheduler(FakeLlm(), max_queue=1)
+    release = _hold(scheduler)
+
+    waiting = threading.Thread(target=scheduler.complete, args=(NARRATION,))
+    waiting.start()
+    _wait_for_waiters(scheduler, 1)
+
+    with pytest.raises(SchedulerBusy) as exc:
+        scheduler.check_admission()
+    assert exc.value.retry_after >= 1
+    with pytest.raises(SchedulerBusy):
+        scheduler.complete(NARRATION)
+
+    background = threading.Thread(target=scheduler.complete, args=(BACKGROUND,))
+    background.start()
+    _wait_for_waiters(scheduler, 2)
+
+    release.set()
+    waiting.join(5)
+    background.join(5)
+    assert scheduler.stats()["rejected"] == 2
+    assert scheduler.depth() == 0
+
+
+class EndlessLlm:
+    """Streams tokens until closed, like llama-cpp with a long max_tokens."""
+
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def create_chat_completion(self, **kwargs):
+        def tokens():
+            try:
+                while True:
+                    yield {"choices": [{"delta": {"content": "x"}}]}
+                    time.sleep(0.001)
+            finally:
+                self.closed.set()
+
+        return tokens()
+
+
+def test_slow_reader_does_not_hold_the_model():
+    scheduler = InferenceScheduler(FakeLlm())
+    stream = scheduler.stream(NARRATION)
+    assert next(stream) == "a"
+    # the reply is buffered; other work runs while the reader is still busy
+    assert scheduler.complete(BACKGROUND, tag="bg") == {"tag": "bg"}
+    assert list(stream) == ["b"]
+
+
+def test_closing_the_stream_stops_decoding_and_frees_the_model():
+    llm = EndlessLlm()
+    scheduler = InferenceScheduler(llm)
+    stream = scheduler.stream(NARRATION)
+    next(stream)
+    stream.close()
+    assert llm.closed.wait(5)
+    with scheduler.slot(NARRATION) as held:
+        assert held is llm
+
+
+def test_stream_raises_busy_on_first_next():
+    scheduler = InferenceScheduler(FakeLlm(), max_queue=0)
+    release = _hold(scheduler)
+    stream = scheduler.stream(NARRATION)
+    with pytest.raises(SchedulerBusy):
+        next(stream)
+    release.set()
@@ -0,0 +1,152 @@
+# test_sessions.py
+import threading
+
+from backend.app.world.memory import WorldMemory
+from backend.app.world.memory_queue import MemoryExtractionQueue
+from backend.app.world.sessions import SessionStore
+from backend.app.world.world_store import WorldStore
+from backend.tests.test_memory import _fake_embed
+
+
+def _store(max_sessions=2):
+    made = []
+
+    def chatter_factory():
+        made.append("chatter")
+        return object()
+
+    store = SessionStore(chatter_factory, lambda session_id: object(), max_sessions)
+    return store, made
+
+
+def test_session_parts_are_lazy_and_separate():
+    store, made = _store()
+    a = store.get("a")
+    b = store.get("b")
+    assert made == []
+    assert a.chatter is not b.chatter
+    assert a.world_memory is not b.world_memory
+    assert a.chatter is a.chatter
+    assert made == ["chatter", "chatter"]
+
+
+def test_lru_eviction_of_idle_sessions():
+    store, _ = _store(max_sessions=2)
+    store.get("a")
+    store.get("b")
+    store.get("a")  # b is now least recently used
+    store.get("c")
+    assert store.peek("b") is None
+    assert store.peek("a") is not None
+    assert store.stats() == {"resident": 2, "max_sessions": 2, "evictions": 1}
+
+
+def test_busy_sessions_are_not_evicted():
+    store, _ = _store(max_sessions=1)
+    busy = store.get("busy")
+    with busy.turn_lock:
+        store.get("other")
+        assert store.peek("busy") is busy
+        assert len(store) == 2
+    store.get("third")
+    assert store.peek("busy") is None
+    assert len(store) == 1
+
+
+def test_reset_history_keeps_world():
+    store, made = _store()
+    session = store.get("a")
+    chatter = session.chatter
+    world = session.world_memory
+    session.reset_history()
+    assert session.chatter is not chatter
+    assert session.world_memory is world
+
+
+def test_sessions_with_queued_extraction_are_not_evicted(tmp_path):
+    queue = MemoryExtractionQueue()
+
+    def world_factory(session_id):
+        store = WorldStore(str(tmp_path / session_id), model_name="fake")
+        return WorldMemory(_fake_embed, store=store)
+
+    store = SessionStore(object, world_factory, max_sessions=1, memory_queue=queue)
+    world = store.get("a").world_memory
+    world.add_memory("Mira guards the harbor", ["Mira"], "npc")
+    release = threading.Event()
+
+    def extract():
+        release.wait(5)
+        world.add_memory("A storm is coming", ["storm"], "threat")
+
+    queue.submit(world, extract)
+    store.get("b")
+    assert store.peek("a") is not None
+
+    release.set()
+    assert queue.wait_for(world, timeout=5)
+    store.get("c")
+    assert store.peek("a") is None
+
+    reopened = store.get("a").world_memory
+    assert reopened is not world
+    assert sorted(m["summary"] for m in reopened.memories) == [
+        "A storm is coming",
+        "Mira guards the harbor",
+    ]
+
+
+def test_pinned_sessions_are_not_evicted():
+    store, _ = _store(max_sessions=1)
+    pinned = store.get("a", pin=True)
+    store.get("b")
+    assert store.peek("a") is pinned
+    store.release(pinned)
+    store.get("c")
+    assert store.peek("a") is None
+
+
+def test_reopen_waits_for_a_turn_on_an_evicted_session():
+    store, _ = _store(max_sessions=1)
+    stale = store.get("a")  # not pinned, so evicted before its turn starts
+    store.get("b")
+    assert store.peek("a") is None
+
+    checks = []
+    is_closed = stale.is_closed
+
+    def counting_is_closed():
+        checks.append(1)
+        return is_closed()
+
+    stale.is_closed = counting_is_closed
+    reopened = []
+    with stale.turn_lock:
+        reopen = threading.Thread(target=lambda: reopened.append(store.get("a")))
+        reopen.start()
+        reopen.join(0.2)
+        assert reopen.is_alive()
+        # woken by notifications, not polling
+        assert len(checks) <= 2
+    reopen.join(5)
+    assert reopened and reopened[0] is not stale
+
+
+def test_drop_closes_once_the_turn_ends():
+    closed = []
+
+    class World:
+        def close(self):
+            closed.append(True)
+
+    store = SessionStore(object, lambda session_id: World())
+    session = store.get("a")
+    session.world_memory
+    dropped = threading.Thread(target=store.drop, args=("a",))
+    with session.turn_lock:
+        dropped.start()
+        dropped.join(0.2)
+        assert dropped.is_alive() and closed == []
+    dropped.join(5)
+    assert closed == [True]
+    assert store.get("a") is not session
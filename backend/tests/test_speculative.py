@@ -0,0 +1,77 @@
+# test_speculative.py
+import numpy as np
+import pytest
+
+from backend.app.utility import speculative
+from backend.app.utility.speculative import AcceptanceTracker, make_draft_model
+
+
+class FixedDraft:
+    def __init__(self, n: int):
+        self.n = n
+        self.calls = 0
+
+    def __call__(self, input_ids, **kwargs):
+        self.calls += 1
+        return np.arange(self.n, dtype=np.intc)
+
+
+def run_generation(tracker, prompt_len, accepted_per_step, start=0):
+    """
+    Mimic Llama.generate: the draft sees the committed context plus the new
+    token, then the context grows by the accepted drafts plus one.
+    """
+    ids = list(range(start, start + prompt_len))
+    ids.append(start + 10_000)  # first sampled token
+    for accepted in accepted_per_step:
+        tracker(np.array(ids, dtype=np.intc))
+        ids.extend(range(len(ids), len(ids) + accepted + 1))
+    return ids
+
+
+def test_tracker_infers_accepted_tokens_from_context_growth():
+    tracker = AcceptanceTracker(FixedDraft(4), "test")
+    run_generation(tracker, prompt_len=20, accepted_per_step=[4, 0, 2, 1])
+    stats = tracker.stats()
+    # the last proposal is still open when the completion ends
+    assert stats["steps"] == 3
+    assert stats["proposed"] == 12
+    assert stats["accepted"] == 6
+    assert stats["acceptance_rate"] == pytest.approx(0.5)
+    assert stats["accepted_per_step"] == pytest.approx(2.0)
+
+
+def test_tracker_skips_proposal_followed_by_a_new_prompt():
+    tracker = AcceptanceTracker(FixedDraft(4), "test")
+    run_generation(tracker, prompt_len=20, accepted_per_step=[3, 3])
+    # next completion: unrelated, longer prompt
+    run_generation(tracker, prompt_len=30, accepted_per_step=[1, 1], start=500)
+    stats = tracker.stats()
+    assert stats["steps"] == 2
+    assert stats["proposed"] == 8
+    assert stats["accepted"] == 4
+
+
+def test_tracker_records_counters():
+    before = speculative.ACCEPTED_TOKENS.value(mode="counted")
+    drafted = speculative.DRAFT_TOKENS.value(mode="counted")
+    tracker = AcceptanceTracker(FixedDraft(2), "counted")
+    run_generation(tracker, prompt_len=5, accepted_per_step=[2, 1, 0])
+    assert speculative.DRAFT_TOKENS.value(mode="counted") - drafted == 4
+    assert speculative.ACCEPTED_TOKENS.value(mode="counted") - before == 3
+
+
+def test_tracker_returns_the_drafted_tokens():
+    tracker = AcceptanceTracker(FixedDraft(3), "test")
+    out = tracker(np.array([1, 2, 3], dtype=np.intc))
+    assert out.tolist() == [0, 1, 2]
+    assert tracker.stats()["acceptance_rate"] == 0.0
+
+
+def test_make_draft_model_modes(monkeypatch):
+    assert make_draft_model("off") is None
+    monkeypatch.setattr(speculative, "DRAFT_MODEL_PATH", None)
+    with pytest.raises(ValueError):
+        make_draft_model("draft")
+    with pytest.raises(ValueError):
+        make_draft_model("medusa")
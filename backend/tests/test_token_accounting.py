@@ -0,0 +1,76 @@
+# test_token_accounting.py
+from collections import OrderedDict
+
+import pytest
+
+from backend.app.utility import llama
+from backend.app.utility.history import History
+from backend.app.utility.llama import Chatter
+
+
+class FakeLlm:
+    def __init__(self):
+        self.tokenized = []
+
+    def tokenize(self, text: bytes, add_bos: bool = True, special: bool = False):
+        self.tokenized.append(text.decode("utf-8"))
+        return text.split()
+
+
+class FakeScheduler:
+    def __init__(self, reply: str, completion_tokens: int):
+        self.reply = reply
+        self.completion_tokens = completion_tokens
+
+    def complete(self, priority, **kwargs):
+        return {
+            "choices": [{"message": {"content": self.reply}}],
+            "usage": {"completion_tokens": self.completion_tokens},
+        }
+
+
+@pytest.fixture
+def chatter(monkeypatch):
+    monkeypatch.setattr(Chatter, "_token_counts", OrderedDict())
+    monkeypatch.setattr(
+        Chatter, "_template_overhead", {"system": 2, "user": 3, "assistant": 4}
+    )
+    c = Chatter.__new__(Chatter)
+    c.llm = FakeLlm()
+    c.history = History(1000, "system prompt", "system", 4)
+    return c
+
+
+def test_token_counts_are_cached(chatter):
+    assert chatter._get_token_count("go north now") == 3 + 3
+    assert chatter._get_token_count("go north now") == 6
+    assert chatter.llm.tokenized == ["go north now"]
+
+
+def test_cache_is_bounded(chatter, monkeypatch):
+    monkeypatch.setattr(llama, "TOKEN_CACHE_SIZE", 2)
+    for text in ("a", "b", "c"):
+        chatter._count_tokens(text)
+    assert list(Chatter._token_counts) == ["b", "c"]
+
+
+def test_reply_tokens_come_from_usage(chatter):
+    chatter.scheduler = FakeScheduler("You see a door. What do you do?", 11)
+    chatter.chat("look around")
+
+    user_msg, reply_msg = chatter.history.history[1:]
+    assert user_msg.tokens == 2 + 3
+    assert reply_msg.tokens == 11 + 4
+    # the reply itself was never re-tokenized
+    assert chatter.llm.tokenized == ["look around"]
+
+
+def test_unmeasurable_template_uses_default_overhead(chatter, monkeypatch):
+    monkeypatch.setattr(Chatter, "_template_overhead", None)
+
+    def fail(self):
+        raise KeyError("tokenizer.chat_template")
+
+    monkeypatch.setattr(Chatter, "_measure_template_overhead", fail)
+    assert chatter._get_token_count("one two") == 2 + llama.DEFAULT_TEMPLATE_OVERHEAD
+    assert Chatter._template_overhead == {}
@@ -0,0 +1,88 @@
+# test_tracing.py
+import contextvars
+import json
+
+from backend.app.utility import tracing
+from backend.app.utility.tracing import Trace, TraceLog
+
+
+def _names(spans):
+    return [s["name"] for s in spans]
+
+
+def test_spans_nest_and_are_noops_without_a_trace():
+    assert tracing.span("embed") is tracing.span("search")  # shared no-op
+
+    with tracing.start_trace("chat", requested=True) as trace:
+        with tracing.span("retrieve"):
+            with tracing.span("embed"):
+                pass
+            with tracing.span("search", rows=3):
+                pass
+        with tracing.span("narrate"):
+            tracing.annotate(tokens=5)
+
+    assert tracing.current() is None
+    data = trace.to_dict()
+    assert _names(data["spans"]) == ["retrieve", "narrate"]
+    retrieve, narrate = data["spans"]
+    assert _names(retrieve["children"]) == ["embed", "search"]
+    assert retrieve["children"][1]["rows"] == 3
+    assert narrate["tokens"] == 5
+    assert "children" not in narrate
+    assert data["duration_ms"] >= retrieve["duration_ms"]
+
+
+def test_untraced_turns_yield_no_trace():
+    with tracing.start_trace("chat") as trace:
+        assert trace is None
+        assert tracing.current() is None
+
+
+def test_traced_iter_survives_fresh_contexts_per_step():
+    trace = Trace("chat_stream")
+
+    def gen():
+        with tracing.span("narrate"):
+            for i in range(3):
+                with tracing.span("token"):
+                    pass
+                yield i
+
+    it = tracing.traced_iter(trace, gen())
+    # like Starlette: every step runs in its own copied context
+    items = []
+    while True:
+        try:
+            items.append(contextvars.copy_context().run(next, it))
+        except StopIteration:
+            break
+    assert items == [0, 1, 2]
+    assert _names(trace.spans) == ["narrate"]
+    assert len(trace.spans[0]["children"]) == 3
+
+
+def test_trace_log_writes_jsonl_and_rotates(tmp_path):
+    log = TraceLog(str(tmp_path / "traces.jsonl"), max_mb=0.0005, backups=2)
+    tracing.set_trace_log(log)
+    try:
+        with tracing.start_trace("chat") as trace:  # sampled via the log
+            with tracing.span("narrate"):
+                pass
+        assert trace is not None
+        with tracing.start_trace("memory_extraction", parent=trace) as child:
+            pass
+        assert child.trace_id == trace.trace_id
+
+        lines = (tmp_path / "traces.jsonl").read_text().splitlines()
+        records = [json.loads(line) for line in lines]
+        assert [r["name"] for r in records] == ["chat", "memory_extraction"]
+
+        for _ in range(20):
+            with tracing.start_trace("chat"):
+                pass
+    finally:
+        tracing.set_trace_log(None)
+        log.close()
+    assert (tmp_path / "traces.jsonl.1").exists()
+    assert not (tmp_path / "traces.jsonl.3").exists()
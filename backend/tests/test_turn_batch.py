@@ -0,0 +1,170 @@
+# test_turn_batch.py
+import threading
+
+from backend.app.world.conversation_service import ConversationService
+from backend.app.world.memory import WorldMemory
+from backend.app.world.memory_queue import MemoryExtractionQueue
+from backend.app.world.sessions import Session, SessionStore
+from backend.app.world.turn_batch import TurnBatch
+from backend.tests.test_memory import _fake_embed
+
+
+class BatchingChatter:
+    def __init__(self):
+        self.single_calls = 0
+        self.batches = []
+
+    def chat(self, message: str, world_facts: str | None = None) -> str:
+        return f"The DM answers: {message}"
+
+    def analyze_conversation_for_memories(self, context: dict) -> dict:
+        self.single_calls += 1
+        return {
+            "summary": "one fact",
+            "entities": [],
+            "type": "other",
+            "confidence": 0.9,
+        }
+
+    def analyze_turns_for_memories(self, turns):
+        self.batches.append([t["user_message"] for t in turns])
+        return [
+            {
+                "summary": "Mira guards the harbor",
+                "entities": ["Mira", "player", "mira"],
+                "type": "npc",
+                "confidence": 0.9,
+            },
+            {
+                "summary": "A storm is coming",
+                "entities": ["storm"],
+                "type": "threat",
+                "confidence": 0.8,
+            },
+            {
+                "summary": "Maybe the bread is stale",
+                "entities": ["bread"],
+                "type": "item",
+                "confidence": 0.6,
+            },
+        ]
+
+
+def test_batch_fills_by_turns_or_tokens():
+    batch = TurnBatch(max_turns=3)
+    assert batch.add("a", "b") is None
+    assert batch.add("c", "d") is None
+    turns = batch.add("e", "f")
+    assert [t["user_message"] for t in turns] == ["a", "c", "e"]
+    assert len(batch) == 0
+
+    by_tokens = TurnBatch(max_turns=0, max_tokens=50)
+    assert by_tokens.add("x" * 40, "y" * 40) is None  # ~20 tokens
+    assert len(by_tokens.add("x" * 80, "y" * 80)) == 2
+
+    assert not TurnBatch(max_turns=1).enabled
+    # a token threshold alone enables batching with the default turn setting
+    tokens_only = TurnBatch(max_turns=1, max_tokens=50)
+    assert tokens_only.enabled and tokens_only.max_turns == 0
+    assert not TurnBatch(max_turns=0, max_tokens=0).enabled
+
+
+def test_service_extracts_several_facts_once_per_batch():
+    chatter = BatchingChatter()
+    world = WorldMemory(_fake_embed)
+    batch = TurnBatch(max_turns=3)
+    service = ConversationService(chatter, world, turn_batch=batch)
+
+    for line in ("hello Mira", "what is at the harbor", "is a storm coming", "bye"):
+        service.handle_user_message(line)
+
+    assert chatter.single_calls == 0
+    assert chatter.batches == [
+        ["hello Mira", "what is at the harbor", "is a storm coming"]
+    ]
+    # same confidence and entity filtering as per-turn extraction
+    assert [m["summary"] for m in world.memories] == [
+        "Mira guards the harbor",
+        "A storm is coming",
+    ]
+    assert world.memories[0]["entities"] == ["Mira"]
+    assert len(batch) == 1
+
+
+def test_without_batching_every_turn_is_analyzed_alone():
+    chatter = BatchingChatter()
+    service = ConversationService(
+        chatter, WorldMemory(_fake_embed), turn_batch=TurnBatch(max_turns=1)
+    )
+    service.handle_user_message("hello")
+    service.handle_user_message("again")
+    assert chatter.single_calls == 2
+    assert chatter.batches == []
+
+
+def test_closing_a_session_extracts_pending_turns_then_closes_world():
+    chatter = BatchingChatter()
+    closed = []
+
+    class ClosingWorld(WorldMemory):
+        def close(self):
+            closed.append(len(self.memories))
+
+    world = ClosingWorld(_fake_embed)
+    session = Session("s", lambda: chatter, lambda sid: world)
+    session.turn_batch = TurnBatch(max_turns=4)
+    queue = MemoryExtractionQueue()
+    service = ConversationService(chatter, world, queue, turn_batch=session.turn_batch)
+    service.handle_user_message("hello Mira")
+    assert chatter.batches == []
+
+    session.close()
+    assert queue.shutdown(timeout=5)
+    assert chatter.batches == [["hello Mira"]]
+    # the world is closed after the batch's memories were stored
+    assert closed == [2]
+
+
+def test_reopen_waits_for_the_evicted_world_to_close():
+    release = threading.Event()
+    log = []
+    store = None
+
+    class SlowChatter(BatchingChatter):
+        def analyze_turns_for_memories(self, turns):
+            release.wait(5)
+            return super().analyze_turns_for_memories(turns)
+
+    class LoggingWorld(WorldMemory):
+        def close(self):
+            # evicted sessions are closed outside the store lock
+            assert not store._lock.locked()
+            log.append("close")
+
+    def world_factory(session_id):
+        log.append(f"open {session_id}")
+        return LoggingWorld(_fake_embed)
+
+    chatter = SlowChatter()
+    queue = MemoryExtractionQueue()
+    store = SessionStore(
+        lambda: chatter, world_factory, max_sessions=1, memory_queue=queue
+    )
+    session = store.get("a")
+    session.turn_batch = TurnBatch(max_turns=4)
+    service = ConversationService(
+        chatter, session.world_memory, queue, turn_batch=session.turn_batch
+    )
+    service.handle_user_message("hello Mira")
+
+    store.get("b")  # evicts "a"; its pending turn is extracted on the queue
+    assert store.peek("a") is None
+    reopen = threading.Thread(target=lambda: store.get("a").world_memory)
+    reopen.start()
+    reopen.join(0.2)
+    assert reopen.is_alive()
+
+    release.set()
+    reopen.join(5)
+    assert log == ["open a", "close", "open a"]
+    assert queue.shutdown(timeout=5)
@@ -0,0 +1,128 @@
+# test_world_store.py
+import os
+
+from backend.app.world.memory import WorldMemory, INITIAL_CAPACITY
+from backend.app.world.world_store import WorldStore
+from backend.tests.test_memory import _fake_embed
+
+
+def _open(path, model_name="fake", embed=_fake_embed):
+    return WorldMemory(embed, store=WorldStore(str(path), model_name=model_name))
+
+
+def _populate(wm):
+    for i in range(INITIAL_CAPACITY + 5):
+        wm.add_memory(f"the guard {i} patrols gate {i % 7}", ["guard"], "other")
+    wm.add_memory(
+        "Mira the smith now distrusts the player",
+        ["Mira"],
+        "npc",
+        npc={"name": "Mira", "intent": "forge a blade", "confidence": 0.9},
+    )
+    wm.add_memory(
+        "Mira was seen at the docks",
+        ["Mira"],
+        "npc",
+        npc={"name": "Mira", "last_seen_location": "docks"},
+    )
+
+
+def test_world_survives_reopen_without_reembedding(tmp_path):
+    wm = _open(tmp_path)
+    _populate(wm)
+    assert wm.flush()
+    before = [(s, m["id"]) for s, m in wm.retrieve_scored("guard gate 3", k=5)]
+    wm.close()
+
+    calls = []
+
+    def counting_embed(text):
+        calls.append(text)
+        return _fake_embed(text)
+
+    reopened = _open(tmp_path, embed=counting_embed)
+    assert calls == []
+    assert len(reopened) == len(wm)
+    assert [m["id"] for m in reopened.memories] == [m["id"] for m in wm.memories]
+    # vectors are mapped from disk, not copied
+    assert not reopened._vectors.flags.owndata
+    assert not reopened._vectors.flags.writeable
+
+    after = [(s, m["id"]) for s, m in reopened.retrieve_scored("guard gate 3", k=5)]
+    assert after == before
+
+    assert list(reopened.npc_index) == ["mira"]
+    snap = reopened.npc_index["mira"]
+    assert snap["last_seen_location"] == "docks"
+    assert snap["intent"] == "forge a blade"
+    assert reopened.get_relevant_npc_snapshots("Mira docks", k=1)[0] is snap
+
+
+def test_appends_after_reopen_are_persisted(tmp_path):
+    wm = _open(tmp_path)
+    _populate(wm)
+    wm.close()
+
+    reopened = _open(tmp_path)
+    new_id = reopened.add_memory("a storm gathers over the harbor", [], "event")
+    reopened.close()
+
+    third = _open(tmp_path)
+    assert third.memories[-1]["id"] == new_id
+    assert third.retrieve("storm harbor", k=1)[0]["id"] == new_id
+
+
+def test_clear_is_persisted(tmp_path):
+    wm = _open(tmp_path)
+    _populate(wm)
+    wm.clear()
+    wm.add_memory("only this remains", [], "other")
+    wm.close()
+
+    reopened = _open(tmp_path)
+    assert [m["summary"] for m in reopened.memories] == ["only this remains"]
+    assert reopened.npc_index == {}
+
+
+def test_model_change_reembeds_once(tmp_path):
+    wm = _open(tmp_path, model_name="old")
+    _populate(wm)
+    wm.close()
+
+    calls = []
+
+    def counting_embed(text):
+        calls.append(text)
+        return _fake_embed(text)
+
+    reopened = _open(tmp_path, model_name="new", embed=counting_embed)
+    assert len(calls) == len(reopened) + len(reopened.npc_index)
+    reopened.close()
+
+    calls.clear()
+    _open(tmp_path, model_name="new", embed=counting_embed)
+    assert calls == []
+
+
+def test_torn_tail_is_ignored(tmp_path):
+    wm = _open(tmp_path)
+    wm.add_memory("first fact", [], "other")
+    wm.add_memory("second fact", [], "other")
+    wm.close()
+
+    # crash mid-write: a partial log line and a vector row without a record
+    with open(os.path.join(tmp_path, "log.jsonl"), "a", encoding="utf-8") as f:
+        f.write('{"op": "memory", "row": 2, "mem')
+    with open(os.path.join(tmp_path, "vectors.f32"), "ab") as f:
+        f.write(b"\0" * 16)
+
+    reopened = _open(tmp_path)
+    assert [m["summary"] for m in reopened.memories] == ["first fact", "second fact"]
+    reopened.add_memory("third fact", [], "other")
+    reopened.close()
+
+    assert [m["summary"] for m in _open(tmp_path).memories] == [
+        "first fact",
+        "second fact",
+        "third fact",
+    ]
@@ -7,6 +7,15 @@ function App() {
     const host = window.location.hostname || "127.0.0.1";
     return `http://${host}:8000`;
   }, []);
+  const sessionId = useMemo(() => {
+    // One conversation per browser tab; the backend keeps a History per session
+    let id = window.sessionStorage.getItem("persistentdm-session-id");
+    if (!id) {
+      id = crypto.randomUUID();
+      window.sessionStorage.setItem("persistentdm-session-id", id);
+    }
+    return id;
+  }, []);
   const [history, setHistory] = useState([]);
   const [input, setInput] = useState("");
   const [sending, setSending] = useState(false);
@@ -35,7 +44,7 @@ function App() {
       const res = await fetch(`${apiBase}/chat`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ message: text }),
+        body: JSON.stringify({ message: text, session_id: sessionId }),
       });
       if (!res.ok) {
         let errMsg = res.statusText || "Request failed";
@@ -61,7 +70,7 @@ function App() {
       const res = await fetch(`${apiBase}/chat/clear`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ clear: true }),
+        body: JSON.stringify({ clear: true, session_id: sessionId }),
       });
       if (res.ok) {
         setHistory([]);